@@ -0,0 +1,7 @@
+# ============================================================
+# BENCHMARKS PACKAGE
+# ============================================================
+# Stand-alone scripts measuring the library hot paths.
+# Run them from the project root, e.g.:
+#
+#     python -m benchmarks.memory
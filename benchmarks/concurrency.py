@@ -0,0 +1,145 @@
+import argparse
+import random
+import sys
+import threading
+import time
+
+from books import PhysicalBook
+from concurrency import ConcurrentLibrary
+from exceptions import LibraryError
+from library import Library
+from users import Student, Teacher
+
+# ============================================================
+# CONCURRENCY STRESS TEST
+# ============================================================
+# Many threads lend and return a small, heavily contended set
+# of titles through ConcurrentLibrary, then the invariants are
+# checked:
+# - a copy is never held by two users at the same time
+# - lent copies == titles held in users' lend_books, plus the
+#   loans of Teachers (book_request does not record them: each
+#   worker keeps the ones it made)
+# - no Student goes over limit_books
+# - borrowed_times == number of successful lends
+#
+# Throughput is reported for each thread count. It does not
+# grow with the threads (the GIL runs one at a time): this
+# checks correctness under contention, while scaling across
+# cores is measured by benchmarks/sharding.py.
+#
+# Usage:
+#     python -m benchmarks.concurrency [--ops N] [--threads 1 2 4 8]
+
+
+def build_library(titles, users):
+    library = Library('Stress')
+    for i in range(titles):
+        library.books.append(PhysicalBook(i, f'Title {i % (titles // 2 or 1)}', 'Author', 10.0))
+    for i in range(users):
+        user = Teacher(i, f'T{i}', f'ID{i}') if i % 5 == 0 else Student(i, f'S{i}', f'ID{i}', 'X')
+        library.users.append(user)
+    return library
+
+
+# Appends (successful lends, unrecorded loans) to `counters`
+def worker(concurrent, operations, seed, counters):
+    rng = random.Random(seed)
+    library = concurrent.library
+    titles = sorted({book.title for book in library.books})
+    lends = 0
+    unrecorded = []  # (user, title) lent to users not recording loans
+
+    for _ in range(operations):
+        user = rng.choice(library.users)
+        own = [loan for loan in unrecorded if loan[0] is user]
+        try:
+            if user.records_loans and user.lend_books and rng.random() < 0.5:
+                concurrent.return_book(user.id_card, rng.choice(list(user.lend_books)))
+            elif own and rng.random() < 0.5:
+                loan = rng.choice(own)
+                concurrent.return_book(user.id_card, loan[1])
+                unrecorded.remove(loan)
+            else:
+                title = rng.choice(titles)
+                concurrent.lend(user.id_card, title)
+                lends += 1
+                if not user.records_loans:
+                    unrecorded.append((user, title))
+        except (LibraryError, ValueError, IndexError):
+            # Refused operations are expected under contention
+            pass
+
+    counters.append((lends, unrecorded))
+
+
+def check(library, counters):
+    errors = []
+    lends = sum(count for count, _ in counters)
+
+    held = {}
+    for user in library.users:
+        if user.limit_books is not None and len(user.lend_books) > user.limit_books:
+            errors.append(f'{user.id_card} holds {len(user.lend_books)} books')
+        for title in user.lend_books:
+            held[title] = held.get(title, 0) + 1
+    for _, unrecorded in counters:
+        for _, title in unrecorded:
+            held[title] = held.get(title, 0) + 1
+
+    for title in {book.title for book in library.books}:
+        out = sum(1 for book in library.find_books(title) if not book.available)
+        if out != held.get(title, 0):
+            errors.append(f'{title}: {out} copies out, {held.get(title, 0)} held')
+
+    total = sum(book.borrowed_times for book in library.books)
+    if total != lends:
+        errors.append(f'borrowed_times total {total} != successful lends {lends}')
+
+    if library.available_count != sum(1 for book in library.books if book.available):
+        errors.append('availability index out of sync')
+
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent lending stress test')
+    parser.add_argument('--ops', type=int, default=20_000, help='operations per thread')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--titles', type=int, default=8)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--switch-interval', type=float, default=1e-6,
+                        help='thread switch interval (small = more interleavings)')
+    args = parser.parse_args()
+
+    sys.setswitchinterval(args.switch_interval)
+
+    failed = False
+    for threads in args.threads:
+        library = build_library(args.titles, args.users)
+        concurrent = ConcurrentLibrary(library)
+        counters = []
+
+        pool = [
+            threading.Thread(target=worker, args=(concurrent, args.ops, seed, counters))
+            for seed in range(threads)
+        ]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        errors = check(library, counters)
+        status = 'OK' if not errors else f'FAILED ({len(errors)} violations)'
+        print(f'{threads:>3} threads: {threads * args.ops / elapsed:>10,.0f} ops/s  {status}')
+        for error in errors[:10]:
+            print(f'    {error}')
+        failed = failed or bool(errors)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
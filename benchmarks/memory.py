@@ -0,0 +1,115 @@
+import argparse
+import gc
+import tracemalloc
+
+from books import PhysicalBook
+from users import Student
+
+# ============================================================
+# MEMORY BENCHMARK: slotted vs __dict__ instances
+# ============================================================
+# Measures the memory used by Book and User instances and
+# reports it per million objects.
+#
+# "Before" are the classes as they were before being slotted
+# (BaselinePhysicalBook, BaselineStudent below): same
+# constructors, every attribute in a per-instance __dict__ and
+# a plain list of loans. Only the attributes matter for the
+# layout, so their methods are left out.
+#
+# Usage:
+#     python -m benchmarks.memory [--count N]
+
+
+# ------------------------------------------------------------
+# Baseline classes
+# ------------------------------------------------------------
+class BaselineBook:
+
+    def __init__(self, id, title, author, price, available=True):
+        self.id = id
+        self.title = title
+        self.author = author
+        self.price = price
+        self.available = available
+        self.__borrowed_times = 0
+
+
+class BaselinePhysicalBook(BaselineBook):
+    pass
+
+
+class BaselineUser:
+
+    def __init__(self, id, name, id_card):
+        self.id = id
+        self.name = name
+        self.id_card = id_card
+        self.lend_books = []
+
+
+class BaselineStudent(BaselineUser):
+
+    def __init__(self, id, name, id_card, subject):
+        super().__init__(id, name, id_card)
+        self.subject = subject
+        self.limit_books = 3
+
+
+# ------------------------------------------------------------
+# Constructor arguments
+# ------------------------------------------------------------
+# Built before measuring, so the strings are not counted and
+# only the instances themselves are compared.
+def book_args(count):
+    return [
+        (i, f'Title {i}', f'Author {i % 1000}', 10.0 + i % 50)
+        for i in range(count)
+    ]
+
+
+def user_args(count):
+    return [
+        (i, f'User {i}', f'STU{i:07d}', 'Engineering')
+        for i in range(count)
+    ]
+
+
+# ------------------------------------------------------------
+# Measurement
+# ------------------------------------------------------------
+def measure(cls, arguments):
+    gc.collect()
+    tracemalloc.start()
+    objects = [cls(*args) for args in arguments]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del objects
+    gc.collect()
+    return current * 1_000_000 / len(arguments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=200_000,
+                        help='objects created per measurement')
+    args = parser.parse_args()
+
+    rows = [
+        ('Book', book_args(args.count), BaselinePhysicalBook, PhysicalBook),
+        ('User', user_args(args.count), BaselineStudent, Student),
+    ]
+
+    print(f'Memory per million objects (measured on {args.count:,})')
+    print(f'{"class":<8}{"baseline (MiB)":>16}{"current (MiB)":>17}{"saved":>9}')
+
+    for name, arguments, before_cls, after_cls in rows:
+        before = measure(before_cls, arguments) / 2 ** 20
+        after = measure(after_cls, arguments) / 2 ** 20
+        saved = 100 * (before - after) / before
+        print(f'{name:<8}{before:>16.1f}{after:>17.1f}{saved:>8.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from generator import LibraryGenerator
+from persistence import Persistence
+
+# ============================================================
+# PARALLEL LOAD BENCHMARK
+# ============================================================
+# Writes a synthetic library.json (generator.py) and compares
+# Persistence.load_data('eager') with load_data('parallel')
+# for several worker counts. Speedups are relative to 'eager'.
+#
+# Usage:
+#     python -m benchmarks.parallel_load [--books N] [--workers 1 2 4 8]
+
+
+def best_time(call, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel load speedup')
+    parser.add_argument('--books', type=int, default=500_000)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='library-parallel-')
+    try:
+        file = os.path.join(workdir, 'library.json')
+        LibraryGenerator(args.books, args.users, seed=args.seed).write_json(file)
+        size = os.path.getsize(file)
+        print(f'{args.books:,} books, {args.users:,} users, {size / 2**20:.1f} MiB, '
+              f'{os.cpu_count()} CPUs')
+
+        persistence = Persistence(file)
+        eager, _ = best_time(lambda: persistence.load_data('eager'), args.repeat)
+
+        print(f'{"loader":<16}{"best s":>10}{"speedup":>10}')
+        print(f'{"eager":<16}{eager:>10.2f}{1:>9.2f}x')
+        for workers in args.workers:
+            best, _ = best_time(
+                lambda: persistence.load_data('parallel', workers=workers), args.repeat,
+            )
+            print(f'{f"parallel[{workers}]":<16}{best:>10.2f}{eager / best:>9.2f}x')
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from generator import LibraryGenerator
+from library import Library
+from sharding import ShardedLibrary
+
+# ============================================================
+# SHARDING SCALABILITY BENCHMARK
+# ============================================================
+# Loads one synthetic library into 1, 2, 4... shard workers
+# and measures the pipelined throughput of:
+# - find_book   (one shard per request)
+# - lend/return (one or two shards per request, journaled)
+#
+# Throughput should grow close to linearly with the number of
+# shards, up to the number of cores.
+#
+# Usage:
+#     python -m benchmarks.sharding [--books N] [--shards 1 2 4 8]
+
+
+def run(shards, library, operations, seed):
+    rng = random.Random(seed)
+    titles = [book.title for book in rng.choices(library.books, k=operations)]
+
+    # Users without loans, each borrowing one available title
+    borrowers = [user.id_card for user in library.users if not user.lend_books]
+    available = [book.title for book in library.books_available]
+    rng.shuffle(available)
+    loans = list(zip(borrowers, available))[:operations]
+
+    workdir = tempfile.mkdtemp(prefix='library-shards-')
+    try:
+        with ShardedLibrary(workdir, shards=shards) as sharded:
+            sharded.import_library(library)
+
+            start = time.perf_counter()
+            sharded.find_books_many(titles)
+            finds = len(titles) / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            lent = sharded.lend_many(loans)
+            returned = sharded.return_many(loans)
+            lending = 2 * len(loans) / (time.perf_counter() - start)
+
+            failed = sum(isinstance(result, Exception) for result in lent + returned)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return finds, lending, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sharded library throughput')
+    parser.add_argument('--books', type=int, default=50_000)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--ops', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--shards', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    generator = LibraryGenerator(args.books, args.users, seed=args.seed)
+    library = Library('Sharding benchmark')
+    library.books.extend(generator.books())
+    library.users.extend(generator.users())
+
+    print(f'{"shards":>7}{"find ops/s":>14}{"lend+return ops/s":>20}{"failed":>8}')
+    for shards in args.shards:
+        finds, lending, failed = run(shards, library, args.ops, args.seed)
+        print(f'{shards:>7}{finds:>14,.0f}{lending:>20,.0f}{failed:>8}')
+
+
+if __name__ == '__main__':
+    main()
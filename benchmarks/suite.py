@@ -0,0 +1,198 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from generator import LibraryGenerator
+from library import Library
+from persistence import Persistence
+
+# ============================================================
+# BENCHMARK SUITE: library hot paths
+# ============================================================
+# Builds synthetic libraries (generator.LibraryGenerator) at the
+# requested sizes and measures, for each operation:
+# - latency percentiles (p50, p90, p99, max) in microseconds
+# - throughput (operations per second)
+# - peak memory allocated during one call (tracemalloc)
+#
+# Results are written as JSON so runs can be compared:
+#
+#     python -m benchmarks.suite --sizes 1000 100000 --output base.json
+#     python -m benchmarks.suite --sizes 1000 100000 --compare base.json
+#
+# Sizes up to 10**7 are supported, but persistence operations
+# at that scale take minutes and several GB of memory.
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+# ------------------------------------------------------------
+# Library construction
+# ------------------------------------------------------------
+def build_library(size, seed):
+    generator = LibraryGenerator(books=size, users=size, seed=seed)
+    library = Library(f'Benchmark {size}')
+    library.books.extend(generator.books())
+    library.users.extend(generator.users())
+    return library
+
+
+# ------------------------------------------------------------
+# Measurement helpers
+# ------------------------------------------------------------
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def peak_memory(call):
+    """Peak bytes allocated while running call() once."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure(name, size, call, iterations):
+    """Times `iterations` calls; call(i) receives the iteration."""
+    timings = []
+    gc.disable()
+    try:
+        for i in range(iterations):
+            start = time.perf_counter_ns()
+            call(i)
+            timings.append(time.perf_counter_ns() - start)
+    finally:
+        gc.enable()
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        'operation': name,
+        'size': size,
+        'iterations': iterations,
+        'p50_us': percentile(timings, 0.50) / 1000,
+        'p90_us': percentile(timings, 0.90) / 1000,
+        'p99_us': percentile(timings, 0.99) / 1000,
+        'max_us': timings[-1] / 1000,
+        'mean_us': statistics.fmean(timings) / 1000,
+        'throughput_ops': iterations * 1e9 / total if total else float('inf'),
+        'peak_bytes': peak_memory(lambda: call(0)),
+    }
+
+
+# ------------------------------------------------------------
+# Benchmarks for one library size
+# ------------------------------------------------------------
+def run_size(size, seed, iterations, io_iterations, workdir):
+    rng = random.Random(seed)
+    results = []
+
+    start = time.perf_counter()
+    library = build_library(size, seed)
+    print(f'  built {size:,} books/users in {time.perf_counter() - start:.2f}s', flush=True)
+
+    id_cards = [user.id_card for user in rng.sample(library.users, min(size, iterations))]
+    titles = [book.title for book in rng.sample(library.books, min(size, iterations))]
+    books = rng.sample(library.books, min(size, iterations))
+
+    def lend_return(i):
+        book = books[i % len(books)]
+        if book.available:
+            book.lend()
+            book.return_book()
+        else:
+            book.return_book()
+            book.lend()
+
+    results.append(measure('find_user', size, lambda i: library.find_user(id_cards[i % len(id_cards)]), iterations))
+    results.append(measure('find_book', size, lambda i: library.find_book(titles[i % len(titles)]), iterations))
+    results.append(measure('available_count', size, lambda i: library.available_count, iterations))
+    results.append(measure('books_available', size, lambda i: library.books_available, max(1, iterations // 100)))
+    results.append(measure('lend_return', size, lend_return, iterations))
+
+    # Persistence (fewer iterations: each one touches the disk)
+    file = os.path.join(workdir, f'library-{size}.json')
+    persistence = Persistence(file)
+    results.append(measure('save_data', size, lambda i: persistence.save_data(library), io_iterations))
+    for mode in ('eager', 'stream', 'lazy'):
+        results.append(measure(f'load_data[{mode}]', size,
+                               lambda i, mode=mode: persistence.load_data(mode), io_iterations))
+
+    return results
+
+
+# ------------------------------------------------------------
+# Reporting
+# ------------------------------------------------------------
+def print_results(results, baseline=None):
+    previous = {
+        (row['operation'], row['size']): row
+        for row in (baseline or {}).get('results', [])
+    }
+
+    print(f'{"operation":<18}{"size":>10}{"p50 us":>12}{"p99 us":>12}'
+          f'{"ops/s":>14}{"peak KiB":>12}{"vs base":>10}')
+    for row in results:
+        base = previous.get((row['operation'], row['size']))
+        change = f'{row["p50_us"] / base["p50_us"]:>9.2f}x' if base and base['p50_us'] else ''
+        print(f'{row["operation"]:<18}{row["size"]:>10,}{row["p50_us"]:>12.2f}'
+              f'{row["p99_us"]:>12.2f}{row["throughput_ops"]:>14,.0f}'
+              f'{row["peak_bytes"] / 1024:>12.1f}{change}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Library hot path benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=10_000)
+    parser.add_argument('--io-iterations', type=int, default=3)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare with')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix='library-bench-')
+    results = []
+    try:
+        for size in args.sizes:
+            print(f'size {size:,}', flush=True)
+            results.extend(run_size(size, args.seed, args.iterations,
+                                    args.io_iterations, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
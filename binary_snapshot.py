@@ -0,0 +1,369 @@
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from books import DigitalBook, PhysicalBook
+from exceptions import LibraryError
+from holdings import Holding
+from json_stream import dump_members, iter_members
+from serialization import SCHEMA_VERSION, book_type, check_version, decode_book, decode_user, user_type
+from users import Student, Teacher
+
+# ============================================================
+# BINARY SNAPSHOT FORMAT
+# ============================================================
+# Compact alternative to library.json, designed to be opened
+# with mmap: nothing is parsed up front, each record is decoded
+# only when it is read.
+#
+# File layout (little-endian):
+#
+#   HEADER         fixed size, see _HEADER
+#   BOOKS          book_count fixed-width records (_BOOK)
+#   USERS          user_count fixed-width records (_USER)
+#   LOANS          loan_count string ids (lend_books of users)
+#   STRING INDEX   string_count (offset, length) pairs (_SPAN)
+#   STRING DATA    UTF-8 bytes of every distinct string
+#
+# Strings (titles, names, ...) are stored once in the string
+# table and referenced by their index ("string id").
+
+MAGIC = b'LIBB'
+VERSION = 2  # 2: copies of holdings in the book records
+
+# magic, version, book/user/loan/string counts, name and
+# save_date string ids, journal_seq, section offsets
+_HEADER = struct.Struct('<4sH2xIIIIIIqQQQQQ')
+
+# id, title, author, price, borrowed_times, copies,
+# available_copies, available, type
+_BOOK = struct.Struct('<qIIdqIIBB6x')
+
+# Version 1 book records (no copy counts), still readable
+_BOOK_V1 = struct.Struct('<qIIdqBB6x')
+
+# id, name, id_card, subject, limit_books, first loan,
+# loan count, type
+_USER = struct.Struct('<qIIIiIIB3x')
+
+_SPAN = struct.Struct('<QI')
+_SID = struct.Struct('<I')
+
+# Marker for absent strings / numbers
+_NONE = 0xFFFFFFFF
+_NO_LIMIT = -1
+
+# Type tags stored in the records
+BOOK_TYPES = {'PhysicalBook': PhysicalBook, 'DigitalBook': DigitalBook, 'Holding': Holding}
+USER_TYPES = {'Student': Student, 'Teacher': Teacher}
+_BOOK_TAGS = list(BOOK_TYPES)
+_USER_TAGS = list(USER_TYPES)
+
+
+class SnapshotFormatError(LibraryError):
+    pass
+
+
+# ============================================================
+# WRITER
+# ============================================================
+# Records are added one at a time and spooled to temporary
+# files, so a snapshot can be produced without holding the whole
+# library in memory. Only the string deduplication table stays
+# resident.
+class SnapshotWriter:
+
+    def __init__(self, path) -> None:
+        self.path = path
+        self.name = None
+        self.save_date = None
+        self.journal_seq = 0
+
+        self._books = tempfile.TemporaryFile()
+        self._users = tempfile.TemporaryFile()
+        self._loans = tempfile.TemporaryFile()
+        self._string_index = tempfile.TemporaryFile()
+        self._string_data = tempfile.TemporaryFile()
+
+        self._string_ids = {}
+        self._string_size = 0
+        self._book_count = 0
+        self._user_count = 0
+        self._loan_count = 0
+
+    # --------------------------------------------------------
+    # String table
+    # --------------------------------------------------------
+    def _sid(self, value):
+        if value is None:
+            return _NONE
+
+        sid = self._string_ids.get(value)
+        if sid is None:
+            data = value.encode('utf-8')
+            sid = self._string_ids[value] = len(self._string_ids)
+            self._string_index.write(_SPAN.pack(self._string_size, len(data)))
+            self._string_data.write(data)
+            self._string_size += len(data)
+        return sid
+
+    # --------------------------------------------------------
+    # Records (tagged dicts, see serialization.py)
+    # --------------------------------------------------------
+    def add_book(self, record, type_name=None):
+        type_name = type_name or book_type(record)
+        if type_name not in BOOK_TYPES:
+            raise SnapshotFormatError(f'{type_name} records cannot be stored in a snapshot')
+        self._books.write(_BOOK.pack(
+            record['id'],
+            self._sid(record['title']),
+            self._sid(record['author']),
+            record['price'],
+            record.get('_Book__borrowed_times', 0),
+            record.get('copies', 1),
+            record.get('available_copies', record.get('copies', 1) if record['available'] else 0),
+            1 if record['available'] else 0,
+            _BOOK_TAGS.index(type_name),
+        ))
+        self._book_count += 1
+
+    def add_user(self, record, type_name=None):
+        type_name = type_name or user_type(record)
+        loans = record.get('lend_books', ())
+        limit = record.get('limit_books')
+
+        self._users.write(_USER.pack(
+            record['id'],
+            self._sid(record['name']),
+            self._sid(record['id_card']),
+            self._sid(record.get('subject')),
+            _NO_LIMIT if limit is None else limit,
+            self._loan_count,
+            len(loans),
+            _USER_TAGS.index(type_name),
+        ))
+        for title in loans:
+            self._loans.write(_SID.pack(self._sid(title)))
+
+        self._loan_count += len(loans)
+        self._user_count += 1
+
+    # --------------------------------------------------------
+    # Final file assembly
+    # --------------------------------------------------------
+    # Written to a temporary file and atomically renamed.
+    def close(self):
+        name_sid = self._sid(self.name)
+        date_sid = self._sid(self.save_date)
+
+        sections = [self._books, self._users, self._loans,
+                    self._string_index, self._string_data]
+        offsets = []
+        position = _HEADER.size
+        for section in sections:
+            offsets.append(position)
+            position += section.tell()
+
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(
+                MAGIC, VERSION,
+                self._book_count, self._user_count,
+                self._loan_count, len(self._string_ids),
+                name_sid, date_sid, self.journal_seq,
+                *offsets,
+            ))
+            for section in sections:
+                section.seek(0)
+                shutil.copyfileobj(section, f)
+                section.close()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for section in (self._books, self._users, self._loans,
+                            self._string_index, self._string_data):
+                section.close()
+
+
+# ============================================================
+# READER
+# ============================================================
+# Memory-maps a snapshot. Opening only reads the header; every
+# accessor decodes a single record straight from the mapping.
+class BinarySnapshot:
+
+    def __init__(self, path) -> None:
+        self.path = path
+        if os.path.getsize(path) < _HEADER.size:
+            raise SnapshotFormatError(f'{path} is not a library snapshot')
+
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.book_count, self.user_count,
+         self.loan_count, self.string_count, name_sid, date_sid,
+         self.journal_seq, self._books_at, self._users_at,
+         self._loans_at, self._index_at, self._data_at) = _HEADER.unpack_from(self._mm)
+
+        if magic != MAGIC:
+            raise SnapshotFormatError(f'{path} is not a library snapshot')
+        if version not in (1, VERSION):
+            raise SnapshotFormatError(f'Unsupported snapshot version {version}')
+        self._book = _BOOK if version == VERSION else _BOOK_V1
+
+        self.name = self.string(name_sid)
+        self.save_date = self.string(date_sid)
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    # --------------------------------------------------------
+    # Low-level decoding
+    # --------------------------------------------------------
+    def string(self, sid):
+        if sid == _NONE:
+            return None
+        offset, length = _SPAN.unpack_from(self._mm, self._index_at + sid * _SPAN.size)
+        start = self._data_at + offset
+        return self._mm[start:start + length].decode('utf-8')
+
+    def _book_fields(self, index):
+        if not 0 <= index < self.book_count:
+            raise IndexError(index)
+        return self._book.unpack_from(self._mm, self._books_at + index * self._book.size)
+
+    def _user_fields(self, index):
+        if not 0 <= index < self.user_count:
+            raise IndexError(index)
+        return _USER.unpack_from(self._mm, self._users_at + index * _USER.size)
+
+    # --------------------------------------------------------
+    # Keys (decode a single string, used by lazy loading)
+    # --------------------------------------------------------
+    def book_title(self, index):
+        return self.string(self._book_fields(index)[1])
+
+    def user_id_card(self, index):
+        return self.string(self._user_fields(index)[2])
+
+    # --------------------------------------------------------
+    # Records: (type name, dict in the to_dict format)
+    # --------------------------------------------------------
+    def book_record(self, index):
+        fields = self._book_fields(index)
+        if self._book is _BOOK_V1:
+            fields = fields[:5] + (1, fields[5]) + fields[5:]
+        (id, title, author, price, borrowed_times, copies,
+         available_copies, available, tag) = fields
+        type_name = _BOOK_TAGS[tag]
+        record = {
+            'type': type_name,
+            'id': id,
+            'title': self.string(title),
+            'author': self.string(author),
+            'price': price,
+            'available': bool(available),
+            '_Book__borrowed_times': borrowed_times,
+        }
+        if type_name == 'Holding':
+            record['copies'] = copies
+            record['available_copies'] = available_copies
+        return type_name, record
+
+    def user_record(self, index):
+        (id, name, id_card, subject, limit, first_loan,
+         loan_count, tag) = self._user_fields(index)
+
+        loans = [
+            self.string(_SID.unpack_from(self._mm, self._loans_at + i * _SID.size)[0])
+            for i in range(first_loan, first_loan + loan_count)
+        ]
+        type_name = _USER_TAGS[tag]
+        record = {
+            'type': type_name,
+            'id': id,
+            'name': self.string(name),
+            'id_card': self.string(id_card),
+            'lend_books': loans,
+        }
+        if type_name == 'Student':
+            record['subject'] = self.string(subject)
+        record['limit_books'] = None if limit == _NO_LIMIT else limit
+        return type_name, record
+
+    def iter_book_records(self):
+        for index in range(self.book_count):
+            yield self.book_record(index)
+
+    def iter_user_records(self):
+        for index in range(self.user_count):
+            yield self.user_record(index)
+
+    # --------------------------------------------------------
+    # Objects
+    # --------------------------------------------------------
+    def book(self, index):
+        type_name, record = self.book_record(index)
+        return decode_book(record, type_name)
+
+    def user(self, index):
+        type_name, record = self.user_record(index)
+        return decode_user(record, type_name)
+
+
+# ============================================================
+# CONVERTERS
+# ============================================================
+# Both directions stream the records: neither file is fully
+# loaded in memory. Untagged (version 1) JSON records get the
+# types chosen by serialization.book_type / user_type.
+def json_to_binary(json_path, binary_path):
+    with open(json_path, 'rb') as f, SnapshotWriter(binary_path) as writer:
+        for key, value, _, _ in iter_members(f, ('books', 'users')):
+            if key == 'books':
+                writer.add_book(value)
+            elif key == 'users':
+                writer.add_user(value)
+            elif key == 'name':
+                writer.name = value
+            elif key == 'schema_version':
+                check_version(value)
+            elif key == 'save_date':
+                writer.save_date = value
+            elif key == 'journal_seq':
+                writer.journal_seq = value
+
+
+def binary_to_json(binary_path, json_path):
+    with BinarySnapshot(binary_path) as snapshot:
+        members = [
+            ('name', snapshot.name),
+            ('schema_version', SCHEMA_VERSION),
+            ('users', (record for _, record in snapshot.iter_user_records())),
+            ('books', (record for _, record in snapshot.iter_book_records())),
+            ('save_date', snapshot.save_date),
+        ]
+        if snapshot.journal_seq:
+            members.append(('journal_seq', snapshot.journal_seq))
+
+        tmp_path = f'{json_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            dump_members(f, members)
+        os.replace(tmp_path, json_path)
+
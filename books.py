@@ -1,6 +1,8 @@
+from datetime import timedelta
 from typing import Protocol
 
 from exceptions import BookNotAvailable
+from observable import Observable
 
 
 # ============================================================
@@ -35,7 +37,33 @@ class BookProtocol(Protocol):
 # - Class methods
 # - Properties
 # - Business logic inside objects
-class Book:
+# - Observer pattern (indexes are notified of changes)
+class Book(Observable):
+
+    # --------------------------------------------------------
+    # Memory Layout
+    # --------------------------------------------------------
+    # __slots__ replaces the per-instance __dict__ with fixed
+    # attribute storage, which greatly reduces the memory used
+    # by large catalogs. `__borrowed_times` is name-mangled to
+    # `_Book__borrowed_times`, exactly like before.
+    __slots__ = (
+        '_listeners',
+        'id',
+        '_title',
+        'author',
+        'price',
+        '_available',
+        '__borrowed_times',
+    )
+
+    # --------------------------------------------------------
+    # Class Attribute (Configuration)
+    # --------------------------------------------------------
+    # A book is popular when it was borrowed more than this
+    # number of times. Shared by all books; subclasses or the
+    # application can override it (see popularity.py).
+    popular_threshold = 5
 
     # --------------------------------------------------------
     # Constructor
@@ -50,6 +78,10 @@ class Book:
             price: float,
             available: bool = True,
     ):
+        # Listeners notified when an observed attribute changes
+        # (e.g. the Library keeps its indexes up to date)
+        self._listeners = ()
+
         # Public attributes
         self.id = id  # Unique identifier for the book
         self.title = title  # Book title
@@ -61,6 +93,53 @@ class Book:
         # Keeps track of how many times the book has been borrowed
         self.__borrowed_times = 0
 
+    # --------------------------------------------------------
+    # Observed Properties
+    # --------------------------------------------------------
+    # `title` and `available` are used as keys by the Library
+    # indexes, so every change is announced to the listeners.
+    @property
+    def title(self):
+        return self._title
+
+    @title.setter
+    def title(self, value):
+        old = getattr(self, '_title', None)
+        self._title = value
+        if old is not None and old != value:
+            self._notify('title', old, value)
+
+    @property
+    def available(self):
+        return self._available
+
+    @available.setter
+    def available(self, value):
+        old = getattr(self, '_available', None)
+        self._available = value
+        if old is not None and old != value:
+            self._notify('available', old, value)
+
+    # --------------------------------------------------------
+    # Copy Counts
+    # --------------------------------------------------------
+    # A Book is a single copy. Holdings (holdings.py) own
+    # several copies and override these, so code that lends or
+    # returns by count works with both.
+    copies = 1
+
+    @property
+    def available_copies(self):
+        return 1 if self._available else 0
+
+    @available_copies.setter
+    def available_copies(self, value):
+        self.available = value > 0
+
+    @property
+    def lent_copies(self):
+        return 0 if self._available else 1
+
     # --------------------------------------------------------
     # Class Method
     # --------------------------------------------------------
@@ -93,8 +172,10 @@ class Book:
             # Domain-specific exception
             raise BookNotAvailable(f'{self.title} was not available')
 
-        self.available = False
+        # The counter is updated first so that listeners notified
+        # about availability already see the new lend count
         self.__borrowed_times += 1
+        self.available = False
 
         return (
             f'{self.title} was lent successfully. '
@@ -104,12 +185,23 @@ class Book:
     # --------------------------------------------------------
     # Behavior: return the book
     # --------------------------------------------------------
-    # Restores availability of the book.
+    # Restores availability of the book, unless the library it
+    # belongs to passes the copy on directly (see
+    # Library.return_hooks).
     def return_book(self):
-        if not self.available:
+        if not self.available and not self._handed_off():
             self.available = True
         return f'{self.title} was returned successfully.'
 
+    # Listeners may take a returned copy: take_returned(book)
+    # returns True when they did
+    def _handed_off(self):
+        for listener in self._listeners:
+            take = getattr(listener, 'take_returned', None)
+            if take is not None and take(self):
+                return True
+        return False
+
     # --------------------------------------------------------
     # Computed Property (Business Rule)
     # --------------------------------------------------------
@@ -117,7 +209,7 @@ class Book:
     # based on how many times it was borrowed.
     @property
     def is_popular(self):
-        return self.__borrowed_times > 5
+        return self.__borrowed_times > self.popular_threshold
 
     # --------------------------------------------------------
     # String Representation
@@ -146,7 +238,10 @@ class Book:
     @borrowed_times.setter
     def borrowed_times(self, value):
         if value > 0:
+            old = self.__borrowed_times
             self.__borrowed_times = value
+            if old != value:
+                self._notify('borrowed_times', old, value)
             return
         raise ValueError('The value of borrowed_times must be positive')
 
@@ -158,6 +253,31 @@ class Book:
     def all_description(self):
         return f'{self.title} by {self.author} -> Price: ${self.price}'
 
+    # --------------------------------------------------------
+    # Serialization
+    # --------------------------------------------------------
+    # Returns the persisted representation of the book.
+    # Keys match the historical format of library.json.
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'author': self.author,
+            'price': self.price,
+            'available': self.available,
+            '_Book__borrowed_times': self.__borrowed_times,
+        }
+
+
+# ============================================================
+# LOAN PERIODS
+# ============================================================
+# Readable form of a loan period: "7 days", "36 hours".
+def describe_period(period: timedelta) -> str:
+    if period % timedelta(days=1):
+        return f'{period // timedelta(hours=1)} hours'
+    return f'{period.days} days'
+
 
 # ============================================================
 # CHILD CLASS: PhysicalBook
@@ -166,12 +286,19 @@ class Book:
 # Demonstrates inheritance and polymorphism.
 class PhysicalBook(Book):
 
+    # No new attributes: keep instances without a __dict__
+    __slots__ = ()
+
     # --------------------------------------------------------
     # Polymorphic Method
     # --------------------------------------------------------
     # Physical books have a shorter loan period.
+    # The period is structured (see scheduler.py for due dates);
+    # duration_calculate() is its readable form.
+    loan_period = timedelta(days=7)
+
     def duration_calculate(self):
-        return "7 days"
+        return describe_period(self.loan_period)
 
 
 # ============================================================
@@ -180,9 +307,16 @@ class PhysicalBook(Book):
 # Inherits from Book and customizes behavior.
 class DigitalBook(Book):
 
+    # No new attributes: keep instances without a __dict__
+    __slots__ = ()
+
     # --------------------------------------------------------
     # Polymorphic Method
     # --------------------------------------------------------
     # Digital books allow longer borrowing periods.
+    # The period is structured (see scheduler.py for due dates);
+    # duration_calculate() is its readable form.
+    loan_period = timedelta(days=14)
+
     def duration_calculate(self):
-        return "14 days"
+        return describe_period(self.loan_period)
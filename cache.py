@@ -0,0 +1,171 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from exceptions import BookNotAvailable, UserNoFoudError
+
+
+# ============================================================
+# QUERY CACHE
+# ============================================================
+# Bounded LRU cache in front of the Library read queries:
+#
+#   find_book(title)     find_books(title)     find_user(id_card)
+#   books_available      available_count
+#
+# "Not found" answers are cached too (the error is raised again
+# on every hit).
+#
+# Invalidation is precise: the cache follows the Library
+# events and drops only the entries an event can change.
+# - lend / return           the availability entries
+# - book added / removed    that title + availability entries
+# - title changed           the old and the new title
+# - user added / removed    that id_card
+# - id_card changed         the old and the new id_card
+#
+# books_available is cached as a tuple: callers get an
+# immutable snapshot that later changes never alter.
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions invalidations maxsize currsize')
+
+# Marker of a cached "not found" answer
+_MISSING = object()
+
+_AVAILABILITY = (('available',), ('available_count',))
+
+
+class QueryCache:
+
+    def __init__(self, library, maxsize=1024) -> None:
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.library = library
+        self.maxsize = maxsize
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Bumped by every invalidation: a value computed while
+        # the library changed is returned but not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        library.subscribe(self._on_library_event)
+
+    def close(self):
+        """Stops following the library and empties the cache."""
+        self.library.unsubscribe(self._on_library_event)
+        self.clear()
+
+    # --------------------------------------------------------
+    # LRU storage
+    # --------------------------------------------------------
+    def _get(self, key, compute):
+        with self._lock:
+            value = self._entries.get(key, None)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._generation
+
+        value = compute()
+
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def _invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """Hit/miss statistics, like functools.lru_cache."""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self.invalidations, self.maxsize, len(self._entries))
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    # --------------------------------------------------------
+    # Cached queries
+    # --------------------------------------------------------
+    @staticmethod
+    def _title_key(title):
+        return title.strip().lower()
+
+    def find_book(self, title):
+        key = self._title_key(title)
+        books = self._get(('books', key), lambda: tuple(self.library.find_books(title)) or _MISSING)
+        if books is _MISSING:
+            raise BookNotAvailable(f'Book with title: {title} not found')
+        # Like Library.find_book: a copy on the shelf first
+        return next((book for book in books if book.available), books[0])
+
+    def find_books(self, title):
+        key = self._title_key(title)
+        books = self._get(('books', key), lambda: tuple(self.library.find_books(title)) or _MISSING)
+        return [] if books is _MISSING else list(books)
+
+    def find_user(self, id_card):
+        def lookup():
+            try:
+                return self.library.find_user(id_card)
+            except UserNoFoudError:
+                return _MISSING
+
+        user = self._get(('user', id_card), lookup)
+        if user is _MISSING:
+            raise UserNoFoudError(f'User with id card: {id_card} not found')
+        return user
+
+    @property
+    def books_available(self):
+        return self._get(('available',), lambda: tuple(self.library.books_available))
+
+    @property
+    def available_count(self):
+        return self._get(('available_count',), lambda: self.library.available_count)
+
+    # --------------------------------------------------------
+    # Invalidation
+    # --------------------------------------------------------
+    def _on_library_event(self, library, event, *args):
+        if event in ('book_added', 'book_removed'):
+            book = args[0]
+            self._invalidate(('books', self._title_key(book.title)), *_AVAILABILITY)
+
+        elif event == 'book_changed':
+            book, field, old, new = args
+            if field == 'available':
+                self._invalidate(*_AVAILABILITY)
+            elif field == 'title':
+                self._invalidate(('books', self._title_key(old)),
+                                 ('books', self._title_key(new)))
+
+        elif event in ('user_added', 'user_removed'):
+            self._invalidate(('user', args[0].id_card))
+
+        elif event == 'user_changed' and args[1] == 'id_card':
+            _, _, old, new = args
+            self._invalidate(('user', old), ('user', new))
@@ -0,0 +1,214 @@
+from array import array
+from itertools import compress
+
+from books import Book
+
+
+# ============================================================
+# COLUMNAR CATALOG
+# ============================================================
+# Column-oriented copy of the book catalog, kept next to
+# `Library.books` for bulk analytics.
+#
+# Each book attribute lives in its own typed array, one row per
+# book. Titles and authors are dictionary-encoded: the column
+# stores an integer code and a shared table stores each distinct
+# string once.
+#
+# Aggregations run over whole columns with built-ins implemented
+# in C (sum, map, itertools.compress), instead of reading one
+# attribute at a time from Python objects.
+#
+# price_mask is the exception: a two-sided bound takes two map
+# passes plus a combining one, which measures slower (~0.14s per
+# million rows) than a single generator with a chained
+# comparison (~0.10s). It still reads the typed column, not
+# Book objects.
+#
+# The catalog subscribes to the Library, so it stays in sync
+# with added/removed books and with lend/return/rename events.
+# Attributes that are not observed (price, author) can be
+# re-read with `refresh(book)`.
+class ColumnarCatalog:
+
+    def __init__(self, library=None) -> None:
+        # Typed columns (row i describes the book self._books[i])
+        self.ids = array('q')
+        self.prices = array('d')
+        self.available = array('B')
+        self.borrowed_times = array('q')
+        self.title_codes = array('l')
+        self.author_codes = array('l')
+
+        # Dictionary encoding: code -> string, string -> code
+        self.titles = []
+        self.authors = []
+        self._title_codes = {}
+        self._author_codes = {}
+
+        # Row -> Book object, and Book object -> row
+        self._books = []
+        self._rows = {}
+
+        self._library = None
+        if library is not None:
+            self.attach(library)
+
+    def __len__(self):
+        return len(self._books)
+
+    # --------------------------------------------------------
+    # Synchronization with a Library
+    # --------------------------------------------------------
+    def attach(self, library):
+        """Loads the library's books and follows its changes."""
+        self.detach()
+        self._library = library
+        for book in library.books:
+            self.add(book)
+        library.subscribe(self._on_library_event)
+
+    def detach(self):
+        if self._library is not None:
+            self._library.unsubscribe(self._on_library_event)
+            self._library = None
+
+    def _on_library_event(self, library, event, *args):
+        if event == 'book_added':
+            self.add(args[0])
+        elif event == 'book_removed':
+            self.remove(args[0])
+        elif event == 'book_changed':
+            self.refresh(args[0])
+
+    # --------------------------------------------------------
+    # Row maintenance
+    # --------------------------------------------------------
+    @staticmethod
+    def _encode(value, codes, table):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(table)
+            table.append(value)
+        return code
+
+    def add(self, book):
+        if book in self._rows:
+            return
+
+        self._rows[book] = len(self._books)
+        self._books.append(book)
+
+        self.ids.append(book.id)
+        self.prices.append(book.price)
+        self.available.append(1 if book.available else 0)
+        self.borrowed_times.append(book.borrowed_times)
+        self.title_codes.append(self._encode(book.title, self._title_codes, self.titles))
+        self.author_codes.append(self._encode(book.author, self._author_codes, self.authors))
+
+    # Removal moves the last row into the freed slot (O(1))
+    def remove(self, book):
+        row = self._rows.pop(book, None)
+        if row is None:
+            return
+
+        last = len(self._books) - 1
+        columns = (self.ids, self.prices, self.available,
+                   self.borrowed_times, self.title_codes, self.author_codes)
+
+        if row != last:
+            moved = self._books[last]
+            self._books[row] = moved
+            self._rows[moved] = row
+            for column in columns:
+                column[row] = column[last]
+
+        self._books.pop()
+        for column in columns:
+            column.pop()
+
+    def refresh(self, book):
+        """Copies the current attributes of a book into its row."""
+        row = self._rows.get(book)
+        if row is None:
+            return
+
+        self.ids[row] = book.id
+        self.prices[row] = book.price
+        self.available[row] = 1 if book.available else 0
+        self.borrowed_times[row] = book.borrowed_times
+        self.title_codes[row] = self._encode(book.title, self._title_codes, self.titles)
+        self.author_codes[row] = self._encode(book.author, self._author_codes, self.authors)
+
+    # --------------------------------------------------------
+    # Row masks (one 0/1 flag per row)
+    # --------------------------------------------------------
+    def popular_mask(self, threshold=None):
+        """Rows whose borrowed_times is greater than threshold."""
+        if threshold is None:
+            threshold = Book.popular_threshold
+        return array('B', map(threshold.__lt__, self.borrowed_times))
+
+    def author_mask(self, author):
+        code = self._author_codes.get(author, -1)
+        return array('B', map(code.__eq__, self.author_codes))
+
+    # Python-level loop over the column (see above)
+    def price_mask(self, low, high):
+        """Rows with low <= price <= high."""
+        return array('B', (low <= price <= high for price in self.prices))
+
+    @staticmethod
+    def combine(*masks):
+        """Logical AND of several masks."""
+        return array('B', map(min, *masks)) if len(masks) > 1 else masks[0]
+
+    # --------------------------------------------------------
+    # Aggregations
+    # --------------------------------------------------------
+    @property
+    def available_count(self):
+        return sum(self.available)
+
+    def popular_count(self, threshold=None):
+        if threshold is None:
+            threshold = Book.popular_threshold
+        return sum(map(threshold.__lt__, self.borrowed_times))
+
+    def total_value(self, mask=None):
+        """Sum of the prices (of the rows selected by mask)."""
+        if mask is None:
+            return sum(self.prices)
+        return sum(compress(self.prices, mask))
+
+    def count_by_author(self):
+        """Number of books per author."""
+        counts = [0] * len(self.authors)
+        for code in self.author_codes:
+            counts[code] += 1
+        return {
+            author: count
+            for author, count in zip(self.authors, counts)
+            if count
+        }
+
+    # --------------------------------------------------------
+    # Object views
+    # --------------------------------------------------------
+    # Code that needs real objects gets the Book instances
+    # behind the selected rows.
+    def book(self, row):
+        return self._books[row]
+
+    def books_where(self, mask):
+        return list(compress(self._books, mask))
+
+    @property
+    def books_available(self):
+        return self.books_where(self.available)
+
+    def popular_books(self, threshold=None):
+        return self.books_where(self.popular_mask(threshold))
+
+    def books_by_author(self, author):
+        return self.books_where(self.author_mask(author))
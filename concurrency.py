@@ -0,0 +1,132 @@
+import threading
+import zlib
+
+from exceptions import BookNotAvailable, LibraryError
+
+
+# ============================================================
+# CONCURRENCY LAYER
+# ============================================================
+# Makes lending safe when several worker threads share one
+# Library.
+#
+# Book.lend performs a check-then-set on `available` and
+# Student.book_request a check-then-append on `lend_books`:
+# two threads can interleave between the check and the update.
+#
+# ConcurrentLibrary serializes only the operations that touch
+# the same data, with two families of striped locks:
+# - title locks: one per group of titles (all the copies of a
+#   title share the same lock)
+# - user locks: one per group of id_cards
+#
+# Locks are always taken in the same order (title, then user)
+# and an operation holds at most one lock of each family, so
+# operations never deadlock. Operations on different users and
+# titles never wait for each other.
+#
+# This makes threads safe, not faster: lending is pure Python,
+# so under CPython's GIL the throughput stays flat as threads
+# are added (see benchmarks/concurrency.py). To spread the work
+# over several cores, use ShardedLibrary (sharding.py), which
+# runs one worker process per shard.
+#
+# A returned copy handed to the next patron waiting for it
+# (reservations.py) is lent through pass_on(), under the user
+# lock of that patron: the user lock of the patron returning
+# it is released first.
+class ConcurrentLibrary:
+
+    def __init__(self, library, stripes=256) -> None:
+        self.library = library
+        self._title_locks = [threading.Lock() for _ in range(stripes)]
+        self._user_locks = [threading.Lock() for _ in range(stripes)]
+
+    # --------------------------------------------------------
+    # Lock selection (stable across runs, unlike hash())
+    # --------------------------------------------------------
+    def _title_lock(self, title):
+        key = title.strip().lower().encode('utf-8')
+        return self._title_locks[zlib.crc32(key) % len(self._title_locks)]
+
+    def _user_lock(self, id_card):
+        key = str(id_card).encode('utf-8')
+        return self._user_locks[zlib.crc32(key) % len(self._user_locks)]
+
+    # --------------------------------------------------------
+    # Read operations (index lookups are atomic)
+    # --------------------------------------------------------
+    def find_user(self, id_card):
+        return self.library.find_user(id_card)
+
+    def find_book(self, title):
+        return self.library.find_book(title)
+
+    # --------------------------------------------------------
+    # Behavior: lend a copy of a title to a user
+    # --------------------------------------------------------
+    # Checks the borrowing limit and the availability, then
+    # runs the domain methods (User.book_request, Book.lend)
+    # under the user and title locks: the loan is validated
+    # and recorded exactly as in the single-threaded path.
+    def lend(self, id_card, title):
+        user = self.library.find_user(id_card)
+
+        with self._title_lock(title), self._user_lock(user.id_card):
+            self._check_limit(user)
+
+            for book in self.library.find_books(title):
+                if book.available:
+                    user.book_request(book.title)
+                    return book.lend()
+
+        raise BookNotAvailable(f'{title} was not available')
+
+    # book_request of a Student at its limit answers with a
+    # message instead of failing: the limit is checked first
+    @staticmethod
+    def _check_limit(user):
+        if user.limit_books is not None and len(user.lend_books) >= user.limit_books:
+            raise LibraryError(
+                f'You have reached the limit of {user.limit_books} borrowed books'
+            )
+
+    # --------------------------------------------------------
+    # Behavior: return a copy borrowed by a user
+    # --------------------------------------------------------
+    # Loans that were not recorded (User.records_loans, e.g.
+    # Teachers) cannot be checked: any lent copy will do.
+    def return_book(self, id_card, title):
+        user = self.library.find_user(id_card)
+
+        with self._title_lock(title):
+            with self._user_lock(user.id_card):
+                book = next(
+                    (
+                        book for book in self.library.find_books(title)
+                        if book.lent_copies and (
+                            book.title in user.lend_books or not user.records_loans
+                        )
+                    ),
+                    None,
+                )
+                if book is None:
+                    raise LibraryError(f'{id_card} has not borrowed {title}')
+                if book.title in user.lend_books:
+                    user.lend_books.remove(book.title)
+            return book.return_book()
+
+    # --------------------------------------------------------
+    # Behavior: pass a returned copy on to a user
+    # --------------------------------------------------------
+    # The copy stays lent: its lend count goes up and the loan
+    # goes through book_request, as a regular lend would.
+    # Called while the title lock is held (during return_book);
+    # returns False when the user reached their limit.
+    def pass_on(self, user, book):
+        with self._user_lock(user.id_card):
+            if user.limit_books is not None and len(user.lend_books) >= user.limit_books:
+                return False
+            book.borrowed_times = book.borrowed_times + 1
+            user.book_request(book.title)
+            return True
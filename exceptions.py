@@ -49,3 +49,31 @@ class BookNotAvailable(LibraryError):
 # This is a domain-level exception, not a technical one.
 class UserNoFoudError(LibraryError):
     pass
+
+
+# ============================================================
+# BATCH ERROR
+# ============================================================
+# Raised when at least one operation of a batch is invalid.
+# No operation of the batch is applied in that case.
+#
+# `failures` is a list of (index, operation, error) tuples,
+# one per rejected operation.
+class BatchError(LibraryError):
+
+    def __init__(self, failures):
+        self.failures = failures
+        details = '; '.join(
+            f'#{index} {operation}: {error}'
+            for index, operation, error in failures
+        )
+        super().__init__(f'{len(failures)} operation(s) rejected: {details}')
+
+
+# ============================================================
+# HOLD ERROR
+# ============================================================
+# Raised when a hold (reservation) cannot be placed or
+# cancelled, e.g. a patron holding the same title twice.
+class HoldError(LibraryError):
+    pass
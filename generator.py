@@ -0,0 +1,343 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from binary_snapshot import SnapshotWriter
+from json_stream import dump_members, indent
+from serialization import SCHEMA_VERSION, decode_book, decode_user
+
+# ============================================================
+# SYNTHETIC LIBRARY GENERATOR
+# ============================================================
+# Streams arbitrarily large, reproducible libraries for load
+# tests of persistence, lookups and concurrency.
+#
+# Every record is a pure function of (seed, index): nothing is
+# kept in memory, any record can be produced independently (and
+# therefore in parallel), and the same seed always produces the
+# same library.
+#
+# Consistency between books and users:
+# each user owns LOAN_SLOTS loan slots; slot x is mapped to book
+# id permutation(x), a bijection, so a copy is never held by two
+# users. A book is lent exactly when its slot is filled, and the
+# holder's lend_books contains its title.
+#
+# Distributions:
+# - authors: power law (a few very prolific authors)
+# - titles: composed from word pools, some repeated (copies)
+# - prices: log-normal around $15
+# - borrowed_times: heavy tailed, at least 1 for lent books
+#
+# Usage:
+#     python generator.py --books 1000000 --users 100000 \
+#         --format json --output big.json --processes 8
+
+LOAN_SLOTS = 3
+
+_FIRST_NAMES = [
+    'Alejandro', 'Mariana', 'Carlos', 'Lucía', 'Roberto', 'Elena', 'Mateo',
+    'Sofía', 'Diego', 'Valeria', 'Ana', 'Jorge', 'Camila', 'Andrés', 'Paula',
+    'Miguel', 'Isabel', 'Tomás', 'Gabriela', 'Javier', 'Emma', 'Daniel',
+]
+_LAST_NAMES = [
+    'Ruiz', 'López', 'Mendoza', 'Fernández', 'Gómez', 'Torres', 'Rivas',
+    'Castro', 'Herrera', 'Ortiz', 'García', 'Márquez', 'Cortázar', 'Austen',
+    'Orwell', 'Bradbury', 'King', 'Cervantes', 'Tolkien', 'Borges', 'Allende',
+]
+_SUBJECTS = [
+    'Ingeniería de Software', 'Medicina', 'Derecho', 'Psicología',
+    'Arquitectura', 'Diseño Gráfico', 'Economía', 'Biología', 'Historia',
+    'Filosofía',
+]
+_TITLE_OPENINGS = [
+    'El', 'La', 'Los', 'Las', 'Crónica de', 'Historia de', 'Memorias de',
+    'The', 'A', 'Song of', 'Return of', 'Cien años de',
+]
+_TITLE_NOUNS = [
+    'soledad', 'principito', 'hobbit', 'resplandor', 'laberinto', 'ciudad',
+    'río', 'viento', 'sombra', 'jardín', 'mar', 'noche', 'guerra', 'amor',
+    'tiempo', 'silencio', 'espejo', 'camino', 'fuego', 'isla', 'reino',
+    'garden', 'shadow', 'river', 'empire', 'winter', 'stranger', 'kingdom',
+]
+_TITLE_ENDINGS = [
+    '', '', '', 'perdido', 'eterno', 'de la Mancha', 'anunciada', 'infinito',
+    'del norte', 'secreto', 'of Glass', 'in the Dark', 'Revisited',
+]
+
+
+# ============================================================
+# DETERMINISTIC RANDOMNESS
+# ============================================================
+# splitmix64: a fast hash giving independent uniform numbers
+# for any (seed, stream, index) triple.
+_MASK = (1 << 64) - 1
+
+
+def _mix(seed, stream, index):
+    z = (seed * 0x9E3779B97F4A7C15 + stream * 0xBF58476D1CE4E5B9 + index) & _MASK
+    z = (z + 0x9E3779B97F4A7C15) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    z ^= z >> 31
+    return z
+
+
+def _uniform(seed, stream, index):
+    """Uniform float in [0, 1)."""
+    return (_mix(seed, stream, index) >> 11) / (1 << 53)
+
+
+def _pick(pool, seed, stream, index):
+    return pool[_mix(seed, stream, index) % len(pool)]
+
+
+# Streams (independent random sequences per attribute)
+(_S_TYPE, _S_OPENING, _S_NOUN, _S_ENDING, _S_AUTHOR, _S_PRICE,
+ _S_PRICE2, _S_TIMES, _S_FIRST, _S_LAST, _S_SUBJECT, _S_USER_TYPE,
+ _S_LOAN, _S_TITLE_COPY) = range(14)
+
+
+# ============================================================
+# GENERATOR
+# ============================================================
+class LibraryGenerator:
+
+    def __init__(
+            self,
+            books: int,
+            users: int,
+            seed: int = 0,
+            name: str = 'Synthetic Library',
+            digital_ratio: float = 0.2,
+            teacher_ratio: float = 0.1,
+            lent_ratio: float = 0.3,
+    ):
+        self.book_count = books
+        self.user_count = users
+        self.seed = seed
+        self.name = name
+        self.digital_ratio = digital_ratio
+        self.teacher_ratio = teacher_ratio
+
+        # Power-law author pool (~1 author per 20 books)
+        self._authors = max(1, books // 20)
+
+        # Loan slots -> book ids: affine permutation over books
+        slots = min(users * LOAN_SLOTS, books)
+        self._fill = min(1.0, lent_ratio * books / slots) if slots else 0.0
+        self._slots = slots
+        if books:
+            multiplier = (_mix(seed, 99, 0) % books) | 1
+            while math.gcd(multiplier, books) != 1:
+                multiplier += 2
+            self._multiplier = multiplier
+            self._inverse = pow(multiplier, -1, books)
+            self._offset = _mix(seed, 98, 0) % books
+
+    # --------------------------------------------------------
+    # Loans
+    # --------------------------------------------------------
+    def _slot_book(self, slot):
+        """0-based book index held through a loan slot."""
+        return (self._multiplier * slot + self._offset) % self.book_count
+
+    def _book_slot(self, index):
+        return ((index - self._offset) * self._inverse) % self.book_count
+
+    def _slot_filled(self, slot):
+        return slot < self._slots and _uniform(self.seed, _S_LOAN, slot) < self._fill
+
+    # --------------------------------------------------------
+    # Attributes
+    # --------------------------------------------------------
+    def title(self, index):
+        # ~5% of the books are extra copies of an earlier title
+        if index and _uniform(self.seed, _S_TITLE_COPY, index) < 0.05:
+            index = _mix(self.seed, _S_TITLE_COPY, ~index & _MASK) % index
+
+        opening = _pick(_TITLE_OPENINGS, self.seed, _S_OPENING, index)
+        noun = _pick(_TITLE_NOUNS, self.seed, _S_NOUN, index)
+        ending = _pick(_TITLE_ENDINGS, self.seed, _S_ENDING, index)
+        words = [opening, noun, ending] if ending else [opening, noun]
+        return ' '.join(words) + f' {index + 1}'
+
+    def author(self, index):
+        # Log-uniform rank: rank r is chosen with probability ~1/r
+        rank = int(self._authors ** _uniform(self.seed, _S_AUTHOR, index)) - 1
+        first = _FIRST_NAMES[rank % len(_FIRST_NAMES)]
+        last = _LAST_NAMES[(rank // len(_FIRST_NAMES)) % len(_LAST_NAMES)]
+        return f'{first} {last} {rank}' if rank >= 400 else f'{first} {last}'
+
+    def price(self, index):
+        # Box-Muller normal -> log-normal price
+        u1 = _uniform(self.seed, _S_PRICE, index) or 1e-12
+        u2 = _uniform(self.seed, _S_PRICE2, index)
+        normal = math.sqrt(-2 * math.log(u1)) * math.cos(2 * math.pi * u2)
+        return round(math.exp(2.7 + 0.45 * normal), 2)
+
+    # --------------------------------------------------------
+    # Records (tagged, same format as serialization.encode)
+    # --------------------------------------------------------
+    def book_record(self, index):
+        """(type name, record) of the book at 0-based index."""
+        lent = self._slot_filled(self._book_slot(index))
+        times = int(_uniform(self.seed, _S_TIMES, index) ** -0.8) - 1
+        if lent:
+            times = max(times, 1)
+
+        digital = _uniform(self.seed, _S_TYPE, index) < self.digital_ratio
+        type_name = 'DigitalBook' if digital else 'PhysicalBook'
+        return type_name, {
+            'type': type_name,
+            'id': index + 1,
+            'title': self.title(index),
+            'author': self.author(index),
+            'price': self.price(index),
+            'available': not lent,
+            '_Book__borrowed_times': times,
+        }
+
+    def user_record(self, index):
+        """(type name, record) of the user at 0-based index."""
+        teacher = _uniform(self.seed, _S_USER_TYPE, index) < self.teacher_ratio
+        first = _pick(_FIRST_NAMES, self.seed, _S_FIRST, index)
+        last = _pick(_LAST_NAMES, self.seed, _S_LAST, index)
+
+        loans = [
+            self.title(self._slot_book(slot))
+            for slot in range(index * LOAN_SLOTS, (index + 1) * LOAN_SLOTS)
+            if self._slot_filled(slot)
+        ]
+
+        record = {
+            'type': 'Teacher' if teacher else 'Student',
+            'id': index + 1,
+            'name': f'{first} {last}',
+            'id_card': f'{"TEA" if teacher else "STU"}{index + 1:08d}',
+            'lend_books': loans,
+        }
+        if teacher:
+            record['limit_books'] = None
+            return 'Teacher', record
+
+        record['subject'] = _pick(_SUBJECTS, self.seed, _S_SUBJECT, index)
+        record['limit_books'] = 3
+        return 'Student', record
+
+    # --------------------------------------------------------
+    # Streams
+    # --------------------------------------------------------
+    def iter_book_records(self, start=0, stop=None):
+        for index in range(start, self.book_count if stop is None else stop):
+            yield self.book_record(index)
+
+    def iter_user_records(self, start=0, stop=None):
+        for index in range(start, self.user_count if stop is None else stop):
+            yield self.user_record(index)
+
+    def books(self):
+        """Book objects, created one at a time."""
+        for type_name, record in self.iter_book_records():
+            yield decode_book(record, type_name)
+
+    def users(self):
+        """User objects, created one at a time."""
+        for type_name, record in self.iter_user_records():
+            yield decode_user(record, type_name)
+
+    # --------------------------------------------------------
+    # Writers
+    # --------------------------------------------------------
+    def write_json(self, path, processes=1, chunk_size=100_000):
+        """Writes library.json format (identical to save_data)."""
+        if processes > 1:
+            return self._write_json_parallel(path, processes, chunk_size)
+
+        members = [
+            ('name', self.name),
+            ('schema_version', SCHEMA_VERSION),
+            ('users', (record for _, record in self.iter_user_records())),
+            ('books', (record for _, record in self.iter_book_records())),
+            ('save_date', datetime.now().strftime('%d/%m/%Y %H:%M:%S')),
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            dump_members(f, members)
+
+    def write_binary(self, path):
+        """Writes the binary snapshot format."""
+        with SnapshotWriter(path) as writer:
+            writer.name = self.name
+            writer.save_date = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+            for type_name, record in self.iter_book_records():
+                writer.add_book(record, type_name)
+            for type_name, record in self.iter_user_records():
+                writer.add_user(record, type_name)
+
+    # Each worker formats a range of records into its own part
+    # file; the parts are then concatenated in order.
+    def _write_json_parallel(self, path, processes, chunk_size):
+        workdir = tempfile.mkdtemp(prefix='library-gen-', dir=os.path.dirname(os.path.abspath(path)))
+        jobs = [
+            (kind, start, min(start + chunk_size, total), os.path.join(workdir, f'{kind}-{start}'))
+            for kind, total in (('users', self.user_count), ('books', self.book_count))
+            for start in range(0, total, chunk_size)
+        ]
+
+        try:
+            with ProcessPoolExecutor(processes) as pool:
+                list(pool.map(self._write_part, jobs))
+
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('{\n    "name": ' + json.dumps(self.name, ensure_ascii=False))
+                f.write(f',\n    "schema_version": {SCHEMA_VERSION}')
+                for kind in ('users', 'books'):
+                    parts = [job for job in jobs if job[0] == kind]
+                    f.write(f',\n    "{kind}": ' + ('[' if parts else '[]'))
+                    for position, (_, _, _, part) in enumerate(parts):
+                        if position:
+                            f.write(',')
+                        with open(part, 'r', encoding='utf-8') as source:
+                            shutil.copyfileobj(source, f)
+                    if parts:
+                        f.write('\n    ]')
+                save_date = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+                f.write(f',\n    "save_date": "{save_date}"\n}}')
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _write_part(self, job):
+        kind, start, stop, part = job
+        records = self.iter_user_records if kind == 'users' else self.iter_book_records
+        with open(part, 'w', encoding='utf-8') as f:
+            separator = '\n        '
+            for _, record in records(start, stop):
+                f.write(separator + indent(json.dumps(record, indent=4, ensure_ascii=False), 2))
+                separator = ',\n        '
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic library generator')
+    parser.add_argument('--books', type=int, required=True)
+    parser.add_argument('--users', type=int, required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--format', choices=('json', 'binary'), default='json')
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--processes', type=int, default=1,
+                        help='worker processes (JSON format only)')
+    args = parser.parse_args()
+
+    generator = LibraryGenerator(args.books, args.users, seed=args.seed)
+    if args.format == 'binary':
+        generator.write_binary(args.output)
+    else:
+        generator.write_json(args.output, processes=args.processes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import threading
+
+from books import PhysicalBook
+from exceptions import BookNotAvailable
+
+
+# ============================================================
+# HOLDINGS
+# ============================================================
+# A Holding is one title record owning several identical
+# copies, counted instead of stored one object per copy:
+#
+#   Holding(7, '1984', 'George Orwell', 15.5, copies=40)
+#
+# It replaces 40 PhysicalBook objects with one, so memory, the
+# title index and every title lookup shrink with the number of
+# copies.
+#
+# - lend() / return_book() decrement / increment the available
+#   copies under a lock, so concurrent lends never take more
+#   copies than the holding owns
+# - `available` stays True while at least one copy is on the
+#   shelf, so the Library availability index, find_book and
+#   the lending code work unchanged
+# - every change of `available_copies` is announced like any
+#   other observed attribute (journal, cache, ...)
+#
+# Existing catalogs with duplicated copies can be converted with
+# consolidate().
+
+# Striped locks: holdings share a small pool instead of carrying
+# one lock each (locks cannot live in __slots__ cheaply)
+_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _lock(holding):
+    return _LOCKS[id(holding) >> 4 & 63]
+
+
+class Holding(PhysicalBook):
+
+    __slots__ = ('copies', '_available_copies')
+
+    def __init__(
+            self,
+            id: int,
+            title: str,
+            author: str,
+            price: float,
+            copies: int = 1,
+            available_copies: int = None,
+    ):
+        if copies < 1:
+            raise ValueError('A holding owns at least one copy')
+        if available_copies is None:
+            available_copies = copies
+        if not 0 <= available_copies <= copies:
+            raise ValueError('available_copies must be between 0 and copies')
+
+        self.copies = copies
+        self._available_copies = available_copies
+        super().__init__(id, title, author, price, available=available_copies > 0)
+
+    # --------------------------------------------------------
+    # Observed copy count
+    # --------------------------------------------------------
+    # `available` follows the count: it only changes when the
+    # last copy leaves or the first one comes back.
+    @property
+    def available_copies(self):
+        return self._available_copies
+
+    @available_copies.setter
+    def available_copies(self, value):
+        if not 0 <= value <= self.copies:
+            raise ValueError('available_copies must be between 0 and copies')
+        old = self._available_copies
+        self._available_copies = value
+        if old != value:
+            self._notify('available_copies', old, value)
+        self.available = value > 0
+
+    @property
+    def lent_copies(self):
+        return self.copies - self._available_copies
+
+    # --------------------------------------------------------
+    # Behavior: lend / return one copy
+    # --------------------------------------------------------
+    def lend(self):
+        with _lock(self):
+            if self._available_copies == 0:
+                raise BookNotAvailable(f'{self.title} was not available')
+
+            # Counter first, like Book.lend
+            self.borrowed_times = self.borrowed_times + 1
+            self.available_copies = self._available_copies - 1
+
+        return (
+            f'{self.title} was lent successfully. '
+            f'Total lends: {self.borrowed_times} '
+            f'({self._available_copies}/{self.copies} copies left)'
+        )
+
+    # The copy may be handed off (Library.return_hooks) outside
+    # the lock: the hand-off takes the holder's locks
+    def return_book(self):
+        if self.lent_copies and not self._handed_off():
+            with _lock(self):
+                if self._available_copies < self.copies:
+                    self.available_copies = self._available_copies + 1
+        return f'{self.title} was returned successfully.'
+
+    def __str__(self):
+        return (
+            f'{self.id} - {self.title} - {self.author} - {self.price} - '
+            f'Available: {self._available_copies}/{self.copies}'
+        )
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['copies'] = self.copies
+        data['available_copies'] = self._available_copies
+        return data
+
+
+# ============================================================
+# HELPERS
+# ============================================================
+# Available copies per title: {title: (available, total)}.
+# Reads the Library availability index, so titles with every
+# copy out are not listed.
+def availability(library):
+    result = {}
+    for book in library.books_available:
+        available, total = result.get(book.title, (0, 0))
+        result[book.title] = (available + book.available_copies, total + book.copies)
+    return result
+
+
+# Merges the identical PhysicalBook copies of a library (same
+# title, author and price) into Holdings. The holding keeps the
+# id of the first copy, the sum of the lend counts and the
+# number of copies on the shelf; loans recorded by title on the
+# users stay valid.
+#
+# Returns the list of holdings created.
+def consolidate(library):
+    groups = {}
+    for book in library.books:
+        if type(book) is PhysicalBook:
+            key = (book.title.strip().lower(), book.author, book.price)
+            groups.setdefault(key, []).append(book)
+
+    holdings = {}
+    for copies in groups.values():
+        if len(copies) < 2:
+            continue
+        first = copies[0]
+        holding = Holding(
+            first.id,
+            first.title,
+            first.author,
+            first.price,
+            copies=len(copies),
+            available_copies=sum(1 for book in copies if book.available),
+        )
+        holding._Book__borrowed_times = sum(book.borrowed_times for book in copies)
+        holdings[first] = holding
+        for book in copies[1:]:
+            holdings[book] = None
+
+    if not holdings:
+        return []
+
+    # One pass over the list instead of a remove() per copy;
+    # the list callbacks then keep the indexes in sync
+    books = library.books
+    dropped = [book for book in books if book in holdings]
+    kept = [holdings.get(book, book) for book in books]
+    list.__setitem__(books, slice(None), [book for book in kept if book is not None])
+    for book in dropped:
+        books._removed(book)
+
+    created = [holding for holding in holdings.values() if holding is not None]
+    for holding in created:
+        books._added(holding)
+    return created
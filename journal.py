@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+
+from exceptions import LibraryError
+from serialization import encode
+
+
+# ============================================================
+# JOURNAL MODULE
+# ============================================================
+# Write-ahead journal of library domain events.
+#
+# Instead of rewriting the whole library after each change,
+# the persistence layer appends the new events (one JSON object
+# per line) and only writes a full snapshot from time to time.
+#
+# Loading = last snapshot + replay of the journal tail.
+#
+# Every event carries a sequence number; the snapshot stores
+# the last sequence it includes, so a crash between writing a
+# snapshot and truncating the journal never applies an event
+# twice.
+
+
+# ============================================================
+# JOURNAL FILE
+# ============================================================
+# Append-only file of JSON lines.
+class Journal:
+
+    def __init__(self, path) -> None:
+        self.path = path
+
+    # --------------------------------------------------------
+    # Read all the complete events
+    # --------------------------------------------------------
+    # A crash while appending can leave a partial last line.
+    # It is discarded, and the file is truncated to the last
+    # complete event so new appends start on a clean line.
+    def read(self):
+        events = []
+        valid_size = 0
+
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return events
+
+        with f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    break
+                valid_size += len(line)
+
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+
+        if size != valid_size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_size)
+
+        return events
+
+    # --------------------------------------------------------
+    # Append events durably
+    # --------------------------------------------------------
+    def append(self, events):
+        if not events:
+            return
+
+        lines = ''.join(
+            json.dumps(event, ensure_ascii=False) + '\n'
+            for event in events
+        )
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # --------------------------------------------------------
+    # Discard every event (after a snapshot)
+    # --------------------------------------------------------
+    def reset(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# ============================================================
+# EVENT RECORDER
+# ============================================================
+# Library listener that converts domain notifications into
+# serializable journal events and buffers them until saved.
+class EventRecorder:
+
+    def __init__(self, seq=0) -> None:
+        self.seq = seq  # Sequence number of the last event
+        self.pending = []
+
+        # Events may come from several threads (see concurrency.py)
+        self._lock = threading.Lock()
+
+    def __call__(self, library, event, *args):
+        record = self._convert(event, *args)
+        if record is None:
+            return
+
+        with self._lock:
+            self.seq += 1
+            record['seq'] = self.seq
+            self.pending.append(record)
+
+    def drain(self):
+        """Returns and forgets the buffered events."""
+        with self._lock:
+            events, self.pending = self.pending, []
+        return events
+
+    # --------------------------------------------------------
+    # Notification -> event
+    # --------------------------------------------------------
+    @staticmethod
+    def _convert(event, *args):
+        if event == 'book_added':
+            return {'event': 'book_added', 'record': encode(args[0])}
+
+        if event == 'book_removed':
+            book = args[0]
+            return {'event': 'book_removed', 'id': book.id, 'title': book.title}
+
+        if event == 'user_added':
+            return {'event': 'user_added', 'record': encode(args[0])}
+
+        if event == 'user_removed':
+            return {'event': 'user_removed', 'id_card': args[0].id_card}
+
+        if event == 'book_changed':
+            book, field, old, new = args
+            if field == 'available':
+                return {
+                    'event': 'return' if new else 'lend',
+                    'id': book.id,
+                    'title': book.title,
+                    'borrowed_times': book.borrowed_times,
+                }
+            return {
+                'event': 'book_updated',
+                'id': book.id,
+                # Books are located by title: use the old one
+                'title': old if field == 'title' else book.title,
+                'field': field,
+                'value': new,
+            }
+
+        if event == 'user_changed':
+            user, field, old, new = args
+            if field == 'id_card':
+                return {'event': 'user_updated', 'id_card': old,
+                        'field': field, 'value': new}
+            if field == 'loan_added':
+                return {'event': 'loan_added', 'id_card': user.id_card,
+                        'title': new}
+            if field == 'loan_removed':
+                return {'event': 'loan_removed', 'id_card': user.id_card,
+                        'title': old}
+
+        return None
+
+
+# ============================================================
+# REPLAY
+# ============================================================
+# Applies journal events (with seq > after_seq) to a library.
+# `build_book` / `build_user` turn a record into an object.
+#
+# Returns the sequence number of the last applied event.
+def replay(library, events, build_book, build_user, after_seq=0):
+    seq = after_seq
+
+    for event in events:
+        if event['seq'] <= after_seq:
+            continue
+
+        kind = event['event']
+
+        if kind == 'book_added':
+            library.books.append(build_book(event['record']))
+        elif kind == 'user_added':
+            library.users.append(build_user(event['record']))
+        elif kind == 'book_removed':
+            library.books.remove(_find_book(library, event))
+        elif kind == 'user_removed':
+            library.users.remove(library.find_user(event['id_card']))
+        elif kind in ('lend', 'return'):
+            book = _find_book(library, event)
+            book._Book__borrowed_times = event['borrowed_times']
+            book.available = kind == 'return'
+        elif kind == 'book_updated':
+            book = _find_book(library, event)
+            if event['field'] == 'borrowed_times':
+                book._Book__borrowed_times = event['value']
+            else:
+                setattr(book, event['field'], event['value'])
+        elif kind == 'user_updated':
+            user = library.find_user(event['id_card'])
+            setattr(user, event['field'], event['value'])
+        elif kind == 'loan_added':
+            library.find_user(event['id_card']).lend_books.append(event['title'])
+        elif kind == 'loan_removed':
+            library.find_user(event['id_card']).lend_books.remove(event['title'])
+        else:
+            raise LibraryError(f'Unknown journal event: {kind}')
+
+        seq = event['seq']
+
+    return seq
+
+
+# Resolves the book an event refers to (by title, then id).
+def _find_book(library, event):
+    for book in library.find_books(event['title']):
+        if book.id == event['id']:
+            return book
+    raise LibraryError(f'Journal refers to unknown book {event["id"]}')
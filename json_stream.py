@@ -0,0 +1,208 @@
+import codecs
+import json
+import re
+
+# ============================================================
+# STREAMING JSON READER
+# ============================================================
+# Reads a top-level JSON object incrementally.
+#
+# Large arrays (e.g. `books` and `users` in library.json) are
+# yielded item by item instead of being parsed as a whole, so
+# memory stays bounded by the size of a single record plus the
+# read buffer.
+#
+# Each item is reported with its byte span in the file, which
+# allows a later random-access read of a single record.
+
+# Number of bytes read from disk on each refill
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*')
+_DECODER = json.JSONDecoder()
+
+
+# ============================================================
+# INTERNAL READER
+# ============================================================
+# Keeps a decoded text buffer over a binary file and tracks the
+# byte offset of the current position.
+class _Reader:
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._eof = False
+
+        self.buf = ''
+        self.pos = 0
+
+        # Byte offset of buf[_mark] (moved forward lazily)
+        self._mark = 0
+        self._mark_bytes = 0
+
+    # --------------------------------------------------------
+    # Buffer management
+    # --------------------------------------------------------
+    def _fill(self):
+        if self._eof:
+            return False
+
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            text = self._utf8.decode(b'', final=True)
+        else:
+            text = self._utf8.decode(chunk)
+
+        # Drop the consumed prefix to keep memory bounded
+        self._mark_bytes = self.byte_offset(self.pos)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        self._mark = 0
+        return True
+
+    def byte_offset(self, pos):
+        """Returns the file byte offset of buf[pos] (pos is monotonic)."""
+        self._mark_bytes += len(self.buf[self._mark:pos].encode('utf-8'))
+        self._mark = pos
+        return self._mark_bytes
+
+    # --------------------------------------------------------
+    # Tokens
+    # --------------------------------------------------------
+    def peek(self):
+        """Skips whitespace and returns the next character ('' at EOF)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise ValueError(
+                f'Invalid JSON: expected {chars!r} at byte '
+                f'{self.byte_offset(self.pos)}'
+            )
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Most likely the value is split across chunks
+                if self._fill():
+                    continue
+                raise
+
+            # A number at the end of the buffer may continue
+            # in the next chunk: only trust it at EOF
+            tail = _NUMBER_TAIL.match(self.buf, end).end()
+            if tail == len(self.buf) and self._fill():
+                continue
+
+            self.pos = end
+            return obj
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+# Iterates over the members of a top-level JSON object.
+#
+# Yields tuples (key, value, start, end):
+# - For keys listed in `stream_keys` whose value is an array,
+#   one tuple per array item, with the byte span of the item.
+# - For any other key, a single tuple with the whole value and
+#   `start`/`end` set to None.
+def iter_members(file, stream_keys=(), chunk_size=CHUNK_SIZE):
+    reader = _Reader(file, chunk_size)
+    reader.expect('{')
+
+    if reader.peek() == '}':
+        return
+
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError('Invalid JSON: object keys must be strings')
+        reader.expect(':')
+
+        if key in stream_keys and reader.peek() == '[':
+            reader.pos += 1
+            yield from _iter_array(reader, key)
+        else:
+            yield key, reader.value(), None, None
+
+        if reader.expect(',}') == '}':
+            return
+
+
+def _iter_array(reader, key):
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+
+    while True:
+        reader.peek()
+        start = reader.byte_offset(reader.pos)
+        item = reader.value()
+        end = reader.byte_offset(reader.pos)
+
+        yield key, item, start, end
+
+        if reader.expect(',]') == ']':
+            return
+
+
+# Reads a single JSON value stored at a known byte span.
+def read_span(file, start, end):
+    file.seek(start)
+    return json.loads(file.read(end - start).decode('utf-8'))
+
+
+# ============================================================
+# STREAMING JSON WRITER
+# ============================================================
+# Writes a top-level JSON object whose output is identical to
+# `json.dump(data, f, indent=4, ensure_ascii=False)`, but where
+# any value given as an iterator (e.g. a generator of records)
+# is written as an array one item at a time.
+#
+# `members` is an iterable of (key, value) pairs.
+def dump_members(file, members):
+    file.write('{')
+    first_member = True
+
+    for key, value in members:
+        file.write('\n    ' if first_member else ',\n    ')
+        first_member = False
+        file.write(json.dumps(key, ensure_ascii=False) + ': ')
+
+        if isinstance(value, (dict, list, str, int, float, bool, type(None))):
+            file.write(indent(json.dumps(value, indent=4, ensure_ascii=False)))
+            continue
+
+        # Iterator: stream the array items
+        first_item = True
+        for item in value:
+            file.write('[\n        ' if first_item else ',\n        ')
+            first_item = False
+            file.write(indent(json.dumps(item, indent=4, ensure_ascii=False), 2))
+        file.write('[]' if first_item else '\n    ]')
+
+    file.write('\n}' if not first_member else '}')
+
+
+# Indents every line but the first (nested json.dumps output).
+def indent(text, levels=1):
+    return text.replace('\n', '\n' + '    ' * levels)
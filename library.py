@@ -1,4 +1,5 @@
-from exceptions import UserNoFoudError, BookNotAvailable
+from exceptions import UserNoFoudError, BookNotAvailable, BatchError, LibraryError
+from observable import Observable, TrackedList
 
 
 # ============================================================
@@ -13,16 +14,35 @@ from exceptions import UserNoFoudError, BookNotAvailable
 # - Object coordination
 # - Domain-level validation
 # - Encapsulation of business rules
-class Library:
+# - Hash indexes kept in sync through the Observer pattern
+# - Domain events published to listeners (journal, caches...)
+class Library(Observable):
 
     # --------------------------------------------------------
     # Constructor
     # --------------------------------------------------------
     # Initializes the library with a name and empty collections.
     def __init__(self, name) -> None:
+        # Listeners of domain events. Each one is called as
+        # listener(library, event, *args), where event is one of:
+        # - 'book_added' / 'book_removed'    (book)
+        # - 'user_added' / 'user_removed'    (user)
+        # - 'book_changed' / 'user_changed'  (obj, field, old, new)
+        self._listeners = ()
+
         # Public attribute: library name
         self.name = name
 
+        # Return hooks: callables hook(book) -> bool, tried in
+        # order when a lent copy of one of these books comes
+        # back. A hook returning True took the copy (e.g. handed
+        # it to the next patron waiting for it, see
+        # reservations.py): it stays lent.
+        self.return_hooks = ()
+
+        # Listener subscribed to every book (one per library)
+        self._book_listener = _BookListener(self)
+
         # ----------------------------------------------------
         # COMPOSITION
         # ----------------------------------------------------
@@ -33,8 +53,186 @@ class Library:
         # This allows:
         # - Loose coupling
         # - Clear responsibility boundaries
-        self.books = []  # Collection of Book objects
-        self.users = []  # Collection of User objects
+        #
+        # ----------------------------------------------------
+        # INDEXES
+        # ----------------------------------------------------
+        # Hash indexes turn lookups into O(1) operations:
+        # - users by id_card
+        # - books by normalized title (a list, because several
+        #   books may share a title; the first one wins, exactly
+        #   like the previous linear scan)
+        #
+        # The collections are TrackedLists, so appending or
+        # removing elements keeps the indexes up to date.
+        #
+        # Available books are kept in an insertion-ordered dict
+        # used as a set. Book.lend and Book.return_book notify
+        # the Library, so the set is updated incrementally.
+        #
+        # An object may be appended more than once: reference
+        # counts tell when its last occurrence is removed, and
+        # users shadowed by another with the same id_card wait in
+        # _shared_id_cards, so removals never scan the lists.
+        self._users_by_id_card = {}
+        self._shared_id_cards = {}  # id_card -> later users, in order
+        self._books_by_title = {}
+        self._available_books = {}
+        self._book_refs = {}        # book -> occurrences in books
+        self._user_refs = {}        # user -> occurrences in users
+
+        self.books = TrackedList(
+            on_add=self._index_book,
+            on_remove=self._unindex_book,
+        )  # Collection of Book objects
+        self.users = TrackedList(
+            on_add=self._index_user,
+            on_remove=self._unindex_user,
+        )  # Collection of User objects
+
+    # --------------------------------------------------------
+    # Index Maintenance
+    # --------------------------------------------------------
+    # Book titles are indexed lower-cased; queries are also
+    # stripped, matching the original comparison exactly.
+    @staticmethod
+    def _title_key(title: str):
+        return title.lower()
+
+    def _index_book(self, book):
+        refs = self._book_refs.get(book, 0)
+        self._book_refs[book] = refs + 1
+        if refs:
+            return
+        self._books_by_title.setdefault(self._title_key(book.title), []).append(book)
+        book.subscribe(self._book_listener)
+        if book.available:
+            self._available_books[book] = None
+        self._notify('book_added', book)
+
+    def _unindex_book(self, book):
+        # A book appended twice is still present after one removal
+        if self._release(self._book_refs, book):
+            return
+        book.unsubscribe(self._book_listener)
+        self._drop_title(book, book.title)
+        self._available_books.pop(book, None)
+        self._notify('book_removed', book)
+
+    def _drop_title(self, book, title):
+        key = self._title_key(title)
+        bucket = self._books_by_title.get(key, [])
+        if book in bucket:
+            bucket.remove(book)
+        if not bucket:
+            self._books_by_title.pop(key, None)
+
+    def _on_book_changed(self, book, field, old, new):
+        if field == 'title':
+            self._drop_title(book, old)
+            self._books_by_title.setdefault(self._title_key(new), []).append(book)
+        elif field == 'available':
+            if new:
+                self._available_books[book] = None
+            else:
+                self._available_books.pop(book, None)
+        self._notify('book_changed', book, field, old, new)
+
+    def _index_user(self, user):
+        refs = self._user_refs.get(user, 0)
+        self._user_refs[user] = refs + 1
+        if refs:
+            return
+        self._add_id_card(user, user.id_card)
+        user.subscribe(self._on_user_changed)
+        self._notify('user_added', user)
+
+    def _unindex_user(self, user):
+        if self._release(self._user_refs, user):
+            return
+        user.unsubscribe(self._on_user_changed)
+        self._drop_id_card(user, user.id_card)
+        self._notify('user_removed', user)
+
+    # Drops one reference; True while the object is still listed
+    @staticmethod
+    def _release(refs, obj):
+        count = refs.get(obj, 0) - 1
+        if count > 0:
+            refs[obj] = count
+            return True
+        refs.pop(obj, None)
+        return False
+
+    # The first user with a given id_card wins (like the scan)
+    def _add_id_card(self, user, id_card):
+        if self._users_by_id_card.setdefault(id_card, user) is not user:
+            self._shared_id_cards.setdefault(id_card, []).append(user)
+
+    def _drop_id_card(self, user, id_card):
+        shared = self._shared_id_cards.get(id_card)
+        if self._users_by_id_card.get(id_card) is not user:
+            if shared and user in shared:
+                shared.remove(user)
+                if not shared:
+                    del self._shared_id_cards[id_card]
+            return
+
+        # Promote the next user sharing the same id_card (rare)
+        if shared:
+            self._users_by_id_card[id_card] = shared.pop(0)
+            if not shared:
+                del self._shared_id_cards[id_card]
+        else:
+            del self._users_by_id_card[id_card]
+
+    def _on_user_changed(self, user, field, old, new):
+        if field == 'id_card':
+            self._drop_id_card(user, old)
+            self._add_id_card(user, new)
+        self._notify('user_changed', user, field, old, new)
+
+    # --------------------------------------------------------
+    # Bulk loading
+    # --------------------------------------------------------
+    # Adds many new objects at once (see parallel_load.py).
+    # `title_keys` are the precomputed _title_key of the books.
+    # Without listeners there is nobody to notify, so the
+    # indexes are filled directly instead of item by item.
+    def _bulk_load(self, books, title_keys, users):
+        if self._listeners:
+            self.books.extend(books)
+            self.users.extend(users)
+            return
+
+        list.extend(self.books, books)
+        books_by_title = self._books_by_title
+        book_refs = self._book_refs
+        on_book_changed = (self._book_listener,)
+        for book, key in zip(books, title_keys):
+            refs = book_refs.get(book, 0)
+            book_refs[book] = refs + 1
+            if refs:
+                continue
+            bucket = books_by_title.get(key)
+            if bucket is None:
+                books_by_title[key] = [book]
+            else:
+                bucket.append(book)
+            book._listeners += on_book_changed
+            if book.available:
+                self._available_books[book] = None
+
+        list.extend(self.users, users)
+        user_refs = self._user_refs
+        on_user_changed = (self._on_user_changed,)
+        for user in users:
+            refs = user_refs.get(user, 0)
+            user_refs[user] = refs + 1
+            if refs:
+                continue
+            self._add_id_card(user, user.id_card)
+            user._listeners += on_user_changed
 
     # --------------------------------------------------------
     # Query Behavior: available books
@@ -43,14 +241,31 @@ class Library:
     #
     # This property:
     # - Does NOT mutate state
-    # - Acts as a computed view over the books collection
+    # - Reads the availability index, so its cost depends on
+    #   the number of available books, not the whole catalog
     @property
     def books_available(self):
-        return [
-            book
-            for book in self.books
-            if book.available  # Filters only available books
-        ]
+        return list(self._available_books)
+
+    # --------------------------------------------------------
+    # Query Behavior: number of available books
+    # --------------------------------------------------------
+    # O(1) count, without building the list.
+    @property
+    def available_count(self):
+        return len(self._available_books)
+
+    # --------------------------------------------------------
+    # Query Behavior: available copies per title
+    # --------------------------------------------------------
+    # {title: copies on the shelf}, counting the copies of
+    # holdings (see holdings.py) and duplicated books alike.
+    @property
+    def titles_available(self):
+        counts = {}
+        for book in self._available_books:
+            counts[book.title] = counts.get(book.title, 0) + book.available_copies
+        return counts
 
     # --------------------------------------------------------
     # Behavior: find a user by ID card
@@ -60,9 +275,9 @@ class Library:
     # Raises a domain-specific exception if the user
     # does not exist.
     def find_user(self, id_card):
-        for user in self.users:
-            if user.id_card == id_card:
-                return user
+        user = self._users_by_id_card.get(id_card)
+        if user is not None:
+            return user
 
         # Domain-level error: user not found
         raise UserNoFoudError(f'User with id card: {id_card} not found')
@@ -71,20 +286,159 @@ class Library:
     # Behavior: find a book by title
     # --------------------------------------------------------
     # Normalizes the input title to ensure
-    # case-insensitive and whitespace-safe comparison.
+    # case-insensitive and whitespace-safe comparison,
+    # then resolves it through the title index. A copy on the
+    # shelf is preferred over copies that are lent.
     #
     # Raises a domain-specific exception if the book
     # does not exist in the library.
     def find_book(self, title: str):
-        normalized = title.strip().lower()
-
-        for book in self.books:
-            if book.title.lower() == normalized:
-                return book
+        bucket = self._books_by_title.get(title.strip().lower())
+        if bucket:
+            for book in bucket:
+                if book.available:
+                    return book
+            return bucket[0]
 
         # Domain-level error: book not found or unavailable
         raise BookNotAvailable(f'Book with title: {title} not found')
 
+    # --------------------------------------------------------
+    # Behavior: find every book sharing a title
+    # --------------------------------------------------------
+    # Returns all the books matching the normalized title
+    # (possibly an empty list). Used when a specific copy
+    # has to be resolved, e.g. by its id.
+    def find_books(self, title: str):
+        return list(self._books_by_title.get(title.strip().lower(), ()))
+
+    # --------------------------------------------------------
+    # Behavior: batch of lend / return operations
+    # --------------------------------------------------------
+    # Processes a list of operations as a single unit:
+    #
+    #     library.process_batch([
+    #         ('lend', 'STU001', '1984'),
+    #         ('return', 'STU002', 'Rayuela'),
+    #     ], persistence)
+    #
+    # 1. Validation pass: every operation is checked against the
+    #    state the batch itself produces (copies lent earlier in
+    #    the batch, borrowing limits such as Student.limit_books,
+    #    loans recorded by book_request: see User.records_loans).
+    # 2. If anything is invalid, BatchError is raised and nothing
+    #    is applied.
+    # 3. Otherwise all operations are applied; an unexpected error
+    #    restores the previous state (rollback).
+    # 4. The library is persisted once for the whole batch.
+    #
+    # Returns the list of result messages.
+    def process_batch(self, operations, persistence=None):
+        plan = self._plan_batch(operations)
+
+        books = {book for _, _, book in plan}
+        users = {user for _, user, _ in plan}
+        saved_books = [
+            (book, book.available, book.borrowed_times, book.available_copies)
+            for book in books
+        ]
+        saved_users = [(user, list(user.lend_books)) for user in users]
+
+        results = []
+        try:
+            for action, user, book in plan:
+                if action == 'lend':
+                    user.book_request(book.title)
+                    results.append(book.lend())
+                else:
+                    if book.title in user.lend_books:
+                        user.lend_books.remove(book.title)
+                    results.append(book.return_book())
+        except Exception:
+            self._rollback(saved_books, saved_users)
+            raise
+
+        if persistence is not None:
+            persistence.save_data(self)
+
+        return results
+
+    # Resolves every operation to (action, user, book) while
+    # simulating the effects of the previous operations.
+    def _plan_batch(self, operations):
+        plan = []
+        failures = []
+        shelf = {}  # book -> simulated copies on the shelf
+        loans = {}  # user -> simulated list of lent titles
+
+        def on_shelf(book):
+            return shelf.get(book, book.available_copies)
+
+        for index, operation in enumerate(operations):
+            try:
+                action, id_card, title = operation
+                user = self.find_user(id_card)
+                user_loans = loans.setdefault(user, list(user.lend_books))
+
+                if action == 'lend':
+                    book = next(
+                        (book for book in self.find_books(title) if on_shelf(book) > 0),
+                        None,
+                    )
+                    if book is None:
+                        raise BookNotAvailable(f'{title} was not available')
+                    if user.limit_books is not None and len(user_loans) >= user.limit_books:
+                        raise LibraryError(
+                            f'{id_card} has reached the limit of '
+                            f'{user.limit_books} borrowed books'
+                        )
+                    shelf[book] = on_shelf(book) - 1
+                    if user.records_loans:
+                        user_loans.append(book.title)
+
+                elif action == 'return':
+                    book = next(
+                        (book for book in self.find_books(title) if on_shelf(book) < book.copies),
+                        None,
+                    )
+                    # Loans that were not recorded (Teachers)
+                    # cannot be checked: any lent copy will do
+                    if book is None or (
+                            user.records_loans and book.title not in user_loans):
+                        raise LibraryError(f'{id_card} has not borrowed {title}')
+                    shelf[book] = on_shelf(book) + 1
+                    if book.title in user_loans:
+                        user_loans.remove(book.title)
+
+                else:
+                    raise LibraryError(f'Unknown batch action: {action}')
+
+            except (LibraryError, ValueError) as error:
+                failures.append((index, operation, error))
+                continue
+
+            plan.append((action, user, book))
+
+        if failures:
+            raise BatchError(failures)
+
+        return plan
+
+    # Restores the saved state, announcing every change (the
+    # borrowed_times setter rejects 0, so that change is
+    # notified directly)
+    @staticmethod
+    def _rollback(saved_books, saved_users):
+        for book, available, borrowed_times, available_copies in saved_books:
+            old = book.borrowed_times
+            book._Book__borrowed_times = borrowed_times
+            if old != borrowed_times:
+                book._notify('borrowed_times', old, borrowed_times)
+            book.available_copies = available_copies
+            book.available = available
+        for user, lend_books in saved_users:
+            user.lend_books[:] = lend_books
+
     # --------------------------------------------------------
     # Static Method: ID validation
     # --------------------------------------------------------
@@ -96,3 +450,139 @@ class Library:
     @staticmethod
     def validated_id(id: int):
         return isinstance(id, int) and id >= 0
+
+
+# ------------------------------------------------------------
+# Listener of the books of a Library
+# ------------------------------------------------------------
+# Forwards the changes of a book to its Library, and offers the
+# returned copies to the Library return hooks.
+class _BookListener:
+
+    __slots__ = ('library',)
+
+    def __init__(self, library) -> None:
+        self.library = library
+
+    def __call__(self, book, field, old, new):
+        self.library._on_book_changed(book, field, old, new)
+
+    def take_returned(self, book):
+        for hook in self.library.return_hooks:
+            if hook(book):
+                return True
+        return False
+
+
+# ============================================================
+# CHILD CLASS: LazyLibrary
+# ============================================================
+# A Library whose records are materialized on demand.
+#
+# It is created by the persistence layer with a map of
+# "pending" records (only their lookup key and a locator)
+# and a loader callable that builds the object when needed.
+#
+# - find_user / find_book only build the records they touch
+# - Catalog-wide queries materialize the pending books first
+# - `books` and `users` hold the materialized objects only
+class LazyLibrary(Library):
+
+    def __init__(self, name, load_book, load_user) -> None:
+        super().__init__(name)
+
+        # Callables: locator -> Book / User
+        self._load_book = load_book
+        self._load_user = load_user
+
+        # Pending records: lookup key -> list of locators
+        self._pending_books = {}
+        self._pending_users = {}
+
+        # Materializing a record is not a domain event
+        self._materializing = False
+
+    # --------------------------------------------------------
+    # Registration of pending records
+    # --------------------------------------------------------
+    def add_pending_book(self, title, locator):
+        self._pending_books.setdefault(self._title_key(title), []).append(locator)
+
+    def add_pending_user(self, id_card, locator):
+        self._pending_users.setdefault(id_card, []).append(locator)
+
+    @property
+    def pending_count(self):
+        """Number of records not materialized yet."""
+        return (
+            sum(map(len, self._pending_books.values()))
+            + sum(map(len, self._pending_users.values()))
+        )
+
+    # --------------------------------------------------------
+    # Materialization
+    # --------------------------------------------------------
+    def _materialize_books(self, key):
+        self._materializing = True
+        try:
+            for locator in self._pending_books.pop(key, ()):
+                self.books.append(self._load_book(locator))
+        finally:
+            self._materializing = False
+
+    def _materialize_users(self, id_card):
+        self._materializing = True
+        try:
+            for locator in self._pending_users.pop(id_card, ()):
+                self.users.append(self._load_user(locator))
+        finally:
+            self._materializing = False
+
+    def _notify(self, event, *args):
+        if self._materializing and event in ('book_added', 'user_added'):
+            return
+        super()._notify(event, *args)
+
+    def _materialize_all_books(self):
+        for key in list(self._pending_books):
+            self._materialize_books(key)
+
+    def materialize_books(self):
+        """Builds every pending book (needed by catalog-wide indexes)."""
+        self._materialize_all_books()
+
+    def materialize_all(self):
+        """Builds every pending record (needed before a full save)."""
+        self._materialize_all_books()
+        for id_card in list(self._pending_users):
+            self._materialize_users(id_card)
+
+    # --------------------------------------------------------
+    # Overridden queries
+    # --------------------------------------------------------
+    @property
+    def books_available(self):
+        self._materialize_all_books()
+        return super().books_available
+
+    @property
+    def available_count(self):
+        self._materialize_all_books()
+        return super().available_count
+
+    @property
+    def titles_available(self):
+        self._materialize_all_books()
+        return super().titles_available
+
+    def find_user(self, id_card):
+        self._materialize_users(id_card)
+        return super().find_user(id_card)
+
+    def find_book(self, title: str):
+        self._materialize_books(title.strip().lower())
+        return super().find_book(title)
+
+    def find_books(self, title: str):
+        self._materialize_books(title.strip().lower())
+        return super().find_books(title)
@@ -0,0 +1,451 @@
+import heapq
+import logging
+import os
+import re
+import struct
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, namedtuple
+
+from holdings import Holding
+
+
+# ============================================================
+# LOAN HISTORY STORE
+# ============================================================
+# Append-only record of every loan: (book id, user id, lend
+# time, due time, return time).
+#
+# Storage is columnar (typed arrays, one row per loan), and
+# rows are appended in lend-time order, never reordered.
+# The only in-place updates are the return time and the user
+# of a loan whose borrower was announced after the book.
+#
+# Indexes answer the usual questions without scanning history:
+# - active loans of a user      user id -> set of rows
+# - active loans of a book      book id -> rows, oldest first
+#                               (a Holding lends several copies)
+# - overdue loans               min-heap of (due time, row);
+#                               returned loans are dropped lazily
+# - top books in the last days  lend times are sorted, so the
+#                               window starts at a bisect
+#
+# Due dates come from the book's loan_period (or, for other
+# book-like objects, duration_calculate(): "7 days").
+#
+# Optionally, events are appended to a binary log file, which
+# is replayed when the store is opened again.
+
+_log = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Loan period of books without duration_calculate()
+DEFAULT_LOAN_DAYS = 7
+
+# Row values meaning "not yet"
+NOT_RETURNED = 0.0
+UNKNOWN_USER = -1
+
+_DURATION = re.compile(r'\s*(\d+)\s*day', re.IGNORECASE)
+
+Loan = namedtuple('Loan', 'id book_id user_id lent_at due_at returned_at')
+
+
+def _title_key(title):
+    return title.strip().lower()
+
+
+# Lists of user ids per title key; empty lists are dropped
+def _push(lists, key, user_id):
+    lists.setdefault(key, []).append(user_id)
+
+
+def _pop(lists, key, default):
+    users = lists.get(key)
+    if not users:
+        return default
+    user_id = users.pop(0)
+    if not users:
+        del lists[key]
+    return user_id
+
+
+def _discard(lists, key, user_id):
+    users = lists.get(key)
+    if not users or user_id not in users:
+        return False
+    users.remove(user_id)
+    if not users:
+        del lists[key]
+    return True
+
+
+def loan_days(book):
+    """Loan period of a book, in days."""
+    period = getattr(book, 'loan_period', None)
+    if period is not None:
+        return period.total_seconds() / SECONDS_PER_DAY
+
+    duration = getattr(book, 'duration_calculate', None)
+    if duration is None:
+        return DEFAULT_LOAN_DAYS
+    match = _DURATION.match(duration())
+    if match is None:
+        raise ValueError(f'Unknown loan duration: {duration()!r}')
+    return int(match.group(1))
+
+
+# ============================================================
+# LOG FILE
+# ============================================================
+# Fixed-size records: kind, row, book id, user id, two times.
+# A torn last record (crash while appending) is discarded.
+_RECORD = struct.Struct('<Bxxxqqqdd')
+_LEND, _RETURN, _ASSIGN = 1, 2, 3
+
+
+class LoanStore:
+
+    def __init__(self, path=None, clock=time.time) -> None:
+        self.clock = clock
+
+        # Columns (row i describes loan i)
+        self.book_ids = array('q')
+        self.user_ids = array('q')
+        self.lent_at = array('d')
+        self.due_at = array('d')
+        self.returned_at = array('d')
+
+        # Indexes
+        self._active_by_user = {}
+        self._active_by_book = {}
+        self._active = 0
+        self._due_heap = []
+
+        # Library synchronization (title key -> user ids):
+        # - borrowers announced before their book was lent
+        # - borrowers whose loan was removed before the copy
+        #   came back (or was handed to the next holder)
+        self._library = None
+        self._waiting_users = {}
+        self._returning_users = {}
+
+        # Library events contradicting the history (skipped)
+        self.conflicts = 0
+
+        self.path = path
+        self._log = None
+        if path is not None:
+            self._replay_log()
+            self._log = open(path, 'ab')
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    # --------------------------------------------------------
+    # Recording
+    # --------------------------------------------------------
+    def record_lend(self, book_id, user_id=UNKNOWN_USER, days=DEFAULT_LOAN_DAYS, when=None,
+                    copies=1):
+        """Appends a loan of one of the `copies` of a book; returns its id (row)."""
+        if when is None:
+            # The clock may step back (NTP): lend times never do,
+            # so lends can be recorded from inside notifications
+            when = self.clock()
+            if self.lent_at and when < self.lent_at[-1]:
+                when = self.lent_at[-1]
+        elif self.lent_at and when < self.lent_at[-1]:
+            raise ValueError('Loans must be recorded in time order')
+        if copies is not None and len(self._active_by_book.get(book_id, ())) >= copies:
+            raise ValueError(f'Book {book_id} is already lent')
+
+        row = len(self.book_ids)
+        due = when + days * SECONDS_PER_DAY
+        self.book_ids.append(book_id)
+        self.user_ids.append(user_id)
+        self.lent_at.append(when)
+        self.due_at.append(due)
+        self.returned_at.append(NOT_RETURNED)
+
+        self._active_by_book.setdefault(book_id, []).append(row)
+        self._active += 1
+        if user_id != UNKNOWN_USER:
+            self._active_by_user.setdefault(user_id, set()).add(row)
+        heapq.heappush(self._due_heap, (due, row))
+
+        self._write(_LEND, row, book_id, user_id, when, due)
+        return row
+
+    def record_return(self, book_id, when=None, user_id=UNKNOWN_USER):
+        """Closes an active loan of a book; returns its id.
+
+        The loan of `user_id` is closed when given, otherwise one
+        without a borrower, otherwise the oldest one.
+        """
+        rows = self._active_by_book.get(book_id)
+        if not rows:
+            raise ValueError(f'Book {book_id} is not lent')
+
+        row = self._row_of(rows, user_id)
+        if row is None:
+            row = self._row_of(rows, UNKNOWN_USER)
+        if row is None:
+            row = rows[0]
+        self._close(row, self.clock() if when is None else when)
+        return row
+
+    def _row_of(self, rows, user_id):
+        return next((row for row in rows if self.user_ids[row] == user_id), None)
+
+    def _close(self, row, when):
+        book_id = self.book_ids[row]
+        rows = self._active_by_book[book_id]
+        rows.remove(row)
+        if not rows:
+            del self._active_by_book[book_id]
+        self._active -= 1
+
+        self.returned_at[row] = when
+        self._discard_user_row(self.user_ids[row], row)
+
+        self._write(_RETURN, row, book_id, 0, when, 0.0)
+
+    def assign_user(self, row, user_id):
+        """Sets the borrower of a loan recorded without one."""
+        previous = self.user_ids[row]
+        self.user_ids[row] = user_id
+        if self.returned_at[row] == NOT_RETURNED:
+            self._discard_user_row(previous, row)
+            self._active_by_user.setdefault(user_id, set()).add(row)
+
+        self._write(_ASSIGN, row, self.book_ids[row], user_id, 0.0, 0.0)
+
+    def _discard_user_row(self, user_id, row):
+        rows = self._active_by_user.get(user_id)
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del self._active_by_user[user_id]
+
+    # --------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------
+    def loan(self, row):
+        return Loan(
+            row,
+            self.book_ids[row],
+            self.user_ids[row],
+            self.lent_at[row],
+            self.due_at[row],
+            self.returned_at[row] or None,
+        )
+
+    def active_loans(self, user_id):
+        """Loans of a user not returned yet, oldest first."""
+        return [self.loan(row) for row in sorted(self._active_by_user.get(user_id, ()))]
+
+    def active_loan(self, book_id):
+        """Oldest current loan of a book, or None."""
+        rows = self._active_by_book.get(book_id)
+        return self.loan(rows[0]) if rows else None
+
+    def book_loans(self, book_id):
+        """Current loans of the copies of a book, oldest first."""
+        return [self.loan(row) for row in self._active_by_book.get(book_id, ())]
+
+    @property
+    def active_count(self):
+        return self._active
+
+    def overdue(self, now=None):
+        """Active loans past their due time, most overdue first."""
+        now = self.clock() if now is None else now
+        heap = self._due_heap
+
+        # Drop returned loans: all of them when they make up most
+        # of the heap, otherwise only those at the top
+        if len(heap) > 2 * self._active + 64:
+            heap[:] = [item for item in heap if self.returned_at[item[1]] == NOT_RETURNED]
+            heapq.heapify(heap)
+        while heap and self.returned_at[heap[0][1]] != NOT_RETURNED:
+            heapq.heappop(heap)
+
+        # Visit only the part of the heap due before `now`
+        found = []
+        pending = [0] if heap else []
+        while pending:
+            index = pending.pop()
+            due, row = heap[index]
+            if due >= now:
+                continue
+            if self.returned_at[row] == NOT_RETURNED:
+                found.append((due, row))
+            pending.extend(child for child in (2 * index + 1, 2 * index + 2) if child < len(heap))
+
+        found.sort()
+        return [self.loan(row) for _, row in found]
+
+    def top_books(self, days, limit=10, now=None):
+        """[(book id, lends)] of the most lent books in the last days."""
+        now = self.clock() if now is None else now
+        start = bisect_left(self.lent_at, now - days * SECONDS_PER_DAY)
+        end = bisect_right(self.lent_at, now, lo=start)
+        return Counter(self.book_ids[start:end]).most_common(limit)
+
+    # --------------------------------------------------------
+    # Synchronization with a Library
+    # --------------------------------------------------------
+    # Book.lend / Book.return_book announce the book, and
+    # User.lend_books announces the borrower (by title). Both
+    # orders happen (main.py asks the user first, the
+    # concurrency layer lends the book first), so a loan may be
+    # recorded without a user and completed later.
+    #
+    # A Holding announces every copy through `available_copies`
+    # (its `available` only flips for the last copy). A copy
+    # handed to the next holder on return (reservations.py)
+    # closes the loan of the returning user and opens one for
+    # the holder, without any availability change.
+    #
+    # Listeners run inside Book.lend / return_book, after the
+    # book changed: an event contradicting the history (a copy
+    # recorded as lent twice...) is logged and skipped rather
+    # than raised into the library operation.
+    def attach(self, library):
+        self.detach()
+        self._library = library
+        library.subscribe(self._on_library_event)
+
+    def detach(self):
+        if self._library is not None:
+            self._library.unsubscribe(self._on_library_event)
+            self._library = None
+            self._waiting_users = {}
+            self._returning_users = {}
+
+    def _on_library_event(self, library, event, *args):
+        try:
+            self._apply_event(event, args)
+        except ValueError as error:
+            self.conflicts += 1
+            _log.warning('Loan history skipped %s of %r: %s', event, args[0], error)
+
+    def _apply_event(self, event, args):
+        if event == 'book_changed':
+            book, field, old, new = args
+            if field == 'available_copies':
+                for _ in range(old - new):
+                    self._lent(book)
+                for _ in range(new - old):
+                    self._returned(book)
+            elif field == 'available' and not isinstance(book, Holding):
+                if new:
+                    self._returned(book)
+                else:
+                    self._lent(book)
+
+        elif event == 'user_changed' and args[1] == 'loan_added':
+            user, _, _, title = args
+            row = self._unassigned_loan(title)
+            if row is not None:
+                self.assign_user(row, user.id)
+            elif not self._handed_off(user, title):
+                _push(self._waiting_users, _title_key(title), user.id)
+
+        elif event == 'user_changed' and args[1] == 'loan_removed':
+            user, _, title, _ = args
+            key = _title_key(title)
+            if not _discard(self._waiting_users, key, user.id):
+                # Only borrowers holding a copy can give one back
+                if self._user_loan(user.id, title) is not None:
+                    _push(self._returning_users, key, user.id)
+
+    def _lent(self, book):
+        user_id = _pop(self._waiting_users, _title_key(book.title), UNKNOWN_USER)
+        self.record_lend(book.id, user_id, loan_days(book), copies=book.copies)
+
+    def _returned(self, book):
+        if book.id not in self._active_by_book:
+            return
+        key = _title_key(book.title)
+        rows = self._active_by_book[book.id]
+        for user_id in self._returning_users.get(key, ()):
+            if self._row_of(rows, user_id) is not None:
+                _discard(self._returning_users, key, user_id)
+                self.record_return(book.id, user_id=user_id)
+                return
+        self.record_return(book.id)
+
+    # A title added while another borrower of it was returning:
+    # the copy went from one to the other
+    def _handed_off(self, user, title):
+        key = _title_key(title)
+        for user_id in self._returning_users.get(key, ()):
+            row = self._user_loan(user_id, title)
+            if row is not None:
+                _discard(self._returning_users, key, user_id)
+                book_id = self.book_ids[row]
+                book = next(
+                    (book for book in self._library.find_books(title) if book.id == book_id),
+                    None,
+                )
+                # The copy may have been removed or renamed since
+                days = DEFAULT_LOAN_DAYS if book is None else loan_days(book)
+                self._close(row, self.clock())
+                self.record_lend(book_id, user.id, days, copies=None)
+                return True
+        return False
+
+    # Latest active loan of a copy of `title` without a borrower
+    def _unassigned_loan(self, title):
+        return self._user_loan(UNKNOWN_USER, title)
+
+    # Latest active loan of a copy of `title` held by `user_id`
+    def _user_loan(self, user_id, title):
+        for book in self._library.find_books(title):
+            for row in reversed(self._active_by_book.get(book.id, ())):
+                if self.user_ids[row] == user_id:
+                    return row
+        return None
+
+    # --------------------------------------------------------
+    # Log file
+    # --------------------------------------------------------
+    def _write(self, kind, row, book_id, user_id, first, second):
+        if self._log is not None:
+            self._log.write(_RECORD.pack(kind, row, book_id, user_id, first, second))
+
+    def flush(self):
+        """Makes the logged events durable."""
+        if self._log is not None:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def close(self):
+        self.detach()
+        if self._log is not None:
+            self.flush()
+            self._log.close()
+            self._log = None
+
+    def _replay_log(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        valid = len(data) - len(data) % _RECORD.size
+        for kind, row, book_id, user_id, first, second in _RECORD.iter_unpack(data[:valid]):
+            if kind == _LEND:
+                self.record_lend(book_id, user_id, (second - first) / SECONDS_PER_DAY, first, None)
+            elif kind == _RETURN:
+                self._close(row, first)
+            elif kind == _ASSIGN:
+                self.assign_user(row, user_id)
+
+        if valid != len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid)
@@ -13,16 +13,24 @@
 # ------------------------------------------------------------
 import sys
 
+import metrics
 from exceptions import UserNoFoudError, BookNotAvailable
 from persistence import Persistence
+from search import SearchIndex
+from sorted_index import SortedIndexes
 
 # ------------------------------------------------------------
 # Load persisted library data
 # ------------------------------------------------------------
-# Persistence layer reconstructs Library, Books, and Users
-persistence = Persistence()
+# Persistence layer reconstructs Library, Books, and Users.
+# Journal mode: saves append the new events instead of
+# rewriting the whole file (see journal.py)
+persistence = Persistence(journal=True)
 library = persistence.load_data()
 
+# LIBRARY_METRICS=<file> records timings of this session
+metrics.enable_from_environment(lambda: library)
+
 # ------------------------------------------------------------
 # Welcome message
 # ------------------------------------------------------------
@@ -34,18 +42,51 @@ print('-' * 30)
 # Show available books
 # ------------------------------------------------------------
 # Demonstrates iteration over object collections
-# and using properties to query object state
-print(f'We have available {len(library.books_available)} books')
+# and using properties to query object state.
+# Books are listed by title, one page at a time (sorted_index.py)
+PAGE_SIZE = 10
+
+print(f'We have available {library.available_count} books')
 
+shelf = SortedIndexes(library, fields=('title',), available_only=True)
+cursor = None
 count = 0
-for book in library.books_available:
-    count += 1
-    print(f'{count} ---> {book.all_description}\nBorrowed times: {book.borrowed_times}')
+
+
+def show_page():
+    global cursor, count
+    page = shelf.range('title', limit=PAGE_SIZE, after=cursor)
+    for book in page.books:
+        count += 1
+        print(f'{count} ---> {book.all_description}\nBorrowed times: {book.borrowed_times}')
+    cursor = page.cursor
+
+
+show_page()
+
+# ------------------------------------------------------------
+# Title suggestions
+# ------------------------------------------------------------
+# The search index is built on the first failed lookup only,
+# then reused (it follows the library changes by itself)
+search = None
+
+
+def suggest(title):
+    global search
+    if search is None:
+        search = SearchIndex(library)
+    return search.search_books(title, limit=3)
+
 
 # ------------------------------------------------------------
 # User input: identify user
 # ------------------------------------------------------------
+# An empty answer shows the next page of books
 id_card = input('Input your id card: ')
+while not id_card and cursor is not None:
+    show_page()
+    id_card = input('Input your id card (Enter for more books): ')
 
 try:
     # Attempt to find the user in the library
@@ -70,6 +111,11 @@ except BookNotAvailable as e:
     # Handle book not available or not found
     print(e)
     print('The book does not exist or is not available')
+
+    # Suggest close titles (accents, partial or misspelled words)
+    suggestions = suggest(title)
+    if suggestions:
+        print('Did you mean: ' + ', '.join(book.title for book in suggestions))
 else:
     # --------------------------------------------------------
     # User requests the book (polymorphic method)
@@ -87,5 +133,5 @@ else:
 # ------------------------------------------------------------
 # Save library state
 # ------------------------------------------------------------
-# Persist updated library data (books and users)
+# Persist updated library data (only the new events are written)
 persistence.save_data(library)
@@ -0,0 +1,348 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+# ============================================================
+# METRICS MODULE
+# ============================================================
+# Optional instrumentation of the hot paths: call counts,
+# latency histograms and object counts for Library, Book, User
+# and Persistence operations.
+#
+# Objects are counted where they are created: by their
+# constructor, or by serialization when they are loaded (decoded
+# records bypass __init__).
+#
+# Zero cost when disabled: nothing is measured by default.
+# enable() replaces the instrumented methods (and properties)
+# on their classes with timing wrappers; disable() puts the
+# original functions back, so the classes are byte-for-byte
+# what they were.
+#
+# Usage:
+#     import metrics
+#     metrics.enable()
+#     ...                          # run the workload
+#     print(metrics.dump())        # or dump(format='json')
+#
+# Setting LIBRARY_METRICS=<path> enables it from main.py and
+# server.py and writes a JSON snapshot there at exit
+# (LIBRARY_METRICS=- prints a text report instead).
+
+# Instrumented members: (module, class, member names).
+# Only members defined on the class itself are wrapped;
+# inherited ones are measured on the class defining them.
+INSTRUMENTED = [
+    ('library', 'Library', (
+        '__init__', 'find_user', 'find_book', 'find_books',
+        'books_available', 'available_count', 'process_batch',
+    )),
+    ('library', 'LazyLibrary', (
+        '__init__', 'find_user', 'find_book', 'find_books',
+        'books_available', 'available_count', 'materialize_books',
+        'materialize_all',
+    )),
+    ('books', 'Book', ('__init__', 'lend', 'return_book', 'to_dict')),
+    ('holdings', 'Holding', ('__init__', 'lend', 'return_book', 'to_dict')),
+    ('users', 'User', ('__init__', 'book_request', 'to_dict')),
+    ('users', 'Student', ('__init__', 'book_request', 'to_dict')),
+    ('users', 'Teacher', ('__init__', 'book_request', 'to_dict')),
+    ('persistence', 'Persistence', (
+        'save_data', 'prepare_save', 'compact', 'load_data',
+        'save_binary', 'load_binary',
+    )),
+    ('serialization', '_Codec', ('from_row',)),
+]
+
+# Histogram buckets: bucket i holds latencies < 2**i ns
+# (the last bucket: everything slower, i.e. over ~1 minute)
+BUCKETS = 37
+
+
+# ============================================================
+# LATENCY HISTOGRAM
+# ============================================================
+# Log2 buckets: constant memory and O(1) recording, with
+# percentiles precise to a factor of two.
+class Histogram:
+
+    __slots__ = ('count', 'errors', 'total_ns', 'min_ns', 'max_ns', 'buckets')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, elapsed_ns, failed=False):
+        self.count += 1
+        self.errors += failed
+        self.total_ns += elapsed_ns
+        if self.min_ns is None or elapsed_ns < self.min_ns:
+            self.min_ns = elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.buckets[min(elapsed_ns.bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, fraction):
+        """Upper bound (ns) of the bucket holding the percentile."""
+        if not self.count:
+            return 0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(1 << index, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_us': self.total_ns / 1000,
+            'mean_us': self.total_ns / self.count / 1000 if self.count else 0,
+            'min_us': (self.min_ns or 0) / 1000,
+            'p50_us': self.percentile(0.50) / 1000,
+            'p90_us': self.percentile(0.90) / 1000,
+            'p99_us': self.percentile(0.99) / 1000,
+            'max_us': self.max_ns / 1000,
+            # Non-empty buckets only: {upper bound in ns: count}
+            'buckets': {1 << i: c for i, c in enumerate(self.buckets) if c},
+        }
+
+
+# ============================================================
+# REGISTRY
+# ============================================================
+class Registry:
+
+    def __init__(self) -> None:
+        self.histograms = {}   # 'Class.member' -> Histogram
+        self.objects = {}      # class name -> instances created
+        self.started = None
+        self._originals = []   # (class, name, original attribute)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self._originals)
+
+    # --------------------------------------------------------
+    # Patching
+    # --------------------------------------------------------
+    def enable(self, instrumented=None):
+        if self.enabled:
+            return
+        self.started = time.time()
+
+        for module_name, class_name, members in instrumented or INSTRUMENTED:
+            cls = getattr(__import__(module_name), class_name)
+            for name in members:
+                original = cls.__dict__.get(name)
+                if original is None:
+                    continue
+                metric = f'{class_name}.{name}'
+                self.histograms.setdefault(metric, Histogram())
+
+                if isinstance(original, property):
+                    wrapped = property(
+                        self._wrap(original.fget, metric),
+                        original.fset,
+                        original.fdel,
+                        original.__doc__,
+                    )
+                elif isinstance(original, staticmethod):
+                    wrapped = staticmethod(self._wrap(original.__func__, metric))
+                elif name == '__init__':
+                    wrapped = self._wrap_init(original, metric)
+                elif name == 'from_row':
+                    wrapped = self._wrap_decode(original, metric)
+                else:
+                    wrapped = self._wrap(original, metric)
+
+                self._originals.append((cls, name, original))
+                setattr(cls, name, wrapped)
+
+    def disable(self):
+        while self._originals:
+            cls, name, original = self._originals.pop()
+            setattr(cls, name, original)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {name: Histogram() for name in self.histograms}
+            self.objects = {}
+            self.started = time.time() if self.enabled else None
+
+    # --------------------------------------------------------
+    # Wrappers
+    # --------------------------------------------------------
+    def _record(self, metric, start, failed):
+        elapsed = time.perf_counter_ns() - start
+        with self._lock:
+            self.histograms[metric].record(elapsed, failed)
+
+    def _wrap(self, function, metric):
+        record = self._record
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                result = function(*args, **kwargs)
+            except BaseException:
+                record(metric, start, True)
+                raise
+            record(metric, start, False)
+            return result
+
+        return wrapper
+
+    # Constructors also count the objects created. Only the
+    # outermost __init__ counts, so Student -> User.__init__
+    # (called through super) creates one Student, not two objects.
+    def _wrap_init(self, function, metric):
+        timed = self._wrap(function, metric)
+
+        @functools.wraps(function)
+        def wrapper(obj, *args, **kwargs):
+            if type(obj).__init__ is wrapper:
+                self._count(obj)
+            return timed(obj, *args, **kwargs)
+
+        return wrapper
+
+    # Decoders (serialization._Codec.from_row) build objects
+    # through __new__: they count the object they return.
+    def _wrap_decode(self, function, metric):
+        timed = self._wrap(function, metric)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            obj = timed(*args, **kwargs)
+            self._count(obj)
+            return obj
+
+        return wrapper
+
+    def _count(self, obj):
+        name = type(obj).__name__
+        with self._lock:
+            self.objects[name] = self.objects.get(name, 0) + 1
+
+    # --------------------------------------------------------
+    # Snapshot
+    # --------------------------------------------------------
+    def snapshot(self, library=None):
+        with self._lock:
+            data = {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'enabled': self.enabled,
+                'uptime_s': time.time() - self.started if self.started else 0,
+                'operations': {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self.histograms.items())
+                    if histogram.count
+                },
+                'objects_created': dict(sorted(self.objects.items())),
+            }
+
+        # Current sizes of a library (plain attribute reads: not
+        # counted as instrumented calls)
+        if library is not None:
+            data['library'] = {
+                'books': len(library.books),
+                'users': len(library.users),
+                'available_books': len(library._available_books),
+            }
+        return data
+
+
+# ============================================================
+# MODULE-LEVEL API
+# ============================================================
+_registry = Registry()
+
+
+def enable(instrumented=None):
+    """Starts measuring (wraps the instrumented members)."""
+    _registry.enable(instrumented)
+
+
+def disable():
+    """Stops measuring and restores the original members."""
+    _registry.disable()
+
+
+def is_enabled():
+    return _registry.enabled
+
+
+def reset():
+    """Discards the collected measurements."""
+    _registry.reset()
+
+
+def snapshot(library=None):
+    """Collected measurements as a JSON-serializable dict."""
+    return _registry.snapshot(library)
+
+
+def dump(library=None, format='text'):
+    """Collected measurements as a text report or JSON string."""
+    data = snapshot(library)
+    if format == 'json':
+        return json.dumps(data, indent=4)
+
+    lines = [
+        f'{"operation":<30}{"calls":>10}{"errors":>8}{"mean us":>11}'
+        f'{"p50 us":>11}{"p99 us":>11}{"max us":>12}',
+    ]
+    for name, op in data['operations'].items():
+        lines.append(
+            f'{name:<30}{op["count"]:>10,}{op["errors"]:>8,}{op["mean_us"]:>11.1f}'
+            f'{op["p50_us"]:>11.1f}{op["p99_us"]:>11.1f}{op["max_us"]:>12.1f}'
+        )
+    if data['objects_created']:
+        lines.append('')
+        lines.append('objects created: ' + ', '.join(
+            f'{name}={count:,}' for name, count in data['objects_created'].items()
+        ))
+    if 'library' in data:
+        lines.append('library: ' + ', '.join(
+            f'{name}={count:,}' for name, count in data['library'].items()
+        ))
+    return '\n'.join(lines)
+
+
+# ------------------------------------------------------------
+# Environment switch
+# ------------------------------------------------------------
+# LIBRARY_METRICS=<path>  -> JSON snapshot written at exit
+# LIBRARY_METRICS=-       -> text report printed at exit
+def enable_from_environment(library_getter=None):
+    target = os.environ.get('LIBRARY_METRICS')
+    if not target:
+        return False
+
+    enable()
+
+    def report():
+        library = library_getter() if library_getter else None
+        if target == '-':
+            print(dump(library), file=sys.stderr)
+        else:
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(dump(library, format='json'))
+
+    atexit.register(report)
+    return True
@@ -0,0 +1,185 @@
+# ============================================================
+# OBSERVABLE MODULE
+# ============================================================
+# Small building blocks that let domain objects announce their
+# changes to interested parties (indexes, caches, journals...).
+#
+# This demonstrates:
+# - The Observer pattern
+# - Keeping derived data (indexes) consistent with its source
+# - Extending built-in types through inheritance
+
+
+# ============================================================
+# MIXIN: Observable
+# ============================================================
+# Any class inheriting from Observable can notify a list of
+# listeners. Each listener is a callable receiving the object
+# that changed followed by event-specific arguments.
+class Observable:
+
+    # No per-instance __dict__: slotted subclasses stay compact
+    __slots__ = ()
+
+    # Subclasses must set `self._listeners = ()` in their
+    # constructor before any notifying attribute is assigned.
+    # A tuple is used: it is smaller than a list, and listeners
+    # change far less often than they are notified.
+    def subscribe(self, listener):
+        """Registers a callable that will be notified of changes."""
+        self._listeners += (listener,)
+
+    def unsubscribe(self, listener):
+        """Removes a previously registered listener (if present)."""
+        listeners = list(self._listeners)
+        if listener in listeners:
+            listeners.remove(listener)
+            self._listeners = tuple(listeners)
+
+    def _notify(self, *args):
+        for listener in self._listeners:
+            listener(self, *args)
+
+
+# ============================================================
+# TRACKED LISTS
+# ============================================================
+# Lists that report every element added or removed.
+#
+# The Library exposes `books` and `users` as public lists and
+# other layers (e.g. Persistence) append to them directly.
+# Using a list subclass keeps that public API untouched while
+# allowing the Library to maintain its indexes.
+#
+# _ReportingList implements the mutating operations on top of
+# two hooks, _added(item) and _removed(item):
+# - TrackedList calls the callables given to its constructor
+# - OwnedList calls methods of its owner: it only stores one
+#   reference, which matters for small lists held by millions
+#   of objects (the loans of every User)
+class _ReportingList(list):
+
+    __slots__ = ()
+
+    def _added(self, item):
+        raise NotImplementedError
+
+    def _removed(self, item):
+        raise NotImplementedError
+
+    # --------------------------------------------------------
+    # Mutating operations
+    # --------------------------------------------------------
+    def append(self, item):
+        super().append(item)
+        self._added(item)
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self._added(item)
+
+    def extend(self, iterable):
+        for item in iterable:
+            self.append(item)
+
+    def __iadd__(self, iterable):
+        self.extend(iterable)
+        return self
+
+    def remove(self, item):
+        super().remove(item)
+        self._removed(item)
+
+    def pop(self, index=-1):
+        item = super().pop(index)
+        self._removed(item)
+        return item
+
+    def clear(self):
+        items = list(self)
+        super().clear()
+        for item in items:
+            self._removed(item)
+
+    def __setitem__(self, index, value):
+        old = self[index]
+        new = list(value) if isinstance(index, slice) else value
+        super().__setitem__(index, new)
+
+        for item in (old if isinstance(index, slice) else [old]):
+            self._removed(item)
+        for item in (new if isinstance(index, slice) else [new]):
+            self._added(item)
+
+    def __delitem__(self, index):
+        old = self[index]
+        super().__delitem__(index)
+
+        for item in (old if isinstance(index, slice) else [old]):
+            self._removed(item)
+
+    def __imul__(self, times):
+        # Repetition would duplicate identities; keep it explicit
+        items = list(self)
+        for _ in range(max(times, 0) - 1):
+            self.extend(items)
+        if times <= 0:
+            self.clear()
+        return self
+
+
+class TrackedList(_ReportingList):
+
+    __slots__ = ('_on_add', '_on_remove')
+
+    def __init__(self, iterable=(), on_add=None, on_remove=None):
+        super().__init__()
+        self._on_add = on_add
+        self._on_remove = on_remove
+        self.extend(iterable)
+
+    # Pickle support: restoring a list is not a change, so the
+    # items are put back without calling the callbacks (their
+    # owner may not be fully restored yet at that point)
+    def __reduce__(self):
+        return _rebuild_tracked_list, (list(self), self._on_add, self._on_remove)
+
+    def _added(self, item):
+        if self._on_add is not None:
+            self._on_add(item)
+
+    def _removed(self, item):
+        if self._on_remove is not None:
+            self._on_remove(item)
+
+
+# The owner implements _list_added(item) and _list_removed(item)
+class OwnedList(_ReportingList):
+
+    __slots__ = ('_owner',)
+
+    def __init__(self, owner, iterable=()):
+        super().__init__()
+        self._owner = owner
+        self.extend(iterable)
+
+    def __reduce__(self):
+        return _rebuild_owned_list, (list(self), self._owner)
+
+    def _added(self, item):
+        self._owner._list_added(item)
+
+    def _removed(self, item):
+        self._owner._list_removed(item)
+
+
+def _rebuild_tracked_list(items, on_add, on_remove):
+    tracked = TrackedList(on_add=on_add, on_remove=on_remove)
+    list.extend(tracked, items)
+    return tracked
+
+
+def _rebuild_owned_list(items, owner):
+    owned = OwnedList(owner)
+    list.extend(owned, items)
+    return owned
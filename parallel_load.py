@@ -0,0 +1,162 @@
+import json
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from library import Library
+from serialization import book_row, check_version, from_row, user_row
+
+
+# ============================================================
+# PARALLEL BULK LOADER
+# ============================================================
+# Loads a large library.json using several processes.
+#
+# 1. The parent memory-maps the file and finds the `books` and
+#    `users` arrays and the record boundaries with plain byte
+#    searches (no parsing). This relies on the layout written by
+#    Persistence and json_stream.dump_members (indent=4): every
+#    array item starts on a line "        {", and JSON strings
+#    cannot contain a raw newline, so the markers are exact.
+# 2. Each array is cut into chunks at record boundaries.
+#    Workers parse and validate their chunk (serialization
+#    schema) and return compact rows plus the normalized title
+#    keys used by the Library index.
+# 3. The parent turns rows into objects, in file order, while
+#    the other chunks are still being parsed, and fills the
+#    Library indexes in bulk (Library._bulk_load).
+#
+# Files with another layout are loaded with the regular eager
+# loader (see Persistence.load_data).
+
+# Chunks per worker: smaller chunks balance the work better,
+# larger ones cost less inter-process traffic
+CHUNKS_PER_WORKER = 4
+
+_MEMBER = b'\n    "%s": '
+_ITEM = b'\n        {'
+_ARRAY_END = b'\n    ]'
+
+
+class LayoutError(ValueError):
+    """The file does not have the expected indented layout."""
+
+
+# ------------------------------------------------------------
+# Layout discovery (parent)
+# ------------------------------------------------------------
+# Returns (start, end) of the items of an array member: the
+# bytes between '[' and the closing bracket, or None if absent.
+def _array_span(mm, key):
+    marker = _MEMBER % key
+    position = mm.find(marker)
+    if position < 0:
+        return None
+
+    start = position + len(marker)
+    if mm[start:start + 2] == b'[]':
+        return start + 1, start + 1
+    if mm[start:start + 1] != b'[':
+        raise LayoutError(f'"{key.decode()}" is not an array')
+
+    end = mm.find(_ARRAY_END, start)
+    if end < 0:
+        raise LayoutError(f'"{key.decode()}" array is not closed')
+    return start + 1, end
+
+
+def _chunks(mm, span, count):
+    start, end = span
+    if start == end:
+        return []
+
+    size = max(1, (end - start) // count)
+    cuts = [start]
+    for target in range(start + size, end, size):
+        cut = mm.find(_ITEM, max(target, cuts[-1] + 1), end)
+        if cut < 0:
+            break
+        if cut != cuts[-1]:
+            cuts.append(cut)
+    cuts.append(end)
+    return list(zip(cuts, cuts[1:]))
+
+
+# Top-level scalar members (name, journal_seq...): the file
+# with the arrays emptied is small enough to parse directly.
+def _scalars(mm, spans):
+    parts = []
+    position = 0
+    for start, end in sorted(spans):
+        parts.append(mm[position:start])
+        position = end
+    parts.append(mm[position:])
+    return json.loads(b''.join(parts))
+
+
+# ------------------------------------------------------------
+# Chunk parsing (workers)
+# ------------------------------------------------------------
+def _parse_chunk(path, kind, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8').strip().rstrip(',')
+    records = json.loads(f'[{text}]')
+
+    if kind == 'books':
+        rows = [book_row(record) for record in records]
+        keys = [record['title'].lower() for record in records]
+        return rows, keys
+    return [user_row(record) for record in records], None
+
+
+# Yields (kind, parsed chunk) in file order. A single worker
+# parses in this process: no pool, no pickling.
+def _parsed_chunks(path, jobs, workers):
+    if workers == 1:
+        for kind, start, end in jobs:
+            yield kind, _parse_chunk(path, kind, start, end)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_parse_chunk, path, *job) for job in jobs]
+        for (kind, _, _), future in zip(jobs, futures):
+            yield kind, future.result()
+
+
+# ============================================================
+# LOADER
+# ============================================================
+# Returns (library, journal_seq), like the other loaders.
+def load_parallel(path, workers=None):
+    workers = workers or os.cpu_count() or 1
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        spans = {
+            kind: _array_span(mm, kind.encode())
+            for kind in ('users', 'books')
+        }
+        present = [span for span in spans.values() if span is not None]
+        if not present:
+            raise LayoutError('No books/users arrays found')
+
+        scalars = _scalars(mm, present)
+        jobs = [
+            (kind, start, end)
+            for kind, span in spans.items() if span is not None
+            for start, end in _chunks(mm, span, workers * CHUNKS_PER_WORKER)
+        ]
+
+    check_version(scalars.get('schema_version'))
+    library = Library(scalars.get('name'))
+
+    books, title_keys, users = [], [], []
+    for kind, (rows, keys) in _parsed_chunks(path, jobs, workers):
+        if kind == 'books':
+            books.extend(from_row(type_name, row) for type_name, row in rows)
+            title_keys.extend(keys)
+        else:
+            users.extend(from_row(type_name, row) for type_name, row in rows)
+
+    library._bulk_load(books, title_keys, users)
+    return library, scalars.get('journal_seq', 0)
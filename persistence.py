@@ -1,9 +1,16 @@
 import json
+import os
 from datetime import datetime
+from functools import partial
 
-from books import PhysicalBook
-from library import Library
-from users import Student
+from binary_snapshot import BinarySnapshot, SnapshotWriter
+from journal import EventRecorder, Journal, replay
+from json_stream import iter_members, read_span
+from library import Library, LazyLibrary
+from parallel_load import LayoutError, load_parallel
+from scheduler import LoanScheduler, read_state, write_state
+from serialization import SCHEMA_VERSION, check_version, decode_book, decode_user, encode
+from sqlite_store import SQLiteStore
 
 
 # ============================================================
@@ -14,70 +21,349 @@ from users import Student
 # - Separation of concerns (Persistence vs Business Logic)
 # - Object serialization/deserialization
 # - Encapsulation of file I/O
+#
+# Optionally, changes are recorded in a write-ahead journal
+# (`<file>.journal`): saves only append the new domain events
+# and the JSON file becomes a periodic snapshot.
+#
+# With backend='sqlite', `file` is a SQLite database instead
+# (see sqlite_store.py): saves are transactions applying the
+# changes, and lookups can read the indexed tables directly.
 class Persistence:
 
     # --------------------------------------------------------
     # Constructor
     # --------------------------------------------------------
     # Initializes the persistence layer with a default file.
-    def __init__(self, file="library.json") -> None:
+    #
+    # - journal: append events instead of rewriting the file
+    # - compact_every: number of journaled events after which
+    #   a new snapshot is written and the journal is emptied
+    # - backend: 'json' or 'sqlite'
+    def __init__(self, file="library.json", journal=False, compact_every=1000,
+                 backend='json') -> None:
+        if backend not in ('json', 'sqlite'):
+            raise ValueError(f'Unknown persistence backend: {backend}')
+        if backend == 'sqlite' and journal:
+            raise ValueError('The sqlite backend does not use a journal')
+
         self.file = file
+        self.backend = backend
+        self.compact_every = compact_every
+        self.journal = Journal(f'{file}.journal') if journal else None
+        self.store = SQLiteStore(file) if backend == 'sqlite' else None
+
+        # Loan due dates, saved to `<file>.schedule` (see
+        # load_scheduler)
+        self.scheduler = None
+
+        # Library whose events are being recorded
+        self._library = None
+        self._recorder = None
+        self._since_snapshot = 0
 
     # --------------------------------------------------------
     # Save Library Data
     # --------------------------------------------------------
+    # Without a journal the whole library is written.
+    # With a journal, only the events recorded since the last
+    # save are appended; a snapshot is written when the library
+    # is not tracked yet or when the journal grows too long.
+    def save_data(self, library):
+        self.prepare_save(library)()
+
+    # --------------------------------------------------------
+    # Two-phase save
+    # --------------------------------------------------------
+    # Collects everything that has to be written (in memory,
+    # from the caller's thread) and returns a callable doing the
+    # file I/O. The callable can run in another thread while the
+    # library keeps changing (see server.py).
+    def prepare_save(self, library):
+        write = self._prepare_library_save(library)
+        if self.scheduler is None or self.scheduler.library is not library:
+            return write
+        return partial(self._write_all, write, self.scheduler.state())
+
+    def _write_all(self, write, schedule):
+        write()
+        write_state(self._schedule_file, schedule)
+
+    def _prepare_library_save(self, library):
+        if self.store is not None:
+            return self.store.prepare_save(library)
+
+        if self.journal is None or library is not self._library:
+            return self._prepare_snapshot(library)
+
+        events = self._recorder.drain()
+        self._since_snapshot += len(events)
+
+        if self._since_snapshot >= self.compact_every:
+            # The snapshot already contains these events
+            return self._prepare_snapshot(library)
+
+        return partial(self.journal.append, events)
+
+    # --------------------------------------------------------
+    # Snapshot (compaction)
+    # --------------------------------------------------------
+    # Writes the full library and, in journal mode, empties the
+    # journal: the snapshot already contains those events.
+    def compact(self, library):
+        if self.store is not None:
+            self.store.prepare_snapshot(library)()
+            return
+        self._prepare_snapshot(library)()
+
+    def close(self):
+        """Releases the database connection (sqlite backend)."""
+        if self.store is not None:
+            self.store.close()
+
+    def _prepare_snapshot(self, library):
+        seq = 0
+        if self.journal is not None:
+            if library is not self._library:
+                # Continue the numbering of any existing journal
+                events = self.journal.read()
+                self._track(library, events[-1]['seq'] if events else 0)
+            self._recorder.drain()
+            seq = self._recorder.seq
+            self._since_snapshot = 0
+
+        return partial(self._write_snapshot, self._snapshot_data(library, seq))
+
+    def _track(self, library, seq):
+        if self._library is not None:
+            self._library.unsubscribe(self._recorder)
+
+        self._library = library
+        self._recorder = EventRecorder(seq)
+        library.subscribe(self._recorder)
+
     # Converts the library, users, and books into a JSON-serializable format.
     # Adds a timestamp of the save operation.
-    def save_data(self, library):
+    def _snapshot_data(self, library, seq):
+        # A lazy library must be complete before being written
+        if isinstance(library, LazyLibrary):
+            library.materialize_all()
+
         data = {
             'name': library.name,
+            'schema_version': SCHEMA_VERSION,
             'users': [
-                user.__dict__  # Converts user object attributes to a dictionary
+                encode(user)  # Tagged record (see serialization.py)
                 for user in library.users
             ],
             'books': [
-                book.__dict__  # Converts book object attributes to a dictionary
+                encode(book)  # Tagged record (see serialization.py)
                 for book in library.books
             ],
             'save_date': datetime.now().strftime('%d/%m/%Y %H:%M:%S')  # Timestamp
         }
+        if self.journal is not None:
+            # Last journal event included in this snapshot
+            data['journal_seq'] = seq
+        return data
 
-        # Write the data to a JSON file
-        with open(self.file, 'w', encoding='utf-8') as f:
+    def _write_snapshot(self, data):
+        # Write the data to a temporary file, then atomically
+        # replace the old one: a crash never leaves a torn file
+        tmp_file = f'{self.file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.file)
+
+        if self.journal is not None:
+            self.journal.reset()
 
     # --------------------------------------------------------
     # Load Library Data
     # --------------------------------------------------------
     # Reads the JSON file and reconstructs Library, Book, and Student objects.
     # Demonstrates deserialization and object reconstruction.
-    def load_data(self):
+    #
+    # Supported modes:
+    # - 'eager'  : parses the whole file at once (default)
+    # - 'stream' : parses the books/users arrays item by item,
+    #              building each object as it arrives
+    # - 'lazy'   : scans the file once, keeping only lookup keys
+    #              and byte spans; objects are built on demand
+    # - 'parallel': parses chunks of the arrays in `workers`
+    #              processes (see parallel_load.py); files without
+    #              the indented layout fall back to 'eager'
+    #
+    # In journal mode, the events written after the snapshot
+    # are replayed and the library is tracked for later saves.
+    #
+    # The sqlite backend supports 'eager' and 'lazy' (lookups
+    # query the database, see SQLiteLibrary).
+    def load_data(self, mode='eager', workers=None):
+        if self.store is not None:
+            if mode == 'eager':
+                return self.store.load()
+            if mode == 'lazy':
+                return self.store.load_lazy()
+            raise ValueError(f'Unsupported load mode for sqlite: {mode}')
+
+        if mode == 'eager':
+            library, seq = self._load_eager()
+        elif mode == 'parallel':
+            try:
+                library, seq = load_parallel(self.file, workers)
+            except LayoutError:
+                library, seq = self._load_eager()
+        elif mode == 'stream':
+            library, seq = self._load_stream()
+        elif mode == 'lazy':
+            library, seq = self._load_lazy()
+        else:
+            raise ValueError(f'Unknown load mode: {mode}')
+
+        if self.journal is not None:
+            events = self.journal.read()
+            last_seq = replay(library, events, decode_book,
+                              decode_user, after_seq=seq)
+            self._track(library, last_seq)
+            self._since_snapshot = last_seq - seq
+
+        return library
+
+    def _load_eager(self):
         with open(self.file, 'r', encoding='utf-8') as f:
             data = json.load(f)
+        check_version(data.get('schema_version'))
 
         # Recreate the Library instance
         library = Library(data['name'])
 
         # Reconstruct Book objects and add them to the library
         for data_book in data['books']:
-            book = PhysicalBook(
-                id=data_book['id'],
-                title=data_book['title'],
-                author=data_book['author'],
-                price=data_book['price'],
-                available=data_book['available'],
-            )
-            library.books.append(book)
-
-        # Reconstruct Student objects and add them to the library
+            library.books.append(decode_book(data_book))
+
+        # Reconstruct Student / Teacher objects and add them to the library
         for data_user in data['users']:
-            user = Student(
-                id=data_user['id'],
-                name=data_user['name'],
-                id_card=data_user['id_card'],
-                subject=data_user['subject']
-            )
-            library.users.append(user)
+            library.users.append(decode_user(data_user))
 
         # Return the reconstructed library
+        return library, data.get('journal_seq', 0)
+
+    # --------------------------------------------------------
+    # Streaming load
+    # --------------------------------------------------------
+    # Objects are created while the file is being read, so only
+    # one record is held in its raw (dict) form at a time.
+    def _load_stream(self):
+        library = Library(None)
+        seq = 0
+
+        with open(self.file, 'rb') as f:
+            for key, value, _, _ in iter_members(f, ('books', 'users')):
+                if key == 'books':
+                    library.books.append(decode_book(value))
+                elif key == 'users':
+                    library.users.append(decode_user(value))
+                elif key == 'name':
+                    library.name = value
+                elif key == 'schema_version':
+                    check_version(value)
+                elif key == 'journal_seq':
+                    seq = value
+
+        return library, seq
+
+    # --------------------------------------------------------
+    # Lazy load
+    # --------------------------------------------------------
+    # Records are located by their byte span in the file and
+    # decoded only when a query touches them.
+    def _load_lazy(self):
+        library = LazyLibrary(None, self._read_book, self._read_user)
+        seq = 0
+
+        with open(self.file, 'rb') as f:
+            for key, value, start, end in iter_members(f, ('books', 'users')):
+                if key == 'books':
+                    library.add_pending_book(value['title'], (start, end))
+                elif key == 'users':
+                    library.add_pending_user(value['id_card'], (start, end))
+                elif key == 'name':
+                    library.name = value
+                elif key == 'schema_version':
+                    check_version(value)
+                elif key == 'journal_seq':
+                    seq = value
+
+        return library, seq
+
+    def _read_record(self, span):
+        with open(self.file, 'rb') as f:
+            return read_span(f, *span)
+
+    def _read_book(self, span):
+        return decode_book(self._read_record(span))
+
+    def _read_user(self, span):
+        return decode_user(self._read_record(span))
+
+    # --------------------------------------------------------
+    # Binary snapshots
+    # --------------------------------------------------------
+    # Second persistence format (see binary_snapshot.py): fixed
+    # width records memory-mapped on load. With lazy=True only the
+    # lookup keys are read and records are decoded on demand.
+    def save_binary(self, library, file=None):
+        if isinstance(library, LazyLibrary):
+            library.materialize_all()
+
+        with SnapshotWriter(file or self._binary_file) as writer:
+            writer.name = library.name
+            writer.save_date = datetime.now().strftime('%d/%m/%Y %H:%M:%S')
+            for book in library.books:
+                writer.add_book(encode(book))
+            for user in library.users:
+                writer.add_user(encode(user))
+
+    def load_binary(self, file=None, lazy=False):
+        snapshot = BinarySnapshot(file or self._binary_file)
+
+        if not lazy:
+            library = Library(snapshot.name)
+            for index in range(snapshot.book_count):
+                library.books.append(snapshot.book(index))
+            for index in range(snapshot.user_count):
+                library.users.append(snapshot.user(index))
+            snapshot.close()
+            return library
+
+        # The mapping stays open while the library may need it
+        library = LazyLibrary(snapshot.name, snapshot.book, snapshot.user)
+        for index in range(snapshot.book_count):
+            library.add_pending_book(snapshot.book_title(index), index)
+        for index in range(snapshot.user_count):
+            library.add_pending_user(snapshot.user_id_card(index), index)
         return library
+
+    # --------------------------------------------------------
+    # Loan scheduler
+    # --------------------------------------------------------
+    # Creates the due-date scheduler of a loaded library (see
+    # scheduler.py), restored from `<file>.schedule`. Its state
+    # is then written by every save.
+    def load_scheduler(self, library, **options):
+        if self.scheduler is not None:
+            self.scheduler.close()
+        self.scheduler = LoanScheduler(library, **options)
+        self.scheduler.restore(read_state(self._schedule_file))
+        return self.scheduler
+
+    @property
+    def _schedule_file(self):
+        return f'{self.file}.schedule'
+
+    @property
+    def _binary_file(self):
+        return os.path.splitext(self.file)[0] + '.bin'
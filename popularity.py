@@ -0,0 +1,177 @@
+from bisect import bisect_left, insort
+
+from books import Book
+
+
+# ============================================================
+# POPULARITY RANKING
+# ============================================================
+# Ranks books by borrowed_times, updated incrementally on every
+# lend, so the storefront never sorts the whole catalog.
+#
+# Structures:
+# - Fenwick tree indexed by borrowed_times: how many books have
+#   each lend count; prefix sums answer "how many books have
+#   more than N lends" in O(log max_lends)
+# - buckets: lend count -> books with that count (insertion
+#   ordered: among ties, the first to reach the count ranks
+#   first)
+# - sorted list of the distinct lend counts, walked from the
+#   top for top-K queries
+#
+# Queries:
+# - top(k)             O(k + distinct counts visited)
+# - rank(book)         O(log max_lends)
+# - count_above(n)     O(log max_lends)
+# - popular_books(n)   O(result)
+#
+# The threshold defaults to Book.popular_threshold, the value
+# also used by Book.is_popular.
+class PopularityRanking:
+
+    def __init__(self, library=None) -> None:
+        self._tree = [0] * 65  # Fenwick tree (1-based), grows as needed
+        self._buckets = {}     # lend count -> {book: None}
+        self._counts = []      # sorted distinct lend counts
+        self._ranked = {}      # book -> lend count when last ranked
+
+        self._library = None
+        if library is not None:
+            self.attach(library)
+
+    def __len__(self):
+        return len(self._ranked)
+
+    # --------------------------------------------------------
+    # Synchronization with a Library
+    # --------------------------------------------------------
+    def attach(self, library):
+        self.detach()
+        self._library = library
+        for book in library.books:
+            self.add(book)
+        library.subscribe(self._on_library_event)
+
+    def detach(self):
+        if self._library is not None:
+            self._library.unsubscribe(self._on_library_event)
+            self._library = None
+
+    # Book.lend notifies 'available' after incrementing the
+    # counter; the borrowed_times setter notifies directly
+    def _on_library_event(self, library, event, *args):
+        if event == 'book_added':
+            self.add(args[0])
+        elif event == 'book_removed':
+            self.remove(args[0])
+        elif event == 'book_changed' and args[1] in ('available', 'borrowed_times'):
+            self.update(args[0])
+
+    # --------------------------------------------------------
+    # Fenwick tree over lend counts
+    # --------------------------------------------------------
+    def _tree_add(self, count, delta):
+        if count + 1 >= len(self._tree):
+            self._grow(count + 1)
+        index = count + 1
+        tree = self._tree
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+
+    def _tree_prefix(self, count):
+        """Number of books with at most `count` lends."""
+        index = min(count + 1, len(self._tree) - 1)
+        total = 0
+        tree = self._tree
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+    # Rebuilds the tree with room for `count`, doubling its size
+    def _grow(self, count):
+        size = len(self._tree) - 1
+        while size <= count:
+            size *= 2
+        self._tree = [0] * (size + 1)
+        for lends, bucket in self._buckets.items():
+            index = lends + 1
+            while index <= size:
+                self._tree[index] += len(bucket)
+                index += index & -index
+
+    # --------------------------------------------------------
+    # Maintenance
+    # --------------------------------------------------------
+    def add(self, book):
+        if book in self._ranked:
+            return
+        self._place(book, book.borrowed_times)
+
+    def remove(self, book):
+        lends = self._ranked.pop(book, None)
+        if lends is not None:
+            self._unplace(book, lends)
+
+    def update(self, book):
+        """Re-ranks a book whose borrowed_times changed."""
+        lends = self._ranked.get(book)
+        if lends is None or lends == book.borrowed_times:
+            return
+        self._unplace(book, lends)
+        self._place(book, book.borrowed_times)
+
+    def _place(self, book, lends):
+        self._ranked[book] = lends
+        bucket = self._buckets.get(lends)
+        if bucket is None:
+            bucket = self._buckets[lends] = {}
+            insort(self._counts, lends)
+        bucket[book] = None
+        self._tree_add(lends, 1)
+
+    def _unplace(self, book, lends):
+        bucket = self._buckets[lends]
+        del bucket[book]
+        if not bucket:
+            del self._buckets[lends]
+            del self._counts[bisect_left(self._counts, lends)]
+        self._tree_add(lends, -1)
+
+    # --------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------
+    def top(self, k=10):
+        """[(book, borrowed_times)] of the k most borrowed books."""
+        result = []
+        for lends in reversed(self._counts):
+            for book in self._buckets[lends]:
+                if len(result) == k:
+                    return result
+                result.append((book, lends))
+        return result
+
+    def rank(self, book):
+        """1-based rank (books with more lends + 1; ties share it)."""
+        lends = self._ranked[book]
+        return len(self._ranked) - self._tree_prefix(lends) + 1
+
+    def count_above(self, threshold=None):
+        """Number of books borrowed more than threshold times."""
+        if threshold is None:
+            threshold = Book.popular_threshold
+        if threshold < 0:
+            return len(self._ranked)
+        return len(self._ranked) - self._tree_prefix(threshold)
+
+    def popular_books(self, threshold=None):
+        """Books borrowed more than threshold times, most first."""
+        if threshold is None:
+            threshold = Book.popular_threshold
+        start = bisect_left(self._counts, threshold + 1)
+        return [
+            book
+            for lends in reversed(self._counts[start:])
+            for book in self._buckets[lends]
+        ]
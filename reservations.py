@@ -0,0 +1,281 @@
+import threading
+from bisect import bisect_left, insort
+from collections import deque, namedtuple
+
+from exceptions import HoldError
+from users import Teacher
+
+
+# ============================================================
+# RESERVATIONS
+# ============================================================
+# Hold queues (waitlists) per title. A patron who finds every
+# copy lent places a hold instead of polling find_book + lend;
+# when a copy comes back, Book.return_book hands it straight to
+# the next holder (Library.return_hooks), so it never goes back
+# on the shelf where another patron could take it first.
+#
+# Fairness:
+# - one FIFO queue per priority level; by default Teachers are
+#   served before Students (see teacher_first)
+# - within a level, first come, first served
+#
+# Cancelled holds stay in the queue, marked, and are skipped
+# when they reach the front; their tickets are kept in a sorted
+# list to compute positions. Costs (n = holds of the title,
+# c = cancelled holds still queued, usually few):
+# - place_hold                          O(1) amortized
+# - cancel_hold                         O(c) (sorted list insert)
+# - hand-off                            O(1) amortized, plus O(c)
+#                                       per cancelled hold skipped
+# - queue_length                        O(1)
+# - position                            O(log c)
+# - holds (full queue listing)          O(n)
+#
+# A holder who reached their borrowing limit when a copy comes
+# back loses the hold, and the copy goes to the next one. When
+# the library is shared by threads through a ConcurrentLibrary,
+# pass it as `lending`: copies are then handed off under the
+# holder's user lock, like a regular lend.
+#
+# Holds live in memory only: they are not part of the saved
+# library.
+
+HoldInfo = namedtuple('HoldInfo', 'id_card title position')
+
+
+def teacher_first(user):
+    """Default priority: Teachers (0) before everyone else (1)."""
+    return 0 if isinstance(user, Teacher) else 1
+
+
+class _Hold:
+
+    __slots__ = ('user', 'key', 'title', 'level', 'ticket', 'active')
+
+    def __init__(self, user, key, title, level, ticket) -> None:
+        self.user = user
+        self.key = key
+        self.title = title
+        self.level = level
+        self.ticket = ticket
+        self.active = True
+
+
+# One priority level of a title: holds in ticket order, plus
+# the sorted tickets of the cancelled holds still queued
+class _Queue:
+
+    __slots__ = ('holds', 'cancelled', 'next_ticket', 'active')
+
+    def __init__(self) -> None:
+        self.holds = deque()
+        self.cancelled = []
+        self.next_ticket = 0
+        self.active = 0
+
+    def push(self, hold):
+        self.holds.append(hold)
+        self.next_ticket += 1
+        self.active += 1
+
+    def cancel(self, hold):
+        hold.active = False
+        insort(self.cancelled, hold.ticket)
+        self.active -= 1
+
+    # Drops the cancelled holds at the front
+    def _skip_cancelled(self):
+        holds = self.holds
+        while holds and not holds[0].active:
+            del self.cancelled[bisect_left(self.cancelled, holds.popleft().ticket)]
+
+    def pop(self):
+        self._skip_cancelled()
+        if not self.holds:
+            return None
+        self.active -= 1
+        hold = self.holds.popleft()
+        hold.active = False
+        return hold
+
+    def ahead(self, hold):
+        """Active holds queued before `hold`."""
+        self._skip_cancelled()
+        first = self.holds[0].ticket
+        return hold.ticket - first - bisect_left(self.cancelled, hold.ticket)
+
+
+class ReservationDesk:
+
+    def __init__(self, library, priority=teacher_first, on_hand_off=None,
+                 lending=None) -> None:
+        self.library = library
+        self.priority = priority
+        self.lending = lending
+
+        # Called as on_hand_off(user, book) after a copy was
+        # handed to a holder (e.g. to notify the patron)
+        self.on_hand_off = on_hand_off
+
+        self._queues = {}   # title key -> {level: _Queue}
+        self._by_user = {}  # user -> {title key: _Hold}
+        self._lock = threading.RLock()
+
+        self.handed_off = 0
+        self.expired = 0
+
+        library.return_hooks += (self._hand_off,)
+        library.subscribe(self._on_library_event)
+
+    def close(self):
+        """Stops handing off copies; the holds are dropped."""
+        self.library.return_hooks = tuple(
+            hook for hook in self.library.return_hooks if hook != self._hand_off
+        )
+        self.library.unsubscribe(self._on_library_event)
+        with self._lock:
+            self._queues.clear()
+            self._by_user.clear()
+
+    @staticmethod
+    def _title_key(title):
+        return title.strip().lower()
+
+    # --------------------------------------------------------
+    # Place / cancel
+    # --------------------------------------------------------
+    def place_hold(self, id_card, title):
+        """Queues a hold; returns its HoldInfo (1-based position)."""
+        user = self.library.find_user(id_card)
+        book = self.library.find_book(title)
+        key = self._title_key(title)
+
+        with self._lock:
+            if book.available:
+                raise HoldError(f'{book.title} is available: no hold needed')
+            user_holds = self._by_user.setdefault(user, {})
+            if key in user_holds:
+                raise HoldError(f'{id_card} already holds {book.title}')
+
+            level = self.priority(user)
+            queue = self._queues.setdefault(key, {}).get(level)
+            if queue is None:
+                queue = self._queues[key][level] = _Queue()
+            hold = _Hold(user, key, book.title, level, queue.next_ticket)
+            queue.push(hold)
+            user_holds[key] = hold
+            return HoldInfo(id_card, book.title, self._position(hold))
+
+    def cancel_hold(self, id_card, title):
+        user = self.library.find_user(id_card)
+        key = self._title_key(title)
+
+        with self._lock:
+            hold = self._by_user.get(user, {}).get(key)
+            if hold is None:
+                raise HoldError(f'{id_card} has no hold on {title}')
+            self._forget(hold)
+            self._queues[key][hold.level].cancel(hold)
+
+    def _forget(self, hold):
+        user_holds = self._by_user[hold.user]
+        del user_holds[hold.key]
+        if not user_holds:
+            del self._by_user[hold.user]
+
+    # --------------------------------------------------------
+    # Inspection
+    # --------------------------------------------------------
+    def queue_length(self, title):
+        with self._lock:
+            levels = self._queues.get(self._title_key(title), {})
+            return sum(queue.active for queue in levels.values())
+
+    def position(self, id_card, title):
+        """1-based position of a patron's hold, or None."""
+        user = self.library.find_user(id_card)
+        with self._lock:
+            hold = self._by_user.get(user, {}).get(self._title_key(title))
+            return None if hold is None else self._position(hold)
+
+    def _position(self, hold):
+        levels = self._queues[hold.key]
+        before = sum(
+            queue.active for level, queue in levels.items() if level < hold.level
+        )
+        return before + levels[hold.level].ahead(hold) + 1
+
+    def holds(self, title):
+        """id_cards waiting for a title, in serving order."""
+        with self._lock:
+            levels = self._queues.get(self._title_key(title), {})
+            return [
+                hold.user.id_card
+                for level in sorted(levels)
+                for hold in levels[level].holds
+                if hold.active
+            ]
+
+    def holds_of(self, id_card):
+        """HoldInfo of every hold of a patron."""
+        user = self.library.find_user(id_card)
+        with self._lock:
+            return [
+                HoldInfo(id_card, hold.title, self._position(hold))
+                for hold in self._by_user.get(user, {}).values()
+            ]
+
+    # --------------------------------------------------------
+    # Hand-off (Library.return_hooks)
+    # --------------------------------------------------------
+    def _hand_off(self, book):
+        key = self._title_key(book.title)
+        if key not in self._queues:
+            return False
+
+        with self._lock:
+            hold = self._next_holder(key, book)
+            if hold is None:
+                return False
+            self.handed_off += 1
+
+        if self.on_hand_off is not None:
+            self.on_hand_off(hold.user, book)
+        return True
+
+    def _next_holder(self, key, book):
+        levels = self._queues[key]
+        for level in sorted(levels):
+            queue = levels[level]
+            while (hold := queue.pop()) is not None:
+                self._forget(hold)
+                if self._pass_on(hold.user, book):
+                    return hold
+                self.expired += 1
+
+        del self._queues[key]
+        return None
+
+    # The copy stays lent: its lend count goes up and the loan
+    # goes through the holder's book_request, as a regular lend
+    # would. False when the holder reached their borrowing limit.
+    def _pass_on(self, user, book):
+        if self.lending is not None:
+            return self.lending.pass_on(user, book)
+        if user.limit_books is not None and len(user.lend_books) >= user.limit_books:
+            return False
+        book.borrowed_times = book.borrowed_times + 1
+        user.book_request(book.title)
+        return True
+
+    # --------------------------------------------------------
+    # Library events
+    # --------------------------------------------------------
+    # Removed users lose their holds
+    def _on_library_event(self, library, event, *args):
+        if event == 'user_removed':
+            with self._lock:
+                for hold in list(self._by_user.get(args[0], {}).values()):
+                    self._forget(hold)
+                    self._queues[hold.key][hold.level].cancel(hold)
@@ -0,0 +1,395 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import timedelta
+
+from exceptions import LibraryError, UserNoFoudError
+from loans import DEFAULT_LOAN_DAYS
+
+
+# ============================================================
+# LOAN SCHEDULER
+# ============================================================
+# Tracks the due date of every loan and fires reminder and
+# overdue events on time, without scanning the users' loans.
+#
+# - a loan is registered when a title is added to a user's
+#   lend_books (the user_changed 'loan_added' event), with the
+#   loan_period of the book (books.py)
+# - returning the title cancels its timers
+# - advance() moves the clock forward and fires what is due:
+#   on_reminder(loan) `remind_before` the due date, then
+#   on_overdue(loan) at the due date
+#
+# Timers live in a hierarchical timing wheel (TimingWheel).
+# The scheduler state is saved next to the library file by
+# Persistence (see Persistence.load_scheduler), so due dates
+# survive restarts; events missed while the program was down
+# fire on the first advance().
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS  # slots per wheel level
+LEVELS = 4              # 64^4 ticks: ~31 years at one minute
+
+_REMINDER, _OVERDUE = 'reminder', 'overdue'
+
+
+# ============================================================
+# TIMING WHEEL
+# ============================================================
+# Level l has 64 slots of 64^l ticks each. A timer is stored at
+# the lowest level whose span covers its distance from now;
+# when the clock enters a slot of an upper level, the slot is
+# emptied into the levels below ("cascade"). A timer cascades
+# at most LEVELS times, so inserting, cancelling and firing
+# cost O(1) amortized, and each tick only visits one slot per
+# level at its boundaries.
+#
+# Cancelled timers are marked and dropped when their slot is
+# visited. While the wheel is empty the clock jumps directly to
+# the target tick.
+class _Timer:
+
+    __slots__ = ('deadline', 'kind', 'loan', 'cancelled')
+
+    def __init__(self, deadline, kind, loan) -> None:
+        self.deadline = deadline
+        self.kind = kind
+        self.loan = loan
+        self.cancelled = False
+
+
+class TimingWheel:
+
+    def __init__(self, now=0) -> None:
+        self.now = now
+        self._levels = [[[] for _ in range(SLOTS)] for _ in range(LEVELS)]
+        self._overflow = []  # beyond the last level
+        self._due = []       # deadline already reached
+        self._size = 0       # stored timers, cancelled ones included
+
+    def __len__(self):
+        return self._size
+
+    def add(self, timer):
+        self._size += 1
+        self._place(timer)
+
+    def _place(self, timer):
+        delta = timer.deadline - self.now
+        if delta <= 0:
+            self._due.append(timer)
+            return
+
+        for level in range(LEVELS):
+            if delta < SLOTS << (SLOT_BITS * level):
+                slot = (timer.deadline >> (SLOT_BITS * level)) & (SLOTS - 1)
+                self._levels[level][slot].append(timer)
+                return
+        self._overflow.append(timer)
+
+    def advance(self, target):
+        """Moves to tick `target`; returns the timers due, in order."""
+        fired = []
+        self._collect(self._due, fired)
+
+        while self.now < target:
+            if not self._size:
+                self.now = target
+                break
+
+            self.now += 1
+            now = self.now
+
+            # Cascade the upper levels whose slot boundary is now
+            # (highest first, so timers trickle down)
+            if not now & (SLOTS - 1):
+                if not now & ((1 << (SLOT_BITS * (LEVELS - 1))) - 1):
+                    self._cascade(self._overflow)
+                for level in range(LEVELS - 1, 0, -1):
+                    if not now & ((1 << (SLOT_BITS * level)) - 1):
+                        slot = (now >> (SLOT_BITS * level)) & (SLOTS - 1)
+                        self._cascade(self._levels[level][slot])
+
+            self._collect(self._levels[0][now & (SLOTS - 1)], fired)
+            self._collect(self._due, fired)
+
+        return fired
+
+    def _cascade(self, timers):
+        pending = timers[:]
+        timers.clear()
+        for timer in pending:
+            if timer.cancelled:
+                self._size -= 1
+            else:
+                self._place(timer)
+
+    def _collect(self, timers, fired):
+        for timer in timers:
+            self._size -= 1
+            if not timer.cancelled:
+                fired.append(timer)
+        timers.clear()
+
+
+# ============================================================
+# SCHEDULED LOANS
+# ============================================================
+class ScheduledLoan:
+
+    __slots__ = ('id', 'id_card', 'title', 'lent_at', 'due_at',
+                 'reminded', 'overdue', 'timers')
+
+    def __init__(self, id, id_card, title, lent_at, due_at) -> None:
+        self.id = id
+        self.id_card = id_card
+        self.title = title
+        self.lent_at = lent_at
+        self.due_at = due_at
+        self.reminded = False
+        self.overdue = False
+        self.timers = ()
+
+    def __repr__(self):
+        return (f'ScheduledLoan({self.id}, {self.id_card!r}, {self.title!r}, '
+                f'due_at={self.due_at})')
+
+
+class LoanScheduler:
+
+    def __init__(
+            self,
+            library,
+            resolution=60.0,
+            remind_before=timedelta(days=1),
+            on_reminder=None,
+            on_overdue=None,
+            clock=time.time,
+    ) -> None:
+        self.library = library
+        self.resolution = resolution  # seconds per tick
+        self.remind_before = remind_before.total_seconds()
+        self.on_reminder = on_reminder
+        self.on_overdue = on_overdue
+        self.clock = clock
+
+        self._wheel = TimingWheel(self._tick(clock()))
+        self._loans = {}      # loan id -> ScheduledLoan
+        self._by_title = {}   # (id_card, title key) -> deque of loans, oldest first
+        self._overdue = {}    # loan id -> ScheduledLoan
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        library.subscribe(self._on_library_event)
+
+    def close(self):
+        self.library.unsubscribe(self._on_library_event)
+
+    def __len__(self):
+        return len(self._loans)
+
+    def _tick(self, when):
+        return int(when // self.resolution)
+
+    # Deadlines round up: an event never fires early, and at
+    # most one resolution late
+    def _deadline(self, when):
+        return -int(-when // self.resolution)
+
+    # --------------------------------------------------------
+    # Registration
+    # --------------------------------------------------------
+    def register(self, id_card, title, lent_at=None, period=None):
+        """Schedules a loan; period defaults to the book's loan_period."""
+        lent_at = self.clock() if lent_at is None else lent_at
+        if period is None:
+            period = self._loan_period(title)
+        with self._lock:
+            return self._add(id_card, title, lent_at, lent_at + period.total_seconds())
+
+    def _loan_period(self, title):
+        try:
+            return self.library.find_book(title).loan_period
+        except (LibraryError, AttributeError):
+            return timedelta(days=DEFAULT_LOAN_DAYS)
+
+    def _add(self, id_card, title, lent_at, due_at, reminded=False, overdue=False):
+        loan = ScheduledLoan(self._next_id, id_card, title, lent_at, due_at)
+        self._next_id += 1
+        self._loans[loan.id] = loan
+        self._by_title.setdefault((id_card, title.strip().lower()), deque()).append(loan)
+
+        timers = []
+        if not reminded and not overdue and self.remind_before:
+            remind_at = due_at - self.remind_before
+            if remind_at > lent_at:
+                timers.append(_Timer(self._deadline(remind_at), _REMINDER, loan))
+        if overdue:
+            loan.overdue = True
+            self._overdue[loan.id] = loan
+        else:
+            timers.append(_Timer(self._deadline(due_at), _OVERDUE, loan))
+        loan.reminded = reminded
+
+        for timer in timers:
+            self._wheel.add(timer)
+        loan.timers = tuple(timers)
+        return loan
+
+    def release(self, id_card, title):
+        """Forgets the oldest loan of a title (it was returned)."""
+        with self._lock:
+            return self._release((id_card, title.strip().lower()))
+
+    def _release(self, key):
+        loans = self._by_title.get(key)
+        if not loans:
+            return None
+        loan = loans.popleft()
+        if not loans:
+            del self._by_title[key]
+
+        for timer in loan.timers:
+            timer.cancelled = True
+        del self._loans[loan.id]
+        self._overdue.pop(loan.id, None)
+        return loan
+
+    # --------------------------------------------------------
+    # Clock
+    # --------------------------------------------------------
+    def advance(self, now=None):
+        """Fires the events due up to `now`; returns them as (kind, loan)."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            fired = self._wheel.advance(self._tick(now))
+            events = []
+            for timer in fired:
+                loan = timer.loan
+                if timer.kind == _REMINDER:
+                    loan.reminded = True
+                else:
+                    loan.overdue = True
+                    self._overdue[loan.id] = loan
+                events.append((timer.kind, loan))
+
+        for kind, loan in events:
+            callback = self.on_reminder if kind == _REMINDER else self.on_overdue
+            if callback is not None:
+                callback(loan)
+        return events
+
+    # --------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------
+    def overdue_loans(self):
+        """Loans past their due date (as of the last advance)."""
+        with self._lock:
+            return sorted(self._overdue.values(), key=lambda loan: loan.due_at)
+
+    def loans_of(self, id_card):
+        with self._lock:
+            return [
+                loan
+                for (card, _), loans in self._by_title.items() if card == id_card
+                for loan in loans
+            ]
+
+    # --------------------------------------------------------
+    # Library events
+    # --------------------------------------------------------
+    def _on_library_event(self, library, event, *args):
+        if event == 'user_removed':
+            with self._lock:
+                for key in [key for key in self._by_title if key[0] == args[0].id_card]:
+                    while self._release(key) is not None:
+                        pass
+            return
+        if event != 'user_changed':
+            return
+
+        user, field, old, new = args
+        if field == 'loan_added':
+            self.register(user.id_card, new)
+        elif field == 'loan_removed':
+            self.release(user.id_card, old)
+        elif field == 'id_card':
+            with self._lock:
+                for key in [key for key in self._by_title if key[0] == old]:
+                    loans = self._by_title.pop(key)
+                    for loan in loans:
+                        loan.id_card = new
+                    self._by_title[(new, key[1])] = loans
+
+    # --------------------------------------------------------
+    # State (saved by Persistence)
+    # --------------------------------------------------------
+    def state(self):
+        with self._lock:
+            return {
+                'loans': [
+                    [loan.id_card, loan.title, loan.lent_at, loan.due_at,
+                     loan.reminded, loan.overdue]
+                    for loan in self._loans.values()
+                ],
+            }
+
+    # Restores saved loans, then reconciles them with the loans
+    # of the library users: saved loans no longer held are
+    # dropped, loans never scheduled start now.
+    def restore(self, state):
+        saved = state.get('loans', ())
+        held = Counter()  # (id_card, title key) -> loans held
+        counted = set()
+
+        def count(user):
+            if user.id_card not in counted:
+                counted.add(user.id_card)
+                for title in user.lend_books:
+                    held[(user.id_card, title.strip().lower())] += 1
+
+        for user in self.library.users:
+            count(user)
+        for id_card, *_ in saved:
+            if id_card not in counted:
+                try:
+                    count(self.library.find_user(id_card))
+                except UserNoFoudError:
+                    counted.add(id_card)
+
+        with self._lock:
+            for id_card, title, lent_at, due_at, reminded, overdue in saved:
+                key = (id_card, title.strip().lower())
+                if held[key] > 0:
+                    held[key] -= 1
+                    self._add(id_card, title, lent_at, due_at, reminded, overdue)
+
+        for user in self.library.users:
+            for title in user.lend_books:
+                key = (user.id_card, title.strip().lower())
+                if held[key] > 0:
+                    held[key] -= 1
+                    self.register(user.id_card, title)
+
+
+# ------------------------------------------------------------
+# State file
+# ------------------------------------------------------------
+def read_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_state(path, state):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
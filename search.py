@@ -0,0 +1,239 @@
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+
+# ============================================================
+# SEARCH MODULE
+# ============================================================
+# Full-text search over book titles and authors.
+#
+# Library.find_book only matches exact (normalized) titles.
+# SearchIndex accepts what patrons actually type:
+# - accents left out       "Cien anos de soledad"
+# - partial words          "princ"     -> "El Principito"
+# - small misspellings     "Fahrenheit 415", "Tolkein"
+# - author names           "garcia marquez"
+#
+# Structures:
+# - inverted index: token -> {doc id: field weight}
+# - sorted vocabulary: prefix queries with binary search
+# - trigram index: trigram -> tokens, for fuzzy candidates
+#
+# The index follows the Library events, so it is updated
+# incrementally when books are added, removed or renamed.
+
+_TOKEN = re.compile(r'\w+')
+
+# Relative importance of a match in each field
+TITLE_WEIGHT = 2.0
+AUTHOR_WEIGHT = 1.0
+
+# Relative importance of each kind of token match
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.7
+FUZZY_MATCH = 0.5
+
+# Limits keeping queries fast on very large vocabularies
+MAX_PREFIX_EXPANSION = 50
+MIN_FUZZY_SIMILARITY = 0.4
+
+
+# ============================================================
+# TEXT NORMALIZATION
+# ============================================================
+# Removes accents ("Márquez" -> "marquez") and case.
+def fold(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(
+        char for char in decomposed
+        if not unicodedata.combining(char)
+    ).casefold()
+
+
+def tokenize(text):
+    return _TOKEN.findall(fold(text))
+
+
+def trigrams(token):
+    padded = f'${token}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ============================================================
+# SEARCH INDEX
+# ============================================================
+class SearchIndex:
+
+    def __init__(self, library=None) -> None:
+        # Documents: doc id <-> Book
+        self._books = {}
+        self._doc_ids = {}
+        self._next_id = 0
+
+        # token -> {doc id: weight}
+        self._postings = {}
+
+        # Sorted distinct tokens (prefix search)
+        self._vocabulary = []
+
+        # trigram -> set of tokens (fuzzy search)
+        self._trigrams = {}
+
+        self._library = None
+        if library is not None:
+            self.attach(library)
+
+    def __len__(self):
+        return len(self._books)
+
+    # --------------------------------------------------------
+    # Synchronization with a Library
+    # --------------------------------------------------------
+    def attach(self, library):
+        self.detach()
+        self._library = library
+        for book in library.books:
+            self.add(book)
+        library.subscribe(self._on_library_event)
+
+    def detach(self):
+        if self._library is not None:
+            self._library.unsubscribe(self._on_library_event)
+            self._library = None
+
+    def _on_library_event(self, library, event, *args):
+        if event == 'book_added':
+            self.add(args[0])
+        elif event == 'book_removed':
+            self.remove(args[0])
+        elif event == 'book_changed' and args[1] == 'title':
+            self.remove(args[0], title=args[2])
+            self.add(args[0])
+
+    # --------------------------------------------------------
+    # Indexing
+    # --------------------------------------------------------
+    @staticmethod
+    def _document_tokens(title, author):
+        weights = {}
+        for token in tokenize(author or ''):
+            weights[token] = max(weights.get(token, 0), AUTHOR_WEIGHT)
+        for token in tokenize(title or ''):
+            weights[token] = max(weights.get(token, 0), TITLE_WEIGHT)
+        return weights
+
+    def add(self, book):
+        if book in self._doc_ids:
+            return
+
+        doc_id = self._doc_ids[book] = self._next_id
+        self._books[doc_id] = book
+        self._next_id += 1
+
+        for token, weight in self._document_tokens(book.title, book.author).items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._vocabulary, token)
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings[doc_id] = weight
+
+    # `title` allows removing a book indexed under its old title
+    def remove(self, book, title=None):
+        doc_id = self._doc_ids.pop(book, None)
+        if doc_id is None:
+            return
+        del self._books[doc_id]
+
+        tokens = self._document_tokens(title or book.title, book.author)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                self._drop_token(token)
+
+    def _drop_token(self, token):
+        del self._postings[token]
+        index = bisect_left(self._vocabulary, token)
+        if index < len(self._vocabulary) and self._vocabulary[index] == token:
+            del self._vocabulary[index]
+        for gram in trigrams(token):
+            tokens = self._trigrams.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._trigrams[gram]
+
+    # --------------------------------------------------------
+    # Token expansion
+    # --------------------------------------------------------
+    # Returns {indexed token: match quality} for a query token.
+    def _expand(self, token):
+        matches = {}
+        if token in self._postings:
+            matches[token] = EXACT_MATCH
+
+        # Prefix matches ("princ" -> "principito")
+        start = bisect_left(self._vocabulary, token)
+        for candidate in self._vocabulary[start:start + MAX_PREFIX_EXPANSION]:
+            if not candidate.startswith(token):
+                break
+            matches.setdefault(candidate, PREFIX_MATCH)
+
+        if matches:
+            return matches
+
+        # Fuzzy matches: tokens sharing enough trigrams
+        grams = trigrams(token)
+        shared = {}
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(trigrams(candidate)))
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                matches[candidate] = FUZZY_MATCH * similarity
+
+        return matches
+
+    # --------------------------------------------------------
+    # Query
+    # --------------------------------------------------------
+    # Returns up to `limit` (book, score) pairs, best first.
+    #
+    # Each query token contributes its best match in a document,
+    # weighted by the field (title > author) and by the rarity of
+    # the matched token (idf), so documents matching more words
+    # of the query rank higher.
+    def search(self, query, limit=10):
+        total = len(self._books)
+        if not total:
+            return []
+
+        scores = {}
+        for token in set(tokenize(query)):
+            best = {}
+            for candidate, quality in self._expand(token).items():
+                postings = self._postings[candidate]
+                idf = math.log(1 + total / len(postings))
+                for doc_id, weight in postings.items():
+                    score = quality * weight * idf
+                    if score > best.get(doc_id, 0):
+                        best[doc_id] = score
+
+            for doc_id, score in best.items():
+                scores[doc_id] = scores.get(doc_id, 0) + score
+
+        top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self._books[doc_id], score) for doc_id, score in top]
+
+    def search_books(self, query, limit=10):
+        """Same as search(), returning only the books."""
+        return [book for book, _ in self.search(query, limit)]
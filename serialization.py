@@ -0,0 +1,245 @@
+from operator import attrgetter, itemgetter
+
+from books import Book, DigitalBook, PhysicalBook
+from exceptions import LibraryError
+from holdings import Holding
+from observable import OwnedList
+from users import Student, Teacher, User
+
+
+# ============================================================
+# SERIALIZATION MODULE
+# ============================================================
+# Versioned, schema-driven conversion between domain objects
+# and the records stored in library.json and in the journal.
+#
+# Schema version 2 (current): every record starts with a
+# "type" tag naming its class, followed by the fields listed in
+# the schema of that class:
+#
+#   {"type": "DigitalBook", "id": 1, "title": ..., "author": ...,
+#    "price": ..., "available": ..., "_Book__borrowed_times": 3}
+#   {"type": "Teacher", "id": 1, "name": ..., "id_card": ...,
+#    "lend_books": [...], "limit_books": null}
+#
+# Field names are those of version 1 (untagged records), which
+# are still read: books as PhysicalBook, users with a subject as
+# Student and the others as Teacher.
+#
+# Field maps are compiled once per class:
+# - encoding reads all the fields with a single attrgetter
+# - decoding creates the object without running __init__ and
+#   stores each value through the slot descriptor, so no
+#   property setter, notification or validation runs per field
+
+SCHEMA_VERSION = 2
+
+# (record key, attribute, default when missing)
+BOOK_FIELDS = [
+    ('id', 'id', None),
+    ('title', '_title', None),
+    ('author', 'author', None),
+    ('price', 'price', None),
+    ('available', '_available', True),
+    ('_Book__borrowed_times', '_Book__borrowed_times', 0),
+]
+
+USER_FIELDS = [
+    ('id', 'id', None),
+    ('name', 'name', None),
+    ('id_card', '_id_card', None),
+    ('lend_books', 'lend_books', ()),
+]
+
+SCHEMAS = {
+    PhysicalBook: BOOK_FIELDS,
+    DigitalBook: BOOK_FIELDS,
+    Holding: BOOK_FIELDS + [
+        ('copies', 'copies', 1),
+        # Missing: every copy on the shelf (none if unavailable)
+        ('available_copies', '_available_copies', None),
+    ],
+    Student: USER_FIELDS + [
+        ('subject', 'subject', None),
+        ('limit_books', 'limit_books', 3),
+    ],
+    Teacher: USER_FIELDS + [
+        ('limit_books', 'limit_books', None),
+    ],
+}
+
+TYPES = {cls.__name__: cls for cls in SCHEMAS}
+
+
+# Fields every record must have, and the JSON types of fields
+_REQUIRED_KEYS = ('id', 'title', 'author', 'price', 'name', 'id_card')
+_FIELD_TYPES = {
+    'id': int,
+    'title': str,
+    'author': str,
+    'price': (int, float),
+    'name': str,
+    'id_card': str,
+    'lend_books': list,
+    'copies': int,
+    'available_copies': int,
+}
+
+
+class SchemaError(LibraryError):
+    pass
+
+
+# ============================================================
+# COMPILED FIELD MAPS
+# ============================================================
+class _Codec:
+
+    __slots__ = ('cls', 'type_name', 'fields', 'keys', 'getter', 'stores',
+                 'is_user', 'loans_at', 'shelf_at', 'row_getter', 'required', 'checks')
+
+    def __init__(self, cls, fields) -> None:
+        self.cls = cls
+        self.type_name = cls.__name__
+        self.fields = tuple(fields)
+        self.keys = tuple(key for key, _, _ in fields)
+        self.getter = attrgetter(*(attribute for _, attribute, _ in fields))
+
+        # Slot setters in field order (lend_books is rebuilt)
+        self.stores = tuple(
+            None if key == 'lend_books' else getattr(cls, attribute).__set__
+            for key, attribute, _ in fields
+        )
+        self.is_user = issubclass(cls, User)
+        self.loans_at = self.keys.index('lend_books') if self.is_user else None
+        self.shelf_at = (
+            self.keys.index('available_copies') if 'available_copies' in self.keys else None
+        )
+
+        # Validation: required keys and (row index, JSON types)
+        self.row_getter = itemgetter(*self.keys)
+        self.required = tuple(key for key in _REQUIRED_KEYS if key in self.keys)
+        self.checks = tuple(
+            (index, _FIELD_TYPES[key])
+            for index, key in enumerate(self.keys)
+            if key in _FIELD_TYPES
+        )
+
+    def encode(self, obj):
+        record = {'type': self.type_name}
+        record.update(zip(self.keys, self.getter(obj)))
+        if self.is_user:
+            record['lend_books'] = list(record['lend_books'])
+        return record
+
+    def decode(self, record):
+        return self.from_row(
+            [record.get(key, default) for key, _, default in self.fields],
+        )
+
+    # A row holds the field values in schema order
+    def to_row(self, record):
+        try:
+            return self.row_getter(record)
+        except KeyError:
+            return tuple(record.get(key, default) for key, _, default in self.fields)
+
+    def validate(self, record, row):
+        for key in self.required:
+            if key not in record:
+                raise SchemaError(f'{self.type_name} {record.get("id")}: missing {key!r}')
+        for index, expected in self.checks:
+            value = row[index]
+            if value is not None and not isinstance(value, expected):
+                raise SchemaError(
+                    f'{self.type_name} {record.get("id")}: '
+                    f'{self.keys[index]!r} has type {type(value).__name__}'
+                )
+
+    def from_row(self, row):
+        obj = self.cls.__new__(self.cls)
+        obj._listeners = ()
+        for store, value in zip(self.stores, row):
+            if store is not None:
+                store(obj, value)
+
+        if self.is_user:
+            obj.lend_books = OwnedList(obj)
+            list.extend(obj.lend_books, row[self.loans_at])
+        elif self.shelf_at is not None and row[self.shelf_at] is None:
+            obj._available_copies = obj.copies if obj._available else 0
+        return obj
+
+
+_CODECS = {cls: _Codec(cls, fields) for cls, fields in SCHEMAS.items()}
+_CODECS_BY_NAME = {cls.__name__: codec for cls, codec in _CODECS.items()}
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+def encode(obj):
+    """Tagged record (dict) of a book or user."""
+    codec = _CODECS.get(type(obj))
+    if codec is None:
+        raise SchemaError(f'No schema for {type(obj).__name__}')
+    return codec.encode(obj)
+
+
+def book_type(record):
+    """Type name of a book record (tagged or version 1)."""
+    return record.get('type', 'PhysicalBook')
+
+
+def user_type(record):
+    """Type name of a user record (tagged or version 1)."""
+    return record.get('type') or ('Student' if 'subject' in record else 'Teacher')
+
+
+def decode_book(record, type_name=None):
+    return _codec(type_name or book_type(record), Book).decode(record)
+
+
+def decode_user(record, type_name=None):
+    return _codec(type_name or user_type(record), User).decode(record)
+
+
+def _codec(type_name, base):
+    codec = _CODECS_BY_NAME.get(type_name)
+    if codec is None or not issubclass(codec.cls, base):
+        raise SchemaError(f'Unknown {base.__name__.lower()} type: {type_name}')
+    return codec
+
+
+# ------------------------------------------------------------
+# Rows (compact form used to ship records between processes)
+# ------------------------------------------------------------
+# The record is validated first: type tag, required fields and
+# their JSON types. SchemaError names the offending record.
+def book_row(record):
+    """Validated book record: (type name, field values)."""
+    return _row(_codec(book_type(record), Book), record)
+
+
+def user_row(record):
+    """Validated user record: (type name, field values)."""
+    return _row(_codec(user_type(record), User), record)
+
+
+def _row(codec, record):
+    row = codec.to_row(record)
+    codec.validate(record, row)
+    return codec.type_name, row
+
+
+def from_row(type_name, row):
+    return _CODECS_BY_NAME[type_name].from_row(row)
+
+
+def check_version(version):
+    """Validates the schema_version of a snapshot (1 if absent)."""
+    if version is None:
+        return 1
+    if not isinstance(version, int) or not 1 <= version <= SCHEMA_VERSION:
+        raise SchemaError(f'Unsupported schema version: {version}')
+    return version
@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import json
+
+import metrics
+from cache import QueryCache
+from concurrency import ConcurrentLibrary
+from exceptions import LibraryError
+from persistence import Persistence
+from reservations import ReservationDesk
+from sorted_index import SortedIndexes
+
+
+# ============================================================
+# ASYNCIO LIBRARY SERVER
+# ============================================================
+# Keeps one Library resident in memory and serves many clients
+# concurrently over a local socket, instead of loading and
+# rewriting library.json for every patron interaction.
+#
+# Protocol: one JSON object per line in each direction.
+#
+#   -> {"op": "find_book", "title": "1984"}
+#   <- {"ok": true, "result": {...book...}}
+#   <- {"ok": false, "error": "BookNotAvailable", "message": "..."}
+#
+# Operations:
+#   find_user  {id_card}
+#   find_book  {title}
+#   lend       {id_card, title}
+#   return     {id_card, title}
+#   list       {offset=0, limit=50}   available books
+#   browse     {field='title', low, high, prefix, after, limit=50,
+#               reverse=false}        sorted listing, by cursor
+#   hold       {id_card, title}       waitlist for a lent title
+#   cancel_hold {id_card, title}
+#   holds      {title}                waiting id_cards, in order
+#   overdue    {}                     loans past their due date
+#   metrics    {}                     see metrics.py
+#
+# Persistence runs off the event loop: the state to write is
+# collected on the loop (Persistence.prepare_save) and the file
+# I/O happens in a worker thread. Changes made within
+# `save_delay` seconds are grouped into a single save
+# (group commit); a lend/return is answered once it is durable.
+#
+# When the persistence has a loan scheduler (load_scheduler),
+# the server advances its clock once per scheduler tick.
+class LibraryServer:
+
+    def __init__(self, library, persistence, save_delay=0.05) -> None:
+        self.library = library
+        self.persistence = persistence
+        self.save_delay = save_delay
+
+        # Reuses the checks of the concurrency layer (limits,
+        # copy selection); the locks are uncontended here
+        self._lending = ConcurrentLibrary(library)
+
+        # Repeated reads (popular titles, listings) are answered
+        # from an LRU cache invalidated by the library events
+        self._queries = QueryCache(library)
+
+        # Sorted listings (price / id / author / title ranges),
+        # built by the first browse: indexing loads every book,
+        # which a lazy (sqlite) library must not do at startup
+        self._sorted = None
+
+        # Returned copies go straight to the next patron waiting
+        self._reservations = ReservationDesk(library, lending=self._lending)
+
+        self._server = None
+        self._pending_save = None
+        self._save_task = None
+        self._clock_task = None
+        self._save_lock = asyncio.Lock()
+
+    # --------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------
+    async def start(self, path=None, host='127.0.0.1', port=8765):
+        """Listens on a Unix socket (path) or on a local TCP port."""
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_client, path)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, host, port)
+        if self.persistence.scheduler is not None:
+            self._clock_task = asyncio.ensure_future(self._run_clock())
+        return self._server
+
+    async def _run_clock(self):
+        scheduler = self.persistence.scheduler
+        while True:
+            scheduler.advance()
+            await asyncio.sleep(scheduler.resolution)
+
+    async def close(self):
+        if self._clock_task is not None:
+            self._clock_task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.flush()
+        self._reservations.close()
+        if self._sorted is not None:
+            self._sorted.close()
+        self._queries.close()
+
+    # --------------------------------------------------------
+    # Client connection
+    # --------------------------------------------------------
+    async def _handle_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                response = await self._dispatch(line)
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, line):
+        try:
+            request = json.loads(line)
+            handler = getattr(self, f'_op_{request.get("op")}', None)
+            if handler is None:
+                raise LibraryError(f'Unknown operation: {request.get("op")}')
+            return {'ok': True, 'result': await handler(request)}
+        except LibraryError as error:
+            return {'ok': False, 'error': type(error).__name__, 'message': str(error)}
+        except OSError as error:
+            return {'ok': False, 'error': 'PersistenceError', 'message': str(error)}
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            return {'ok': False, 'error': 'BadRequest', 'message': repr(error)}
+
+    # --------------------------------------------------------
+    # Operations
+    # --------------------------------------------------------
+    async def _op_find_user(self, request):
+        return self._queries.find_user(request['id_card']).to_dict()
+
+    async def _op_find_book(self, request):
+        return self._queries.find_book(request['title']).to_dict()
+
+    async def _op_lend(self, request):
+        result = self._lending.lend(request['id_card'], request['title'])
+        await self._schedule_save()
+        return result
+
+    async def _op_return(self, request):
+        result = self._lending.return_book(request['id_card'], request['title'])
+        await self._schedule_save()
+        return result
+
+    async def _op_list(self, request):
+        offset = int(request.get('offset', 0))
+        limit = int(request.get('limit', 50))
+        books = self._queries.books_available[offset:offset + limit]
+        return {
+            'total': self._queries.available_count,
+            'books': [book.to_dict() for book in books],
+        }
+
+    # Pages of the catalog ordered by a field; `cursor` is
+    # passed back as `after` to get the next page
+    async def _op_browse(self, request):
+        field = request.get('field', 'title')
+        limit = int(request.get('limit', 50))
+        after = request.get('after')
+        if self._sorted is None:
+            self._sorted = SortedIndexes(self.library)
+        if 'prefix' in request:
+            page = self._sorted.prefix(field, request['prefix'], limit=limit, after=after)
+        else:
+            page = self._sorted.range(
+                field, request.get('low'), request.get('high'), limit=limit,
+                after=after, reverse=bool(request.get('reverse', False)),
+            )
+        return {
+            'books': [book.to_dict() for book in page.books],
+            'cursor': page.cursor,
+        }
+
+    async def _op_hold(self, request):
+        return self._reservations.place_hold(request['id_card'], request['title']).position
+
+    async def _op_cancel_hold(self, request):
+        self._reservations.cancel_hold(request['id_card'], request['title'])
+        return None
+
+    async def _op_holds(self, request):
+        return self._reservations.holds(request['title'])
+
+    async def _op_overdue(self, request):
+        scheduler = self.persistence.scheduler
+        if scheduler is None:
+            raise LibraryError('Due dates are not tracked')
+        return [
+            {'id_card': loan.id_card, 'title': loan.title, 'due_at': loan.due_at}
+            for loan in scheduler.overdue_loans()
+        ]
+
+    async def _op_metrics(self, request):
+        return metrics.snapshot(self.library)
+
+    # --------------------------------------------------------
+    # Group commit
+    # --------------------------------------------------------
+    # Every change waits for the next save; the first change of
+    # a group schedules it after `save_delay` seconds.
+    def _schedule_save(self):
+        if self._pending_save is None:
+            loop = asyncio.get_running_loop()
+            self._pending_save = loop.create_future()
+            loop.call_later(self.save_delay, self._start_flush)
+        return asyncio.shield(self._pending_save)
+
+    def _start_flush(self):
+        # Keep a reference: the event loop only holds weak ones
+        self._save_task = asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        """Writes the pending changes (I/O in a worker thread)."""
+        future, self._pending_save = self._pending_save, None
+
+        async with self._save_lock:
+            try:
+                write = self.persistence.prepare_save(self.library)
+                await asyncio.to_thread(write)
+            except Exception as error:
+                if future is not None and not future.done():
+                    future.set_exception(error)
+                    return
+                raise
+
+        if future is not None and not future.done():
+            future.set_result(None)
+
+
+# ============================================================
+# CLIENT HELPER
+# ============================================================
+# Minimal client, mostly for scripts and manual testing.
+class LibraryClient:
+
+    def __init__(self, reader, writer) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, path=None, host='127.0.0.1', port=8765):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, op, **params):
+        self._writer.write(json.dumps({'op': op, **params}).encode('utf-8') + b'\n')
+        await self._writer.drain()
+        return json.loads(await self._reader.readline())
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+# ============================================================
+# ENTRY POINT
+# ============================================================
+async def serve(args):
+    metrics.enable_from_environment()
+    if args.backend == 'sqlite':
+        # Lookups read the database; only touched records are loaded
+        persistence = Persistence(args.file, backend='sqlite')
+        library = persistence.load_data(mode='lazy')
+    else:
+        persistence = Persistence(args.file, journal=True)
+        library = persistence.load_data()
+    persistence.load_scheduler(library)
+
+    server = LibraryServer(library, persistence, save_delay=args.save_delay)
+    await server.start(path=args.socket, port=args.port)
+    where = args.socket or f'127.0.0.1:{args.port}'
+    print(f'Serving {library.name} on {where}')
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Library request server')
+    parser.add_argument('--file', default='library.json')
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--socket', help='Unix socket path (default: TCP)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--save-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
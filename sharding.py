@@ -0,0 +1,478 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import Future
+
+import exceptions
+from exceptions import BookNotAvailable, LibraryError
+from library import Library
+from persistence import Persistence
+from serialization import decode_book, decode_user, encode
+
+
+# ============================================================
+# SHARDED LIBRARY
+# ============================================================
+# Spreads one library over several worker processes, so the
+# lending workload is no longer limited to a single core.
+#
+# - Books are partitioned by normalized title hash: all the
+#   copies of a title live in the same shard, so a title lookup
+#   or a lend touches one shard only.
+# - Users are partitioned by id_card hash.
+# - Each worker owns its shard and its own journaled
+#   persistence file (<directory>/shard-<n>.json).
+#
+# The router (ShardedLibrary) sends requests through one pipe
+# per worker. Requests are pipelined: callers in several
+# threads, or the *_many helpers, keep every worker busy at
+# the same time. Catalog-wide queries fan out to all shards.
+#
+# Durability (group commit): a worker answers a mutating
+# request only after saving it, and saves once for all the
+# requests that were waiting in its pipe.
+#
+# Lending when user and title live in different shards:
+#   1. user shard   reserve_loan (limit check + lend_books)
+#   2. title shard  lend_copy
+#   3. on failure   user shard release_loan (compensation)
+# Returning runs the same steps in reverse. A router crash
+# between the steps can leave a loan recorded on one side only.
+
+# Requests changing the shard state (saved before answering)
+_MUTATING = {
+    'add_book', 'add_user', 'reserve_loan', 'release_loan',
+    'restore_loan', 'rename_loan', 'lend_copy', 'return_copy',
+    'lend', 'return_book',
+}
+
+
+# ------------------------------------------------------------
+# Routing (stable across processes and runs, unlike hash())
+# ------------------------------------------------------------
+def title_shard(title, shards):
+    return zlib.crc32(title.strip().lower().encode('utf-8')) % shards
+
+
+def user_shard(id_card, shards):
+    return zlib.crc32(str(id_card).encode('utf-8')) % shards
+
+
+# ============================================================
+# WORKER (runs in its own process)
+# ============================================================
+class ShardWorker:
+
+    def __init__(self, file, name) -> None:
+        self.persistence = Persistence(file, journal=True)
+        if os.path.exists(file):
+            self.library = self.persistence.load_data()
+        else:
+            self.library = Library(name)
+            self.persistence.save_data(self.library)
+
+    def serve(self, connection):
+        while True:
+            # Process every waiting request, then save once
+            replies = []
+            changed = False
+            while True:
+                request_id, op, args = connection.recv()
+                if op == 'stop':
+                    self._flush(connection, replies, changed)
+                    connection.send((request_id, True, None))
+                    return
+                replies.append((request_id, *self._execute(op, args)))
+                changed = changed or op in _MUTATING
+                if not connection.poll():
+                    break
+            self._flush(connection, replies, changed)
+
+    def _flush(self, connection, replies, changed):
+        if changed:
+            try:
+                self.persistence.save_data(self.library)
+            except OSError as error:
+                replies = [
+                    (request_id, False, ('OSError', str(error)))
+                    for request_id, _, _ in replies
+                ]
+        for reply in replies:
+            connection.send(reply)
+
+    # Any error is a reply: the worker keeps serving its shard
+    # (an unexpected error is reported as a LibraryError)
+    def _execute(self, op, args):
+        try:
+            return True, getattr(self, f'_op_{op}')(*args)
+        except LibraryError as error:
+            return False, (type(error).__name__, str(error))
+        except Exception as error:
+            return False, ('LibraryError', f'{op} failed: {error!r}')
+
+    # --------------------------------------------------------
+    # Operations
+    # --------------------------------------------------------
+    def _op_add_book(self, record):
+        self.library.books.append(decode_book(record))
+
+    def _op_add_user(self, record):
+        self.library.users.append(decode_user(record))
+
+    def _op_find_book(self, title):
+        return encode(self.library.find_book(title))
+
+    def _op_find_user(self, id_card):
+        return encode(self.library.find_user(id_card))
+
+    def _op_books_available(self):
+        return [encode(book) for book in self.library.books_available]
+
+    def _op_available_count(self):
+        return self.library.available_count
+
+    def _op_counts(self):
+        return len(self.library.books), len(self.library.users)
+
+    # User side of a loan
+    def _op_reserve_loan(self, id_card, title):
+        user = self.library.find_user(id_card)
+        if user.limit_books is not None and len(user.lend_books) >= user.limit_books:
+            raise LibraryError(
+                f'You have reached the limit of {user.limit_books} borrowed books'
+            )
+        user.lend_books.append(title)
+
+    # Returns the title as it was recorded in lend_books
+    def _op_release_loan(self, id_card, title):
+        user = self.library.find_user(id_card)
+        key = title.strip().lower()
+        for loan in user.lend_books:
+            if loan.strip().lower() == key:
+                user.lend_books.remove(loan)
+                return loan
+        raise LibraryError(f'{id_card} has not borrowed {title}')
+
+    # Compensation of a failed cross-shard return
+    def _op_restore_loan(self, id_card, title):
+        self.library.find_user(id_card).lend_books.append(title)
+
+    # Book side of a loan: returns the exact title lent
+    def _op_lend_copy(self, title):
+        for book in self.library.find_books(title):
+            if book.available:
+                return book.lend(), book.title
+        raise BookNotAvailable(f'{title} was not available')
+
+    def _op_return_copy(self, title):
+        for book in self.library.find_books(title):
+            if book.lent_copies:
+                return book.return_book()
+        raise LibraryError(f'No copy of {title} is lent')
+
+    # User and title in this shard: both sides at once
+    def _op_lend(self, id_card, title):
+        self._op_reserve_loan(id_card, title)
+        try:
+            result, exact_title = self._op_lend_copy(title)
+        except Exception:
+            self.library.find_user(id_card).lend_books.pop()
+            raise
+        self._rename_loan(id_card, title, exact_title)
+        return result
+
+    def _op_return_book(self, id_card, title):
+        user = self.library.find_user(id_card)
+        for book in self.library.find_books(title):
+            if book.lent_copies and book.title in user.lend_books:
+                user.lend_books.remove(book.title)
+                return book.return_book()
+        raise LibraryError(f'{id_card} has not borrowed {title}')
+
+    # The loan is recorded under the stored title, like
+    # ConcurrentLibrary.lend (queries may differ in case)
+    def _op_rename_loan(self, id_card, title, exact_title):
+        self._rename_loan(id_card, title, exact_title)
+
+    def _rename_loan(self, id_card, title, exact_title):
+        if title != exact_title:
+            lend_books = self.library.find_user(id_card).lend_books
+            lend_books[len(lend_books) - 1 - lend_books[::-1].index(title)] = exact_title
+
+
+def _run_worker(file, name, connection):
+    try:
+        ShardWorker(file, name).serve(connection)
+    except (EOFError, KeyboardInterrupt):
+        pass
+
+
+# ============================================================
+# ROUTER (front-end)
+# ============================================================
+class _ShardClient:
+    """Pipe to one worker; matches replies to pending requests."""
+
+    def __init__(self, connection, process) -> None:
+        self.connection = connection
+        self.process = process
+        self.pending = {}
+        self._ids = itertools.count()
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+
+    def submit(self, op, *args):
+        future = Future()
+        with self._send_lock:
+            request_id = next(self._ids)
+            self.pending[request_id] = future
+            self.connection.send((request_id, op, args))
+        return future
+
+    def _read_replies(self):
+        while True:
+            try:
+                request_id, ok, payload = self.connection.recv()
+            except (EOFError, OSError):
+                break
+            future = self.pending.pop(request_id)
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(_rebuild_error(*payload))
+
+        for future in self.pending.values():
+            future.set_exception(LibraryError('Shard worker stopped'))
+
+
+def _rebuild_error(type_name, message):
+    error_type = getattr(exceptions, type_name, None)
+    if isinstance(error_type, type) and issubclass(error_type, LibraryError):
+        return error_type(message)
+    if type_name == 'OSError':
+        return OSError(message)
+    return LibraryError(message)
+
+
+class ShardedLibrary:
+
+    def __init__(self, directory, shards=None, name='Sharded Library') -> None:
+        self.directory = directory
+        self.name = name
+        self.shards = shards or os.cpu_count() or 1
+        os.makedirs(directory, exist_ok=True)
+
+        context = multiprocessing.get_context()
+        self._clients = []
+        for index in range(self.shards):
+            parent, child = context.Pipe()
+            file = os.path.join(directory, f'shard-{index}.json')
+            process = context.Process(
+                target=_run_worker,
+                args=(file, f'{name} #{index}', child),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self._clients.append(_ShardClient(parent, process))
+
+        # Second steps of cross-shard operations
+        self._continuations = queue.SimpleQueue()
+        self._continuation_thread = threading.Thread(target=self._run_continuations, daemon=True)
+        self._continuation_thread.start()
+
+    # --------------------------------------------------------
+    # Lifecycle
+    # --------------------------------------------------------
+    def close(self):
+        self._continuations.put(None)
+        self._continuation_thread.join()
+        for client in self._clients:
+            client.submit('stop').result()
+        for client in self._clients:
+            client.process.join()
+            client.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _book_client(self, title):
+        return self._clients[title_shard(title, self.shards)]
+
+    def _user_client(self, id_card):
+        return self._clients[user_shard(id_card, self.shards)]
+
+    # --------------------------------------------------------
+    # Loading data
+    # --------------------------------------------------------
+    # Distributes the books and users of a Library (pipelined)
+    def import_library(self, library):
+        futures = [
+            self._book_client(book.title).submit('add_book', encode(book))
+            for book in library.books
+        ]
+        futures += [
+            self._user_client(user.id_card).submit('add_user', encode(user))
+            for user in library.users
+        ]
+        for future in futures:
+            future.result()
+
+    def add_book(self, book):
+        self._book_client(book.title).submit('add_book', encode(book)).result()
+
+    def add_user(self, user):
+        self._user_client(user.id_card).submit('add_user', encode(user)).result()
+
+    # --------------------------------------------------------
+    # Lookups (detached copies of the shard objects)
+    # --------------------------------------------------------
+    def find_book(self, title):
+        return decode_book(self._book_client(title).submit('find_book', title).result())
+
+    def find_user(self, id_card):
+        return decode_user(self._user_client(id_card).submit('find_user', id_card).result())
+
+    # --------------------------------------------------------
+    # Fan-out queries
+    # --------------------------------------------------------
+    def _fan_out(self, op):
+        futures = [client.submit(op) for client in self._clients]
+        return [future.result() for future in futures]
+
+    @property
+    def books_available(self):
+        return [
+            decode_book(record)
+            for shard in self._fan_out('books_available')
+            for record in shard
+        ]
+
+    @property
+    def available_count(self):
+        return sum(self._fan_out('available_count'))
+
+    def counts(self):
+        """(books, users) over all the shards."""
+        counts = self._fan_out('counts')
+        return sum(books for books, _ in counts), sum(users for _, users in counts)
+
+    # --------------------------------------------------------
+    # Lending
+    # --------------------------------------------------------
+    def lend(self, id_card, title):
+        return self.submit_lend(id_card, title).result()
+
+    def return_book(self, id_card, title):
+        return self.submit_return(id_card, title).result()
+
+    def submit_lend(self, id_card, title):
+        """Starts a lend; returns a Future with its message."""
+        users = self._user_client(id_card)
+        books = self._book_client(title)
+        if users is books:
+            return books.submit('lend', id_card, title)
+
+        result = Future()
+
+        def reserved(reservation):
+            if reservation.exception() is not None:
+                result.set_exception(reservation.exception())
+                return
+            self._then(books.submit('lend_copy', title), lent, result)
+
+        def lent(lending):
+            error = lending.exception()
+            if error is None:
+                message, exact_title = lending.result()
+                if exact_title != title:
+                    users.submit('rename_loan', id_card, title, exact_title)
+                result.set_result(message)
+                return
+            # Compensation: undo the reservation
+            self._then(users.submit('release_loan', id_card, title),
+                       lambda _: result.set_exception(error), result)
+
+        self._then(users.submit('reserve_loan', id_card, title), reserved, result)
+        return result
+
+    def submit_return(self, id_card, title):
+        """Starts a return; returns a Future with its message."""
+        users = self._user_client(id_card)
+        books = self._book_client(title)
+        if users is books:
+            return books.submit('return_book', id_card, title)
+
+        result = Future()
+
+        def released(release):
+            if release.exception() is not None:
+                result.set_exception(release.exception())
+                return
+            loan = release.result()
+            self._then(books.submit('return_copy', title),
+                       lambda returning: returned(returning, loan), result)
+
+        def returned(returning, loan):
+            error = returning.exception()
+            if error is None:
+                result.set_result(returning.result())
+                return
+            # Compensation: the user keeps the loan
+            self._then(users.submit('restore_loan', id_card, loan),
+                       lambda _: result.set_exception(error), result)
+
+        self._then(users.submit('release_loan', id_card, title), released, result)
+        return result
+
+    # Runs step(future) on the continuation thread once the
+    # future is done. Reply readers never send requests
+    # themselves, so a full pipe can never block them (which
+    # could deadlock two workers waiting on each other).
+    #
+    # A step that fails (e.g. a worker pipe closed) fails the
+    # `result` future of its operation; the thread keeps serving
+    # the other operations.
+    def _then(self, future, step, result):
+        future.add_done_callback(lambda done: self._continuations.put((step, done, result)))
+
+    def _run_continuations(self):
+        while (item := self._continuations.get()) is not None:
+            step, future, result = item
+            try:
+                step(future)
+            except Exception as error:
+                if not result.done():
+                    result.set_exception(error)
+
+    # --------------------------------------------------------
+    # Pipelined batches
+    # --------------------------------------------------------
+    # Returns one result (message or exception) per operation.
+    def lend_many(self, loans):
+        return self._gather([self.submit_lend(*loan) for loan in loans])
+
+    def return_many(self, loans):
+        return self._gather([self.submit_return(*loan) for loan in loans])
+
+    def find_books_many(self, titles):
+        futures = [self._book_client(title).submit('find_book', title) for title in titles]
+        return [
+            decode_book(result) if not isinstance(result, Exception) else result
+            for result in self._gather(futures)
+        ]
+
+    @staticmethod
+    def _gather(futures):
+        results = []
+        for future in futures:
+            error = future.exception()
+            results.append(error if error is not None else future.result())
+        return results
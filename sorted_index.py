@@ -0,0 +1,281 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from itertools import count
+
+from library import LazyLibrary
+
+
+# ============================================================
+# SORTED SECONDARY INDEXES
+# ============================================================
+# Keeps the books of a Library sorted by price, id, author and
+# title, so that listings never sort or walk the whole catalog:
+#
+#   indexes = SortedIndexes(library)
+#   indexes.range('price', 10, 20)        # $10 <= price <= $20
+#   indexes.prefix('author', 'garcía')    # authors starting so
+#   page = indexes.range('title', limit=20)
+#   page = indexes.range('title', limit=20, after=page.cursor)
+#
+# Every entry is keyed (value, book id, seq): `seq` tells apart
+# books sharing value and id, so keys are unique and a cursor
+# (the key of the last book of a page) resumes exactly after
+# it, even if books are added or removed between pages.
+#
+# Storage is a bucketed sorted list: sorted buckets of at most
+# 2 * LOAD keys, plus the last key of each bucket. Locating a
+# key costs two bisects (O(log n)); a page is then read
+# sequentially, so each page costs O(log n + page size).
+# Insertions and removals shift one bucket only.
+#
+# Titles and authors are compared case-insensitively. Titles
+# follow the Library events; price and author are plain
+# attributes, so after changing them call reindex(book).
+#
+# With available_only=True only books on the shelf are indexed
+# (availability changes are followed too).
+
+Page = namedtuple('Page', 'books cursor')
+
+LOAD = 512
+
+FIELDS = {
+    'price': lambda book: book.price,
+    'id': lambda book: book.id,
+    'author': lambda book: book.author.strip().lower(),
+    'title': lambda book: book.title.strip().lower(),
+}
+
+_STRING_FIELDS = ('author', 'title')
+
+
+class SortedKeys:
+
+    def __init__(self, keys=()) -> None:
+        # Initial keys are sorted once and cut into buckets
+        keys = sorted(keys)
+        self._buckets = [keys[start:start + LOAD] for start in range(0, len(keys), LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]  # last key of each bucket
+        self._len = len(keys)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        maxes = self._maxes
+        if not maxes:
+            self._buckets.append([key])
+            maxes.append(key)
+        else:
+            index = bisect_left(maxes, key)
+            if index == len(maxes):
+                index -= 1
+                self._buckets[index].append(key)
+                maxes[index] = key
+            else:
+                insort(self._buckets[index], key)
+            if len(self._buckets[index]) > 2 * LOAD:
+                self._split(index)
+        self._len += 1
+
+    def _split(self, index):
+        bucket = self._buckets[index]
+        self._buckets[index:index + 1] = [bucket[:LOAD], bucket[LOAD:]]
+        self._maxes[index:index + 1] = [bucket[LOAD - 1], bucket[-1]]
+
+    def remove(self, key):
+        index = bisect_left(self._maxes, key)
+        bucket = self._buckets[index] if index < len(self._maxes) else ()
+        position = bisect_left(bucket, key)
+        if position == len(bucket) or bucket[position] != key:
+            raise KeyError(key)
+
+        del bucket[position]
+        if bucket:
+            self._maxes[index] = bucket[-1]
+        else:
+            del self._buckets[index]
+            del self._maxes[index]
+        self._len -= 1
+
+    # --------------------------------------------------------
+    # Ordered iteration from a bisect position
+    # --------------------------------------------------------
+    def iter_from(self, key, inclusive=True):
+        """Keys >= key (> key when not inclusive), ascending."""
+        find = bisect_left if inclusive else bisect_right
+        buckets = self._buckets
+        index = find(self._maxes, key)
+        if index == len(buckets):
+            return
+        bucket = buckets[index]
+        for position in range(find(bucket, key), len(bucket)):
+            yield bucket[position]
+        for index in range(index + 1, len(buckets)):
+            yield from buckets[index]
+
+    def iter_before(self, key, inclusive=True):
+        """Keys <= key (< key when not inclusive), descending."""
+        find = bisect_right if inclusive else bisect_left
+        buckets = self._buckets
+        index = find(self._maxes, key)
+        if index < len(buckets):
+            bucket = buckets[index]
+            for position in range(find(bucket, key) - 1, -1, -1):
+                yield bucket[position]
+        for index in range(index - 1, -1, -1):
+            yield from reversed(buckets[index])
+
+
+# Bounds compared with whole keys: (value,) sorts before every
+# key holding that value, (value, _TOP) after all of them
+class _Top:
+
+    def __eq__(self, other):
+        return other is self
+
+    def __hash__(self):
+        return id(self)
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return other is self
+
+    def __gt__(self, other):
+        return other is not self
+
+    def __ge__(self, other):
+        return True
+
+
+_TOP = _Top()
+
+
+class SortedIndexes:
+
+    def __init__(self, library, fields=tuple(FIELDS), available_only=False) -> None:
+        self.library = library
+        self.available_only = available_only
+        self._values = {field: FIELDS[field] for field in fields}
+        self._books = {}    # (field, key) -> book
+        self._indexed = {}  # book -> {field: key}
+        self._seq = count()
+
+        # Books loaded on demand are not announced (book_added):
+        # a lazy library is loaded before it is indexed
+        if isinstance(library, LazyLibrary):
+            library.materialize_books()
+        for book in library.books:
+            self._add(book, index=False)
+        self._keys = {
+            field: SortedKeys(keys[field] for keys in self._indexed.values())
+            for field in fields
+        }
+        library.subscribe(self._on_library_event)
+
+    def close(self):
+        self.library.unsubscribe(self._on_library_event)
+
+    def __len__(self):
+        return len(self._indexed)
+
+    # --------------------------------------------------------
+    # Maintenance
+    # --------------------------------------------------------
+    def _add(self, book, index=True):
+        if book in self._indexed or (self.available_only and not book.available):
+            return
+        seq = next(self._seq)
+        keys = self._indexed[book] = {}
+        for field, value in self._values.items():
+            key = keys[field] = (value(book), book.id, seq)
+            self._books[field, key] = book
+            if index:
+                self._keys[field].add(key)
+
+    def _remove(self, book):
+        keys = self._indexed.pop(book, None)
+        if keys is None:
+            return
+        for field, key in keys.items():
+            self._keys[field].remove(key)
+            del self._books[field, key]
+
+    def reindex(self, book):
+        """Updates a book after a change of its indexed attributes."""
+        self._remove(book)
+        self._add(book)
+
+    def _on_library_event(self, library, event, *args):
+        if event == 'book_added':
+            self._add(args[0])
+        elif event == 'book_removed':
+            self._remove(args[0])
+        elif event == 'book_changed':
+            book, field, _, new = args
+            if field == 'title':
+                self.reindex(book)
+            elif field == 'available' and self.available_only:
+                if new:
+                    self._add(book)
+                else:
+                    self._remove(book)
+
+    # --------------------------------------------------------
+    # Queries
+    # --------------------------------------------------------
+    def range(self, field, low=None, high=None, limit=None, after=None, reverse=False):
+        """Books with low <= value <= high, ordered by `field`.
+
+        Returns a Page; pass page.cursor as `after` to get the
+        next one (cursor is None after the last page).
+        """
+        if field in _STRING_FIELDS:
+            low = None if low is None else low.strip().lower()
+            high = None if high is None else high.strip().lower()
+
+        if reverse:
+            keys = self._descending(field, high, after)
+            inside = (lambda key: True) if low is None else (lambda key: key[0] >= low)
+        else:
+            keys = self._ascending(field, low, after)
+            inside = (lambda key: True) if high is None else (lambda key: key[0] <= high)
+        return self._page(field, keys, inside, limit)
+
+    def prefix(self, field, prefix, limit=None, after=None):
+        """Books whose author/title starts with `prefix` (any case)."""
+        if field not in _STRING_FIELDS:
+            raise ValueError(f'{field} is not a text field')
+        prefix = prefix.strip().lower()
+        keys = self._ascending(field, prefix, after)
+        return self._page(field, keys, lambda key: key[0].startswith(prefix), limit)
+
+    def _ascending(self, field, low, after):
+        keys = self._keys[field]
+        if after is not None:
+            after = tuple(after)
+            if low is None or after >= (low,):
+                return keys.iter_from(after, inclusive=False)
+        return keys.iter_from((low,) if low is not None else (), inclusive=True)
+
+    def _descending(self, field, high, after):
+        keys = self._keys[field]
+        if after is not None:
+            after = tuple(after)
+            if high is None or after <= (high, _TOP):
+                return keys.iter_before(after, inclusive=False)
+        return keys.iter_before((high if high is not None else _TOP, _TOP), inclusive=True)
+
+    def _page(self, field, keys, inside, limit):
+        books = []
+        last = None
+        for key in keys:
+            if not inside(key):
+                return Page(books, None)
+            if limit is not None and len(books) == limit:
+                return Page(books, last)
+            books.append(self._books[field, key])
+            last = key
+        return Page(books, None)
@@ -0,0 +1,472 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from functools import partial
+
+from journal import EventRecorder
+from library import Library, LazyLibrary
+from serialization import SCHEMA_VERSION, check_version, decode_book, decode_user, encode
+
+
+# ============================================================
+# SQLITE STORE
+# ============================================================
+# Persistence backend keeping books, users and loans in a local
+# SQLite database (see Persistence(backend='sqlite')).
+#
+# Tables:
+# - books   one row per book; the schema fields every book has
+#           are columns, type-specific fields (e.g. the copies
+#           of a Holding) are a JSON object in `extra`
+# - users   one row per user, same layout
+# - loans   one row per title in a user's lend_books, in order
+# - meta    library name, schema version, save date
+#
+# Indexes: books (id), books (title_key), users (id),
+# users (id_card), loans (user_pk). title_key holds the
+# normalized title used by Library lookups (strip().lower()).
+#
+# Saves:
+# - the first save of a library rewrites the tables
+# - later saves apply the domain events recorded since the
+#   previous save (same events as the journal, see journal.py)
+# Each save is one transaction, on a connection opened once.
+#
+# load_lazy() returns a SQLiteLibrary: lookups read the indexed
+# tables and only the records they touch become objects.
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS books (
+    pk INTEGER PRIMARY KEY,
+    id INTEGER,
+    type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    title_key TEXT NOT NULL,
+    author TEXT,
+    price REAL,
+    available INTEGER NOT NULL,
+    borrowed_times INTEGER NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS books_id ON books (id);
+CREATE INDEX IF NOT EXISTS books_title_key ON books (title_key);
+CREATE TABLE IF NOT EXISTS users (
+    pk INTEGER PRIMARY KEY,
+    id INTEGER,
+    type TEXT NOT NULL,
+    name TEXT,
+    id_card TEXT NOT NULL,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS users_id ON users (id);
+CREATE INDEX IF NOT EXISTS users_id_card ON users (id_card);
+CREATE TABLE IF NOT EXISTS loans (
+    pk INTEGER PRIMARY KEY,
+    user_pk INTEGER NOT NULL,
+    title TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS loans_user ON loans (user_pk);
+'''
+
+_BOOK_SELECT = 'SELECT id, type, title, author, price, available, borrowed_times, extra FROM books'
+_USER_SELECT = 'SELECT pk, id, type, name, id_card, extra FROM users'
+
+# Record keys stored as columns (the others go to `extra`)
+_BOOK_KEYS = ('type', 'id', 'title', 'author', 'price', 'available', '_Book__borrowed_times')
+_USER_KEYS = ('type', 'id', 'name', 'id_card', 'lend_books')
+
+# First row of a book / user, as the Library indexes resolve them
+_BOOK_PK = '(SELECT pk FROM books WHERE title_key = ? AND id = ? ORDER BY pk LIMIT 1)'
+_USER_PK = '(SELECT pk FROM users WHERE id_card = ? ORDER BY pk LIMIT 1)'
+
+
+def _title_key(title):
+    return title.strip().lower()
+
+
+def _extra(record, keys):
+    extra = {key: value for key, value in record.items() if key not in keys}
+    return json.dumps(extra, ensure_ascii=False) if extra else None
+
+
+# ------------------------------------------------------------
+# Record <-> row conversion (records are serialization tags)
+# ------------------------------------------------------------
+def _book_values(record):
+    return (
+        record['id'],
+        record['type'],
+        record['title'],
+        _title_key(record['title']),
+        record['author'],
+        record['price'],
+        1 if record['available'] else 0,
+        record.get('_Book__borrowed_times', 0),
+        _extra(record, _BOOK_KEYS),
+    )
+
+
+def _user_values(record):
+    return (
+        record['id'],
+        record['type'],
+        record['name'],
+        record['id_card'],
+        _extra(record, _USER_KEYS),
+    )
+
+
+def _book_from_row(row):
+    id, type_name, title, author, price, available, borrowed_times, extra = row
+    record = {
+        'id': id,
+        'title': title,
+        'author': author,
+        'price': price,
+        'available': bool(available),
+        '_Book__borrowed_times': borrowed_times,
+    }
+    if extra:
+        record.update(json.loads(extra))
+    return decode_book(record, type_name)
+
+
+def _user_from_row(row, loans):
+    _, id, type_name, name, id_card, extra = row
+    record = {'id': id, 'name': name, 'id_card': id_card, 'lend_books': loans}
+    if extra:
+        record.update(json.loads(extra))
+    return decode_user(record, type_name)
+
+
+class SQLiteStore:
+
+    def __init__(self, path) -> None:
+        self.path = path
+
+        # One connection for the whole life of the store; saves
+        # may run in another thread (see server.py)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.executescript(_SCHEMA)
+
+        # Library whose events are being recorded
+        self._library = None
+        self._recorder = None
+
+    def close(self):
+        if self._library is not None:
+            self._library.unsubscribe(self._recorder)
+            self._library = None
+        with self._lock:
+            self._connection.close()
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _track(self, library):
+        if self._library is not None:
+            self._library.unsubscribe(self._recorder)
+
+        self._library = library
+        self._recorder = EventRecorder()
+        library.subscribe(self._recorder)
+
+    # --------------------------------------------------------
+    # Saves (two-phase, like Persistence.prepare_save)
+    # --------------------------------------------------------
+    def prepare_save(self, library):
+        if library is not self._library:
+            return self.prepare_snapshot(library)
+        return partial(self._apply, library.name, self._recorder.drain())
+
+    def prepare_snapshot(self, library):
+        if isinstance(library, LazyLibrary):
+            library.materialize_all()
+        if library is self._library:
+            # The snapshot already contains these events
+            self._recorder.drain()
+        else:
+            self._track(library)
+
+        books = [_book_values(encode(book)) for book in library.books]
+        users = []
+        for user in library.users:
+            record = encode(user)
+            users.append((_user_values(record), record['lend_books']))
+        return partial(self._write_snapshot, library.name, books, users)
+
+    def _write_snapshot(self, name, books, users):
+        with self._lock, self._connection as connection:
+            connection.execute('DELETE FROM loans')
+            connection.execute('DELETE FROM users')
+            connection.execute('DELETE FROM books')
+            connection.executemany(
+                'INSERT INTO books (id, type, title, title_key, author, price, '
+                'available, borrowed_times, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                books,
+            )
+            connection.executemany(
+                'INSERT INTO users (pk, id, type, name, id_card, extra) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ((pk, *values) for pk, (values, _) in enumerate(users, 1)),
+            )
+            connection.executemany(
+                'INSERT INTO loans (user_pk, title) VALUES (?, ?)',
+                (
+                    (pk, title)
+                    for pk, (_, loans) in enumerate(users, 1)
+                    for title in loans
+                ),
+            )
+            self._write_meta(connection, name)
+
+    def _write_meta(self, connection, name):
+        connection.executemany(
+            'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+            [
+                ('name', json.dumps(name)),
+                ('schema_version', json.dumps(SCHEMA_VERSION)),
+                ('save_date', json.dumps(datetime.now().strftime('%d/%m/%Y %H:%M:%S'))),
+            ],
+        )
+
+    # --------------------------------------------------------
+    # Incremental save: journal events -> SQL
+    # --------------------------------------------------------
+    def _apply(self, name, events):
+        with self._lock, self._connection as connection:
+            for event in events:
+                self._apply_event(connection, event)
+            self._write_meta(connection, name)
+
+    @staticmethod
+    def _apply_event(connection, event):
+        kind = event['event']
+
+        if kind == 'book_added':
+            connection.execute(
+                'INSERT INTO books (id, type, title, title_key, author, price, '
+                'available, borrowed_times, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                _book_values(event['record']),
+            )
+
+        elif kind == 'book_removed':
+            connection.execute(
+                f'DELETE FROM books WHERE pk = {_BOOK_PK}',
+                (_title_key(event['title']), event['id']),
+            )
+
+        elif kind in ('lend', 'return'):
+            connection.execute(
+                f'UPDATE books SET available = ?, borrowed_times = ? WHERE pk = {_BOOK_PK}',
+                (1 if kind == 'return' else 0, event['borrowed_times'],
+                 _title_key(event['title']), event['id']),
+            )
+
+        elif kind == 'book_updated':
+            field, value = event['field'], event['value']
+            where = (_title_key(event['title']), event['id'])
+            if field == 'title':
+                sql, values = 'title = ?, title_key = ?', (value, _title_key(value))
+            elif field in ('author', 'price', 'borrowed_times'):
+                sql, values = f'{field} = ?', (value,)
+            else:
+                sql, values = "extra = json_set(COALESCE(extra, '{}'), ?, json(?))", (
+                    f'$.{field}', json.dumps(value))
+            connection.execute(f'UPDATE books SET {sql} WHERE pk = {_BOOK_PK}', values + where)
+
+        elif kind == 'user_added':
+            record = event['record']
+            cursor = connection.execute(
+                'INSERT INTO users (id, type, name, id_card, extra) VALUES (?, ?, ?, ?, ?)',
+                _user_values(record),
+            )
+            connection.executemany(
+                'INSERT INTO loans (user_pk, title) VALUES (?, ?)',
+                ((cursor.lastrowid, title) for title in record['lend_books']),
+            )
+
+        elif kind == 'user_removed':
+            pk = connection.execute(
+                'SELECT pk FROM users WHERE id_card = ? ORDER BY pk LIMIT 1',
+                (event['id_card'],),
+            ).fetchone()
+            if pk is not None:
+                connection.execute('DELETE FROM loans WHERE user_pk = ?', pk)
+                connection.execute('DELETE FROM users WHERE pk = ?', pk)
+
+        elif kind == 'user_updated':
+            field, value = event['field'], event['value']
+            if field in ('id_card', 'name'):
+                sql, values = f'{field} = ?', (value,)
+            else:
+                sql, values = "extra = json_set(COALESCE(extra, '{}'), ?, json(?))", (
+                    f'$.{field}', json.dumps(value))
+            connection.execute(
+                f'UPDATE users SET {sql} WHERE pk = {_USER_PK}',
+                values + (event['id_card'],),
+            )
+
+        elif kind == 'loan_added':
+            connection.execute(
+                f'INSERT INTO loans (user_pk, title) SELECT {_USER_PK}, ?',
+                (event['id_card'], event['title']),
+            )
+
+        elif kind == 'loan_removed':
+            # list.remove drops the first matching loan
+            connection.execute(
+                'DELETE FROM loans WHERE pk = (SELECT MIN(pk) FROM loans '
+                f'WHERE user_pk = {_USER_PK} AND title = ?)',
+                (event['id_card'], event['title']),
+            )
+
+    # --------------------------------------------------------
+    # Loads
+    # --------------------------------------------------------
+    def _meta(self, key, default=None):
+        rows = self._query('SELECT value FROM meta WHERE key = ?', (key,))
+        return json.loads(rows[0][0]) if rows else default
+
+    def load(self):
+        """Whole database as a Library."""
+        check_version(self._meta('schema_version'))
+        library = Library(self._meta('name'))
+        for book in self.all_books():
+            library.books.append(book)
+        for user in self.all_users():
+            library.users.append(user)
+        self._track(library)
+        return library
+
+    def load_lazy(self):
+        """Library reading the tables on demand (SQLiteLibrary)."""
+        check_version(self._meta('schema_version'))
+        library = SQLiteLibrary(self._meta('name'), self)
+        self._track(library)
+        return library
+
+    # --------------------------------------------------------
+    # Indexed queries
+    # --------------------------------------------------------
+    def books_with_title(self, title_key):
+        rows = self._query(f'{_BOOK_SELECT} WHERE title_key = ? ORDER BY pk', (title_key,))
+        return [_book_from_row(row) for row in rows]
+
+    def users_with_id_card(self, id_card):
+        rows = self._query(f'{_USER_SELECT} WHERE id_card = ? ORDER BY pk', (id_card,))
+        return [_user_from_row(row, self._loans(row[0])) for row in rows]
+
+    def _loans(self, user_pk):
+        rows = self._query('SELECT title FROM loans WHERE user_pk = ? ORDER BY pk', (user_pk,))
+        return [title for title, in rows]
+
+    def all_books(self, skip_titles=()):
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT title_key, id, type, title, author, price, available, '
+                'borrowed_times, extra FROM books ORDER BY pk'
+            ).fetchall()
+        return [_book_from_row(row[1:]) for row in rows if row[0] not in skip_titles]
+
+    def all_users(self, skip_id_cards=()):
+        loans = {}
+        for user_pk, title in self._query('SELECT user_pk, title FROM loans ORDER BY pk'):
+            loans.setdefault(user_pk, []).append(title)
+        return [
+            _user_from_row(row, loans.get(row[0], []))
+            for row in self._query(f'{_USER_SELECT} ORDER BY pk')
+            if row[4] not in skip_id_cards
+        ]
+
+    def unread_count(self, loaded_titles=None, loaded_id_cards=None):
+        """Stored rows whose lookup key was not read (None: all read)."""
+        count = 0
+        if loaded_titles is not None:
+            rows = self._query('SELECT title_key, COUNT(*) FROM books GROUP BY title_key')
+            count += sum(n for key, n in rows if key not in loaded_titles)
+        if loaded_id_cards is not None:
+            rows = self._query('SELECT id_card, COUNT(*) FROM users GROUP BY id_card')
+            count += sum(n for key, n in rows if key not in loaded_id_cards)
+        return count
+
+
+# ============================================================
+# SQLITE-BACKED LIBRARY
+# ============================================================
+# LazyLibrary whose pending records are the database rows: no
+# key is read at startup. A lookup reads the rows of its key
+# from the indexed tables once; catalog-wide queries read the
+# rest of the table.
+#
+# Adding a book (or renaming one) reads the stored rows of its
+# title first, so rows saved earlier are never loaded twice.
+class SQLiteLibrary(LazyLibrary):
+
+    def __init__(self, name, store) -> None:
+        super().__init__(name, None, None)
+        self._store = store
+
+        # Keys whose rows were read (all of them once complete)
+        self._loaded_titles = set()
+        self._loaded_id_cards = set()
+        self._books_complete = False
+        self._users_complete = False
+
+    def _materialize_books(self, key):
+        if self._books_complete or key in self._loaded_titles:
+            return
+        self._loaded_titles.add(key)
+        self._append(self.books, self._store.books_with_title(key))
+
+    def _materialize_users(self, id_card):
+        if self._users_complete or id_card in self._loaded_id_cards:
+            return
+        self._loaded_id_cards.add(id_card)
+        self._append(self.users, self._store.users_with_id_card(id_card))
+
+    def _materialize_all_books(self):
+        if not self._books_complete:
+            self._append(self.books, self._store.all_books(self._loaded_titles))
+            self._books_complete = True
+
+    def materialize_all(self):
+        self._materialize_all_books()
+        if not self._users_complete:
+            self._append(self.users, self._store.all_users(self._loaded_id_cards))
+            self._users_complete = True
+
+    def _append(self, items, loaded):
+        self._materializing = True
+        try:
+            items.extend(loaded)
+        finally:
+            self._materializing = False
+
+    @property
+    def pending_count(self):
+        return self._store.unread_count(
+            None if self._books_complete else self._loaded_titles,
+            None if self._users_complete else self._loaded_id_cards,
+        )
+
+    def _notify(self, event, *args):
+        if not self._materializing:
+            if event == 'book_added':
+                self._materialize_books(_title_key(args[0].title))
+            elif event == 'book_changed' and args[1] == 'title':
+                self._materialize_books(_title_key(args[3]))
+            elif event == 'user_added':
+                self._materialize_users(args[0].id_card)
+            elif event == 'user_changed' and args[1] == 'id_card':
+                self._materialize_users(args[3])
+        super()._notify(event, *args)
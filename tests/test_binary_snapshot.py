@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+from binary_snapshot import BinarySnapshot, SnapshotWriter, binary_to_json, json_to_binary
+from books import DigitalBook, PhysicalBook
+from holdings import Holding
+from library import Library
+from persistence import Persistence
+from users import Student, Teacher
+
+
+# ============================================================
+# BINARY SNAPSHOT ROUND TRIPS
+# ============================================================
+class BinaryRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.persistence = Persistence(os.path.join(self.directory.name, 'library.json'))
+
+        self.library = Library('Round trip')
+        holding = Holding(3, 'Dune', 'Frank Herbert', 12.5, copies=4)
+        holding.lend()
+        self.library.books.extend([
+            PhysicalBook(1, '1984', 'George Orwell', 15.5),
+            DigitalBook.create_not_available(2, 'Rayuela', 'Julio Cortázar', 9.0),
+            holding,
+        ])
+        student = Student(1, 'Ana', 'STU001', 'Math')
+        student.lend_books.append('Dune')
+        self.library.users.extend([student, Teacher(2, 'Luis', 'TEA001')])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def records(self, library):
+        return (
+            [book.to_dict() for book in library.books],
+            [user.to_dict() for user in library.users],
+        )
+
+    def test_save_and_load_binary(self):
+        self.persistence.save_binary(self.library)
+        loaded = self.persistence.load_binary()
+        self.assertEqual(self.records(loaded), self.records(self.library))
+        self.assertIsInstance(loaded.find_book('dune'), Holding)
+
+    def test_json_conversions(self):
+        self.persistence.save_data(self.library)
+        binary = os.path.join(self.directory.name, 'library.bin')
+        json_to_binary(self.persistence.file, binary)
+        copy = os.path.join(self.directory.name, 'copy.json')
+        binary_to_json(binary, copy)
+
+        loaded = Persistence(copy).load_data()
+        self.assertEqual(self.records(loaded), self.records(self.library))
+
+    def test_holding_without_available_copies(self):
+        binary = os.path.join(self.directory.name, 'library.bin')
+        with SnapshotWriter(binary) as writer:
+            writer.add_book({'type': 'Holding', 'id': 1, 'title': 'Dune', 'author': 'Frank Herbert',
+                             'price': 12.5, 'available': True, 'copies': 4})
+        with BinarySnapshot(binary) as snapshot:
+            self.assertEqual(snapshot.book(0).available_copies, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from books import PhysicalBook
+from cache import QueryCache
+from exceptions import BookNotAvailable, UserNoFoudError
+from library import Library
+from users import Student
+
+
+# ============================================================
+# QUERY CACHE
+# ============================================================
+class QueryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = Library('Cache')
+        self.library.books.extend([
+            PhysicalBook(1, '1984', 'George Orwell', 18.9),
+            PhysicalBook(2, 'Rayuela', 'Julio Cortázar', 21.0),
+        ])
+        self.library.users.append(Student(1, 'Ana', 'STU1', 'Math'))
+        self.cache = QueryCache(self.library, maxsize=4)
+
+    def test_repeated_queries_hit(self):
+        for _ in range(3):
+            self.cache.find_book('1984')
+            self.cache.find_user('STU1')
+        info = self.cache.info()
+        self.assertEqual((info.hits, info.misses), (4, 2))
+
+    def test_lend_and_return_refresh_availability(self):
+        self.assertEqual(self.cache.available_count, 2)
+        shelf = self.cache.books_available
+
+        self.library.find_book('1984').lend()
+        self.assertEqual(self.cache.available_count, 1)
+        self.assertEqual([book.id for book in self.cache.books_available], [2])
+        self.assertEqual(len(shelf), 2)  # earlier snapshots are unchanged
+
+        self.library.find_book('1984').return_book()
+        self.assertEqual(self.cache.available_count, 2)
+
+    def test_missing_answers_are_cached_until_added(self):
+        for _ in range(2):
+            with self.assertRaises(BookNotAvailable):
+                self.cache.find_book('Dune')
+            with self.assertRaises(UserNoFoudError):
+                self.cache.find_user('STU2')
+        self.assertEqual(self.cache.hits, 2)
+
+        self.library.books.append(PhysicalBook(3, 'Dune', 'Frank Herbert', 10.0))
+        self.library.users.append(Student(2, 'Eva', 'STU2', 'Art'))
+        self.assertEqual(self.cache.find_book('dune').id, 3)
+        self.assertEqual(self.cache.find_user('STU2').name, 'Eva')
+
+    def test_renames_invalidate_both_keys(self):
+        self.cache.find_book('Rayuela')
+        self.cache.find_user('STU1')
+        with self.assertRaises(BookNotAvailable):
+            self.cache.find_book('Hopscotch')
+
+        self.library.find_book('Rayuela').title = 'Hopscotch'
+        self.library.find_user('STU1').id_card = 'STU9'
+        self.assertEqual(self.cache.find_book('Hopscotch').id, 2)
+        self.assertEqual(self.cache.find_books('Rayuela'), [])
+        self.assertEqual(self.cache.find_user('STU9').name, 'Ana')
+        with self.assertRaises(UserNoFoudError):
+            self.cache.find_user('STU1')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.find_book('1984')
+        self.cache.find_book('Rayuela')
+        self.cache.find_user('STU1')
+        self.cache.available_count
+        self.cache.find_book('1984')   # most recent again
+        self.cache.books_available     # evicts Rayuela
+
+        self.assertEqual(self.cache.evictions, 1)
+        misses = self.cache.misses
+        self.cache.find_book('1984')
+        self.cache.find_book('Rayuela')
+        self.assertEqual(self.cache.misses, misses + 1)
+
+    def test_close_stops_following_the_library(self):
+        self.cache.close()
+        self.assertEqual(self.library._listeners, ())
+        self.assertEqual(self.cache.info().currsize, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from books import PhysicalBook
+from catalog import ColumnarCatalog
+from library import Library
+
+
+# ============================================================
+# COLUMN MASKS
+# ============================================================
+class MaskTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = Library('Columns')
+        prices = [5.0, 10.0, 12.5, 20.0, 7.25]
+        self.library.books.extend(
+            PhysicalBook(id, f'Title {id}', 'Orwell' if id % 2 else 'Austen', price)
+            for id, price in enumerate(prices, 1)
+        )
+        self.catalog = ColumnarCatalog(self.library)
+
+    def test_price_mask_includes_both_bounds(self):
+        self.assertEqual(list(self.catalog.price_mask(7.25, 12.5)), [0, 1, 1, 0, 1])
+        # Integer bounds compare with the float column
+        self.assertEqual(list(self.catalog.price_mask(10, 20)), [0, 1, 1, 1, 0])
+
+    def test_masks_combine_and_select(self):
+        mask = self.catalog.combine(
+            self.catalog.price_mask(6, 15),
+            self.catalog.author_mask('Orwell'),
+        )
+        self.assertEqual([book.id for book in self.catalog.books_where(mask)], [3, 5])
+        self.assertEqual(self.catalog.total_value(mask), 19.75)
+
+    def test_rows_follow_the_library(self):
+        book = self.library.find_book('Title 2')
+        book.lend()
+        self.library.books.remove(self.library.find_book('Title 1'))
+        self.assertEqual(self.catalog.available_count, 3)
+        self.assertEqual(sorted(self.catalog.ids), [2, 3, 4, 5])
+        self.assertEqual(self.catalog.borrowed_times[self.catalog._rows[book]], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import sys
+import threading
+import unittest
+
+from benchmarks.concurrency import build_library, check, worker
+from books import PhysicalBook
+from concurrency import ConcurrentLibrary
+from exceptions import LibraryError
+from library import Library
+from users import Student, Teacher
+
+
+# ============================================================
+# LENDING THROUGH THE DOMAIN METHODS
+# ============================================================
+class LendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = Library('Locks')
+        self.library.books.extend(
+            PhysicalBook(id, 'Dune', 'Frank Herbert', 10.0) for id in range(1, 3)
+        )
+        self.student = Student(1, 'Ana', 'STU1', 'Math')
+        self.teacher = Teacher(2, 'Tom', 'TCH1')
+        self.library.users.extend([self.student, self.teacher])
+        self.lending = ConcurrentLibrary(self.library)
+
+    def test_teacher_loans_are_not_recorded(self):
+        self.lending.lend('TCH1', 'Dune')
+        self.assertEqual(self.teacher.lend_books, [])
+        self.assertEqual(self.library.available_count, 1)
+
+        self.lending.return_book('TCH1', 'Dune')
+        self.assertEqual(self.library.available_count, 2)
+
+    def test_student_loans_are_recorded_and_checked(self):
+        self.library.users.append(Student(3, 'Eva', 'STU3', 'Math'))
+        self.lending.lend('STU1', 'Dune')
+        self.assertEqual(self.student.lend_books, ['Dune'])
+
+        with self.assertRaises(LibraryError):
+            self.lending.return_book('STU3', 'Dune')
+        self.lending.return_book('STU1', 'Dune')
+        self.assertEqual(self.student.lend_books, [])
+
+
+# ============================================================
+# STRESS: many threads on a few contended titles
+# ============================================================
+class StressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+
+    def test_invariants_hold_under_contention(self):
+        library = build_library(titles=8, users=30)
+        concurrent = ConcurrentLibrary(library, stripes=4)
+        counters = []
+        pool = [
+            threading.Thread(target=worker, args=(concurrent, 2_000, seed, counters))
+            for seed in range(8)
+        ]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+
+        self.assertEqual(len(counters), 8)
+        self.assertEqual(check(library, counters), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+import unittest
+
+from books import PhysicalBook
+from library import Library
+from persistence import Persistence
+from users import Student
+
+
+# ============================================================
+# JOURNALED PERSISTENCE
+# ============================================================
+class JournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.directory.name, 'library.json')
+        self.journal = f'{self.file}.journal'
+
+        self.library = Library('Journal')
+        self.library.books.extend([
+            PhysicalBook(1, '1984', 'George Orwell', 18.9),
+            PhysicalBook(2, 'Rayuela', 'Julio Cortázar', 21.0),
+        ])
+        self.library.users.append(Student(1, 'Ana', 'STU1', 'Math'))
+        self.persistence = Persistence(self.file, journal=True, compact_every=100)
+        self.persistence.save_data(self.library)  # first save: snapshot
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def change(self):
+        user = self.library.find_user('STU1')
+        user.book_request('1984')
+        self.library.find_book('1984').lend()
+        self.library.find_book('Rayuela').title = 'Rayuela (2nd ed.)'
+        self.library.users.append(Student(2, 'Eva', 'STU2', 'Art'))
+
+    def state(self, library):
+        return (
+            sorted((book.id, book.title, book.available, book.borrowed_times)
+                   for book in library.books),
+            sorted((user.id_card, list(user.lend_books)) for user in library.users),
+        )
+
+    def reload(self):
+        return Persistence(self.file, journal=True).load_data()
+
+    def test_saves_append_events_that_are_replayed(self):
+        with open(self.file, 'rb') as f:
+            snapshot = f.read()
+
+        self.change()
+        self.persistence.save_data(self.library)
+
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), snapshot)
+        with open(self.journal, encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)['seq'] for line in f], [1, 2, 3, 4])
+        self.assertEqual(self.state(self.reload()), self.state(self.library))
+
+    def test_compaction_empties_the_journal(self):
+        self.persistence.compact_every = 3
+        self.change()
+        self.persistence.save_data(self.library)
+
+        self.assertEqual(os.path.getsize(self.journal), 0)
+        with open(self.file, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['journal_seq'], 4)
+        self.assertEqual(self.state(self.reload()), self.state(self.library))
+
+    def test_crash_before_the_journal_reset_applies_events_once(self):
+        self.change()
+        self.persistence.save_data(self.library)
+        with open(self.journal, 'rb') as f:
+            events = f.read()
+
+        # Snapshot written, journal not emptied yet
+        self.persistence.compact(self.library)
+        with open(self.journal, 'wb') as f:
+            f.write(events)
+
+        loaded = self.reload()
+        self.assertEqual(self.state(loaded), self.state(self.library))
+        self.assertEqual(loaded.find_user('STU1').lend_books, ['1984'])
+
+    def test_torn_last_event_is_discarded(self):
+        self.change()
+        self.persistence.save_data(self.library)
+        size = os.path.getsize(self.journal)
+        with open(self.journal, 'ab') as f:
+            f.write(b'{"event": "lend", "id": 2, "ti')
+
+        self.assertEqual(self.state(self.reload()), self.state(self.library))
+        self.assertEqual(os.path.getsize(self.journal), size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+import unittest
+
+from books import PhysicalBook
+from catalog import ColumnarCatalog
+from exceptions import BatchError, BookNotAvailable, UserNoFoudError
+from holdings import Holding
+from library import Library
+from popularity import PopularityRanking
+from users import Student, Teacher
+
+
+class BrokenBook(PhysicalBook):
+
+    __slots__ = ()
+
+    def lend(self):
+        raise RuntimeError('jammed')
+
+
+# ============================================================
+# HASH INDEXES
+# ============================================================
+class IndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = Library('Indexes')
+        self.book = PhysicalBook(1, 'Dune', 'Frank Herbert', 10.0)
+        self.ana = Student(1, 'Ana', 'STU1', 'Math')
+        self.library.books.append(self.book)
+        self.library.users.append(self.ana)
+
+    def test_lookups_follow_renames(self):
+        self.book.title = 'Dune Messiah'
+        self.ana.id_card = 'STU9'
+        self.assertIs(self.library.find_book('  dune messiah '), self.book)
+        self.assertIs(self.library.find_user('STU9'), self.ana)
+        with self.assertRaises(BookNotAvailable):
+            self.library.find_book('Dune')
+        with self.assertRaises(UserNoFoudError):
+            self.library.find_user('STU1')
+
+    def test_objects_listed_twice_stay_until_the_last_removal(self):
+        self.library.books.append(self.book)
+        self.library.users.append(self.ana)
+        self.library.books.remove(self.book)
+        self.library.users.remove(self.ana)
+        self.assertIs(self.library.find_book('Dune'), self.book)
+        self.assertIs(self.library.find_user('STU1'), self.ana)
+
+        self.library.books.remove(self.book)
+        self.library.users.remove(self.ana)
+        with self.assertRaises(BookNotAvailable):
+            self.library.find_book('Dune')
+        with self.assertRaises(UserNoFoudError):
+            self.library.find_user('STU1')
+        self.assertEqual(self.book._listeners, ())
+        self.assertEqual(self.ana._listeners, ())
+
+    def test_next_user_sharing_an_id_card_is_promoted(self):
+        eva = Student(2, 'Eva', 'STU1', 'Art')
+        tom = Teacher(3, 'Tom', 'STU1')
+        self.library.users.extend([eva, tom])
+        self.assertIs(self.library.find_user('STU1'), self.ana)
+
+        del self.library.users[0]
+        self.assertIs(self.library.find_user('STU1'), eva)
+        eva.id_card = 'ART2'
+        self.assertIs(self.library.find_user('STU1'), tom)
+        self.assertIs(self.library.find_user('ART2'), eva)
+
+    def test_bulk_load_counts_duplicates(self):
+        library = Library('Bulk')
+        books = [self.book, self.book]
+        library._bulk_load(books, [Library._title_key(book.title) for book in books], [self.ana])
+        library.books.remove(self.book)
+        self.assertIs(library.find_book('Dune'), self.book)
+        self.assertIs(library.find_user('STU1'), self.ana)
+
+
+# ============================================================
+# AVAILABILITY INDEX
+# ============================================================
+class AvailabilityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = Library('Shelf')
+        self.books = [PhysicalBook(id, f'Title {id}', 'Author', 10.0) for id in range(1, 5)]
+        self.books[2].available = False
+        self.library.books.extend(self.books)
+
+    def shelf(self):
+        return [book.id for book in self.library.books_available]
+
+    def test_index_follows_lends_and_returns(self):
+        self.assertEqual(self.shelf(), [1, 2, 4])
+        self.books[0].lend()
+        self.books[2].return_book()
+        self.assertEqual(self.shelf(), [2, 4, 3])
+        self.assertEqual(self.library.available_count, 3)
+
+    def test_removed_and_added_books(self):
+        self.library.books.remove(self.books[1])
+        self.library.books.append(PhysicalBook(5, 'Title 5', 'Author', 10.0))
+        self.library.books.append(PhysicalBook.create_not_available(6, 'Title 6', 'Author', 10.0))
+        self.assertEqual(self.shelf(), [1, 4, 5])
+
+        # A removed book no longer reaches the index
+        self.books[1].lend()
+        self.books[1].return_book()
+        self.assertEqual(self.shelf(), [1, 4, 5])
+
+    def test_titles_count_the_copies_on_the_shelf(self):
+        holding = Holding(7, 'Title 1', 'Author', 10.0, copies=3)
+        self.library.books.append(holding)
+        holding.lend()
+        self.assertEqual(self.library.titles_available['Title 1'], 3)
+
+        holding.lend()
+        holding.lend()
+        self.assertNotIn(holding, self.library.books_available)
+        self.assertEqual(self.library.titles_available['Title 1'], 1)
+
+
+# ============================================================
+# BATCHES
+# ============================================================
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = Library('Batch')
+        self.holding = Holding(1, 'Dune', 'Frank Herbert', 10.0, copies=3)
+        self.library.books.extend([
+            self.holding,
+            PhysicalBook(2, '1984', 'George Orwell', 18.9),
+            BrokenBook(3, 'Rayuela', 'Julio Cortázar', 21.0),
+        ])
+        self.student = Student(1, 'Ana', 'STU1', 'Math')
+        self.teacher = Teacher(2, 'Tom', 'TCH1')
+        self.library.users.extend([self.student, self.teacher])
+
+    def test_invalid_operation_rejects_the_whole_batch(self):
+        with self.assertRaises(BatchError) as raised:
+            self.library.process_batch([
+                ('lend', 'STU1', 'Dune'),
+                ('lend', 'STU1', 'Missing'),
+                ('return', 'STU1', '1984'),
+            ])
+        self.assertEqual([index for index, _, _ in raised.exception.failures], [1, 2])
+        self.assertEqual(self.holding.available_copies, 3)
+        self.assertEqual(self.student.lend_books, [])
+
+    def test_limits_count_the_lends_of_the_batch(self):
+        operations = [('lend', 'STU1', 'Dune')] * 3 + [('lend', 'STU1', '1984')]
+        with self.assertRaises(BatchError) as raised:
+            self.library.process_batch(operations)
+        self.assertEqual([index for index, _, _ in raised.exception.failures], [3])
+
+    def test_teacher_lends_and_returns_in_one_batch(self):
+        self.library.process_batch([
+            ('lend', 'TCH1', 'Dune'),
+            ('return', 'TCH1', 'Dune'),
+            ('lend', 'STU1', 'Dune'),
+        ])
+        self.assertEqual(self.teacher.lend_books, [])
+        self.assertEqual(self.student.lend_books, ['Dune'])
+        self.assertEqual(self.holding.available_copies, 2)
+
+    def test_failed_batch_restores_and_announces_the_counts(self):
+        ranking = PopularityRanking(self.library)
+        catalog = ColumnarCatalog(self.library)
+
+        # The holding keeps copies on the shelf: `available`
+        # never changes, only the counts do
+        with self.assertRaises(RuntimeError):
+            self.library.process_batch([
+                ('lend', 'STU1', 'Dune'),
+                ('lend', 'TCH1', 'Rayuela'),
+            ])
+        self.assertEqual(self.holding.borrowed_times, 0)
+        self.assertEqual(self.holding.available_copies, 3)
+        self.assertEqual(self.student.lend_books, [])
+        self.assertEqual(ranking.count_above(0), 0)
+        self.assertEqual(list(catalog.borrowed_times), [0, 0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
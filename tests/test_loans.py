@@ -0,0 +1,90 @@
+import unittest
+
+from books import PhysicalBook
+from concurrency import ConcurrentLibrary
+from holdings import Holding
+from library import Library
+from loans import LoanStore
+from reservations import ReservationDesk
+from users import Student
+
+
+# ============================================================
+# LOAN HISTORY OF HOLDINGS
+# ============================================================
+class HoldingLoansTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = Library('Loans')
+        self.library.books.append(Holding(1, 'Dune', 'Frank Herbert', 10.0, copies=3))
+        self.library.users.extend(Student(i, f'S{i}', f'S{i}', 'Math') for i in range(4))
+        self.store = LoanStore()
+        self.store.attach(self.library)
+        self.lending = ConcurrentLibrary(self.library)
+
+    def borrowers(self):
+        return [loan.user_id for loan in self.store.book_loans(1)]
+
+    def test_every_copy_is_a_loan_of_its_borrower(self):
+        for i in range(3):
+            self.lending.lend(f'S{i}', 'Dune')
+        self.assertEqual(self.borrowers(), [0, 1, 2])
+
+        self.lending.return_book('S1', 'Dune')
+        self.assertEqual(self.borrowers(), [0, 2])
+        self.assertEqual(self.store.active_count, 2)
+        self.assertEqual(self.store._waiting_users, {})
+        self.assertEqual(self.store._returning_users, {})
+
+    def test_hand_off_moves_the_loan_to_the_holder(self):
+        desk = ReservationDesk(self.library)
+        for i in range(3):
+            self.lending.lend(f'S{i}', 'Dune')
+        desk.place_hold('S3', 'Dune')
+
+        self.lending.return_book('S0', 'Dune')
+        self.assertEqual(self.borrowers(), [1, 2, 3])
+        desk.close()
+
+
+class ClockTest(unittest.TestCase):
+
+    def test_clock_stepping_back_does_not_break_lends(self):
+        now = [1000.0]
+        library = Library('Clock')
+        library.books.extend(Holding(i, f'Book {i}', 'Anonymous', 1.0) for i in range(2))
+        library.users.append(Student(1, 'Ana', 'S1', 'Math'))
+        store = LoanStore(clock=lambda: now[0])
+        store.attach(library)
+        lending = ConcurrentLibrary(library)
+
+        lending.lend('S1', 'Book 0')
+        now[0] = 400.0
+        lending.lend('S1', 'Book 1')
+
+        self.assertEqual(list(store.lent_at), [1000.0, 1000.0])
+        self.assertEqual(library.find_user('S1').lend_books, ['Book 0', 'Book 1'])
+        self.assertEqual(library.available_count, 0)
+
+
+class ConflictTest(unittest.TestCase):
+
+    def test_conflicting_event_is_skipped_not_raised(self):
+        library = Library('Conflict')
+        library.books.append(PhysicalBook(1, 'Dune', 'Frank Herbert', 10.0))
+        store = LoanStore()
+        store.attach(library)
+        store.record_lend(1)  # recorded by hand: the lend conflicts
+
+        with self.assertLogs('loans', 'WARNING'):
+            library.find_book('Dune').lend()
+        self.assertEqual(store.conflicts, 1)
+        self.assertEqual(library.available_count, 0)
+        self.assertEqual(len(store), 1)
+
+        library.find_book('Dune').return_book()
+        self.assertEqual(store.active_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
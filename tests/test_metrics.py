@@ -0,0 +1,42 @@
+import unittest
+
+import metrics
+from holdings import Holding
+from serialization import decode_book, decode_user, encode
+from users import Student
+
+
+# ============================================================
+# OBJECT COUNTS
+# ============================================================
+class ObjectCountTest(unittest.TestCase):
+
+    def setUp(self):
+        metrics.enable()
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def objects(self):
+        return metrics.snapshot()['objects_created']
+
+    def test_constructed_holdings_are_counted(self):
+        holding = Holding(1, 'Dune', 'Frank Herbert', 10.0, copies=2)
+        holding.lend()
+        self.assertEqual(self.objects(), {'Holding': 1})
+        self.assertEqual(metrics.snapshot()['operations']['Holding.lend']['count'], 1)
+
+    def test_decoded_objects_are_counted(self):
+        book = encode(Holding(1, 'Dune', 'Frank Herbert', 10.0, copies=2))
+        user = encode(Student(1, 'Ann', 'S1', 'Math'))
+        metrics.reset()
+
+        decode_book(book)
+        decode_user(user)
+        self.assertEqual(self.objects(), {'Holding': 1, 'Student': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
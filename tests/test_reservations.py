@@ -0,0 +1,52 @@
+import unittest
+
+from books import PhysicalBook
+from concurrency import ConcurrentLibrary
+from library import Library
+from reservations import ReservationDesk
+from users import Student
+
+
+# ============================================================
+# HAND-OFF OF RETURNED COPIES
+# ============================================================
+def make_library(name):
+    library = Library(name)
+    library.books.append(PhysicalBook(1, 'Dune', 'Frank Herbert', 10.0))
+    library.users.extend(Student(i, f'S{i}', f'S{i}', 'Math') for i in range(3))
+    return library
+
+
+class HandOffTest(unittest.TestCase):
+
+    def test_hooks_belong_to_their_library(self):
+        library, other = make_library('One'), make_library('Two')
+        desk = ReservationDesk(library)
+        self.assertEqual(other.return_hooks, ())
+
+        desk.close()
+        self.assertEqual(library.return_hooks, ())
+
+    def test_holder_at_limit_is_skipped(self):
+        library = make_library('Limit')
+        library.books.extend(
+            PhysicalBook(10 + i, f'Extra {i}', 'Anonymous', 5.0) for i in range(3)
+        )
+        lending = ConcurrentLibrary(library)
+        desk = ReservationDesk(library, lending=lending)
+
+        lending.lend('S0', 'Dune')
+        desk.place_hold('S1', 'Dune')
+        desk.place_hold('S2', 'Dune')
+        for i in range(3):
+            lending.lend('S1', f'Extra {i}')
+
+        lending.return_book('S0', 'Dune')
+        self.assertEqual(len(library.find_user('S1').lend_books), 3)
+        self.assertEqual(library.find_user('S2').lend_books, ['Dune'])
+        self.assertEqual(desk.expired, 1)
+        desk.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
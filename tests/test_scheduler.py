@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+from datetime import timedelta
+
+from books import DigitalBook, PhysicalBook
+from library import Library
+from persistence import Persistence
+from scheduler import SLOTS, LoanScheduler, TimingWheel, _Timer
+from users import Student
+
+DAY = 24 * 60 * 60
+
+
+# ============================================================
+# TIMING WHEEL
+# ============================================================
+class TimingWheelTest(unittest.TestCase):
+
+    def test_timers_fire_at_their_deadline_across_levels(self):
+        wheel = TimingWheel(now=5)
+        deadlines = [6, 5 + SLOTS - 1, 5 + SLOTS, 3 * SLOTS ** 2 + 5, SLOTS ** 3 + 17]
+        for deadline in reversed(deadlines):
+            wheel.add(_Timer(deadline, 'overdue', deadline))
+
+        fired = []
+        previous = wheel.now
+        for target in [*range(0, SLOTS ** 3, 997), SLOTS ** 3 + 40]:
+            for timer in wheel.advance(target):
+                self.assertGreater(timer.deadline, previous)
+                self.assertLessEqual(timer.deadline, target)
+                fired.append(timer.loan)
+            previous = target
+        self.assertEqual(fired, deadlines)
+        self.assertEqual(len(wheel), 0)
+
+    def test_cancelled_timers_never_fire(self):
+        wheel = TimingWheel()
+        timers = [_Timer(deadline, 'overdue', deadline) for deadline in (10, 100, 5000)]
+        for timer in timers:
+            wheel.add(timer)
+        timers[1].cancelled = True
+
+        self.assertEqual([timer.loan for timer in wheel.advance(6000)], [10, 5000])
+        self.assertEqual(len(wheel), 0)
+
+    def test_past_deadlines_fire_on_the_next_advance(self):
+        wheel = TimingWheel(now=50)
+        wheel.add(_Timer(40, 'overdue', 'late'))
+        self.assertEqual([timer.loan for timer in wheel.advance(50)], ['late'])
+
+
+# ============================================================
+# LOAN SCHEDULER
+# ============================================================
+class LoanSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        self.library = Library('Due dates')
+        self.library.books.extend([
+            PhysicalBook(1, '1984', 'George Orwell', 18.9),     # 7 days
+            DigitalBook(2, 'Rayuela', 'Julio Cortázar', 21.0),  # 14 days
+        ])
+        self.student = Student(1, 'Ana', 'STU1', 'Math')
+        self.library.users.append(self.student)
+        self.events = []
+
+    def scheduler(self, library=None):
+        return LoanScheduler(
+            library or self.library,
+            on_reminder=lambda loan: self.events.append(('reminder', loan.title)),
+            on_overdue=lambda loan: self.events.append(('overdue', loan.title)),
+            clock=lambda: self.now,
+        )
+
+    def test_reminder_then_overdue_at_the_loan_period(self):
+        scheduler = self.scheduler()
+        self.student.book_request('1984')
+        self.student.book_request('Rayuela')
+
+        scheduler.advance(self.now + 6 * DAY - 60)
+        self.assertEqual(self.events, [])
+        # Deadlines round up to the next tick
+        scheduler.advance(self.now + 7 * DAY + 60)
+        self.assertEqual(self.events, [('reminder', '1984'), ('overdue', '1984')])
+        self.assertEqual([loan.title for loan in scheduler.overdue_loans()], ['1984'])
+
+        scheduler.advance(self.now + 14 * DAY + 60)
+        self.assertEqual(self.events[2:], [('reminder', 'Rayuela'), ('overdue', 'Rayuela')])
+
+    def test_returning_cancels_the_timers(self):
+        scheduler = self.scheduler()
+        self.student.book_request('1984')
+        self.student.lend_books.remove('1984')
+
+        self.assertEqual(len(scheduler), 0)
+        self.assertEqual(scheduler.advance(self.now + 30 * DAY), [])
+
+    def test_due_dates_survive_a_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file = os.path.join(directory, 'library.json')
+            persistence = Persistence(file)
+            scheduler = persistence.load_scheduler(
+                self.library, clock=lambda: self.now, remind_before=timedelta(0),
+            )
+            self.student.book_request('1984')
+            self.student.book_request('Rayuela')
+            due = sorted(loan.due_at for loan in scheduler.loans_of('STU1'))
+            persistence.save_data(self.library)
+
+            # Down for 10 days; Rayuela was returned meanwhile
+            self.now += 10 * DAY
+            restarted = Persistence(file)
+            library = restarted.load_data()
+            library.find_user('STU1').lend_books.remove('Rayuela')
+            scheduler = restarted.load_scheduler(
+                library, clock=lambda: self.now, remind_before=timedelta(0),
+                on_overdue=lambda loan: self.events.append(('overdue', loan.title)),
+            )
+
+        self.assertEqual([loan.due_at for loan in scheduler.loans_of('STU1')], due[:1])
+        scheduler.advance()
+        self.assertEqual(self.events, [('overdue', '1984')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+from books import DigitalBook, PhysicalBook
+from holdings import Holding
+from serialization import (
+    SchemaError, book_row, check_version, decode_book, decode_user, encode, from_row,
+)
+from users import Student, Teacher
+
+
+# ============================================================
+# VERSION 2 RECORDS
+# ============================================================
+class RoundTripTest(unittest.TestCase):
+
+    def test_books_keep_their_type_and_state(self):
+        holding = Holding(3, 'Dune', 'Frank Herbert', 10.0, copies=4)
+        holding.lend()
+        for book in (PhysicalBook(1, '1984', 'George Orwell', 18.9),
+                     DigitalBook.create_not_available(2, 'Rayuela', 'Julio Cortázar', 21.0),
+                     holding):
+            record = encode(book)
+            copy = decode_book(record)
+            self.assertIs(type(copy), type(book))
+            self.assertEqual(copy.to_dict(), book.to_dict())
+            self.assertEqual(copy.available_copies, book.available_copies)
+
+    def test_users_keep_their_type_and_loans(self):
+        student = Student(1, 'Ana', 'STU1', 'Math')
+        student.lend_books.append('1984')
+        for user in (student, Teacher(2, 'Tom', 'TCH1')):
+            copy = decode_user(encode(user))
+            self.assertIs(type(copy), type(user))
+            self.assertEqual(copy.to_dict(), user.to_dict())
+
+        # Decoded loans still notify their owner
+        events = []
+        copy = decode_user(encode(student))
+        copy.subscribe(lambda user, field, old, new: events.append((field, new)))
+        copy.lend_books.append('Dune')
+        self.assertEqual(events, [('loan_added', 'Dune')])
+
+    def test_holding_without_available_copies_is_all_on_the_shelf(self):
+        record = encode(Holding(1, 'Dune', 'Frank Herbert', 10.0, copies=3))
+        del record['available_copies']
+        self.assertEqual(decode_book(record).available_copies, 3)
+
+        record['available'] = False
+        self.assertEqual(decode_book(record).available_copies, 0)
+
+        type_name, row = book_row({**record, 'available': True})
+        self.assertEqual(from_row(type_name, row).available_copies, 3)
+
+
+# ============================================================
+# VERSION 1 RECORDS (untagged)
+# ============================================================
+class VersionOneTest(unittest.TestCase):
+
+    def test_untagged_records_get_the_historical_types(self):
+        book = decode_book({
+            'id': 1, 'title': '1984', 'author': 'George Orwell', 'price': 18.9,
+            'available': False, '_Book__borrowed_times': 4,
+        })
+        self.assertIs(type(book), PhysicalBook)
+        self.assertEqual((book.available, book.borrowed_times), (False, 4))
+
+        student = decode_user({'id': 1, 'name': 'Ana', 'id_card': 'STU1',
+                               'subject': 'Math', 'lend_books': ['1984']})
+        teacher = decode_user({'id': 2, 'name': 'Tom', 'id_card': 'TCH1', 'lend_books': []})
+        self.assertIs(type(student), Student)
+        self.assertEqual((student.lend_books, student.limit_books), (['1984'], 3))
+        self.assertIs(type(teacher), Teacher)
+        self.assertIsNone(teacher.limit_books)
+
+    def test_versions(self):
+        self.assertEqual(check_version(None), 1)
+        self.assertEqual(check_version(2), 2)
+        for version in (0, 3, '2'):
+            with self.assertRaises(SchemaError):
+                check_version(version)
+
+
+# ============================================================
+# VALIDATION
+# ============================================================
+class ValidationTest(unittest.TestCase):
+
+    def test_invalid_records_name_the_problem(self):
+        record = encode(PhysicalBook(7, '1984', 'George Orwell', 18.9))
+        with self.assertRaisesRegex(SchemaError, "missing 'title'"):
+            book_row({key: value for key, value in record.items() if key != 'title'})
+        with self.assertRaisesRegex(SchemaError, "'price' has type str"):
+            book_row({**record, 'price': '18.9'})
+        with self.assertRaisesRegex(SchemaError, 'Unknown book type'):
+            decode_book({**record, 'type': 'Student'})
+
+
+if __name__ == '__main__':
+    unittest.main()
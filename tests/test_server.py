@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from generator import LibraryGenerator
+from library import Library
+from persistence import Persistence
+from server import LibraryServer
+
+
+# ============================================================
+# SERVER OPERATIONS
+# ============================================================
+class BrowseSQLiteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.directory.name, 'library.db')
+
+        library = Library('Browse')
+        generator = LibraryGenerator(books=30, users=5, seed=1)
+        library.books.extend(generator.books())
+        library.users.extend(generator.users())
+        persistence = Persistence(self.file, backend='sqlite')
+        persistence.save_data(library)
+        persistence.close()
+        self.titles = sorted(book.title.strip().lower() for book in library.books)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_browse_pages_a_lazy_sqlite_library(self):
+        async def browse():
+            persistence = Persistence(self.file, backend='sqlite')
+            library = persistence.load_data(mode='lazy')
+            server = LibraryServer(library, persistence)
+            titles, after = [], None
+            try:
+                while True:
+                    request = {'op': 'browse', 'limit': 7}
+                    if after is not None:
+                        request['after'] = after
+                    response = await server._dispatch(json.dumps(request))
+                    self.assertTrue(response['ok'], response)
+                    titles += [book['title'].strip().lower() for book in response['result']['books']]
+                    after = response['result']['cursor']
+                    if after is None:
+                        return titles
+            finally:
+                await server.close()
+                persistence.close()
+
+        self.assertEqual(asyncio.run(browse()), self.titles)
+
+    def test_nothing_is_loaded_before_the_first_browse(self):
+        async def start():
+            persistence = Persistence(self.file, backend='sqlite')
+            library = persistence.load_data(mode='lazy')
+            server = LibraryServer(library, persistence)
+            try:
+                return len(library.books), library.pending_count
+            finally:
+                await server.close()
+                persistence.close()
+
+        self.assertEqual(asyncio.run(start()), (0, 35))
+
+
+class CloseTest(unittest.TestCase):
+
+    def test_close_unsubscribes_from_the_library(self):
+        async def run():
+            library = Library('Close')
+            library.books.extend(LibraryGenerator(books=5, users=0, seed=2).books())
+            with tempfile.TemporaryDirectory() as directory:
+                persistence = Persistence(os.path.join(directory, 'library.json'))
+                server = LibraryServer(library, persistence)
+                await server.close()
+            return library._listeners
+
+        self.assertEqual(asyncio.run(run()), ())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+
+from books import PhysicalBook
+from sharding import ShardedLibrary, title_shard, user_shard
+from users import Student
+
+
+# ============================================================
+# CROSS-SHARD CONTINUATIONS
+# ============================================================
+class ContinuationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.library = ShardedLibrary(self.directory.name, shards=2)
+
+        # Every title lives in the shard that does not hold the user
+        self.library.add_user(Student(1, 'Ana', 'STU1', 'Math'))
+        users_at = user_shard('STU1', 2)
+        self.titles = [
+            title for title in (f'Title {i}' for i in range(20))
+            if title_shard(title, 2) != users_at
+        ][:2]
+        for id, title in enumerate(self.titles, 1):
+            self.library.add_book(PhysicalBook(id, title, 'Author', 10.0))
+
+    def tearDown(self):
+        self.library.close()
+        self.directory.cleanup()
+
+    def test_failing_step_fails_its_operation_only(self):
+        first, second = self.titles
+        books = self.library._book_client(first)
+
+        def closed(*args):
+            raise OSError('pipe closed')
+
+        books.submit = closed
+        future = self.library.submit_lend('STU1', first)
+        with self.assertRaises(OSError):
+            future.result(timeout=5)
+        del books.submit
+
+        # The continuation thread still serves later operations
+        message = self.library.submit_lend('STU1', second).result(timeout=5)
+        self.assertIn(second, message)
+
+
+if __name__ == '__main__':
+    unittest.main()
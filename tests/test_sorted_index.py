@@ -0,0 +1,58 @@
+import unittest
+
+from books import PhysicalBook
+from library import Library
+from sorted_index import SortedIndexes
+
+
+# ============================================================
+# RANGE PAGES
+# ============================================================
+class RangeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.library = Library('Sorted')
+        prices = [5.0, 10.0, 10.0, 10.0, 12.5, 7.5, 10.0, 15.0]
+        self.library.books.extend(
+            PhysicalBook(id, f'Title {id}', 'Author', price)
+            for id, price in enumerate(prices, 1)
+        )
+        self.indexes = SortedIndexes(self.library)
+
+    def pages(self, limit, **query):
+        books, after = [], None
+        while True:
+            page = self.indexes.range('price', limit=limit, after=after, **query)
+            books += [(book.price, book.id) for book in page.books]
+            after = page.cursor
+            if after is None:
+                return books
+
+    def test_reverse_pages_cross_the_high_bound(self):
+        # The cursors fall on books priced exactly `high`
+        expected = sorted(
+            ((book.price, book.id) for book in self.library.books if book.price <= 10.0),
+            reverse=True,
+        )
+        for limit in (1, 2, 3):
+            self.assertEqual(self.pages(limit, high=10.0, reverse=True), expected)
+
+    def test_pages_cross_the_low_bound(self):
+        expected = sorted(
+            (book.price, book.id) for book in self.library.books if book.price >= 10.0
+        )
+        for limit in (1, 2, 3):
+            self.assertEqual(self.pages(limit, low=10.0), expected)
+
+    def test_pages_follow_library_changes(self):
+        first = self.indexes.range('price', limit=3)
+        self.library.books.append(PhysicalBook(9, 'Title 9', 'Author', 1.0))
+        rest = self.indexes.range('price', after=first.cursor)
+        self.assertEqual(
+            [book.id for book in first.books + rest.books],
+            [1, 6, 2, 3, 4, 7, 5, 8],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+from books import PhysicalBook
+from holdings import Holding
+from library import Library
+from persistence import Persistence
+from users import Student, Teacher
+
+
+# ============================================================
+# SQLITE BACKEND
+# ============================================================
+class SQLiteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.directory.name, 'library.db')
+
+        library = Library('SQLite')
+        library.books.extend([
+            PhysicalBook(1, '1984', 'George Orwell', 18.9),
+            PhysicalBook(2, '1984', 'George Orwell', 18.9),
+            PhysicalBook(3, 'Rayuela', 'Julio Cortázar', 21.0),
+            Holding(4, 'Dune', 'Frank Herbert', 10.0, copies=3, available_copies=1),
+        ])
+        student = Student(1, 'Ana', 'STU1', 'Math')
+        student.lend_books.extend(['Dune', 'Dune'])
+        library.users.extend([student, Teacher(2, 'Tom', 'TCH1')])
+        self.save(library)
+        self.records = self.state(library)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open(self):
+        persistence = Persistence(self.file, backend='sqlite')
+        self.addCleanup(persistence.close)
+        return persistence
+
+    def save(self, library):
+        persistence = self.open()
+        persistence.save_data(library)
+        persistence.close()
+
+    @staticmethod
+    def state(library):
+        return (
+            sorted((book.id, str(book.to_dict())) for book in library.books),
+            sorted((user.id_card, str(user.to_dict())) for user in library.users),
+        )
+
+    def test_eager_load_round_trip(self):
+        self.assertEqual(self.state(self.open().load_data()), self.records)
+
+    def test_lazy_lookups_read_only_their_rows(self):
+        library = self.open().load_data(mode='lazy')
+        self.assertEqual((len(library.books), library.pending_count), (0, 6))
+
+        self.assertEqual([book.id for book in library.find_books('1984')], [1, 2])
+        self.assertEqual(library.find_user('STU1').lend_books, ['Dune', 'Dune'])
+        self.assertEqual((len(library.books), len(library.users), library.pending_count), (2, 1, 3))
+
+        # Repeated lookups do not read the rows again
+        library.find_book('1984')
+        self.assertEqual(len(library.books), 2)
+
+        self.assertEqual(library.available_count, 4)
+        self.assertEqual((len(library.books), library.pending_count), (4, 1))
+
+    def test_incremental_saves_apply_the_changes(self):
+        persistence = self.open()
+        library = persistence.load_data(mode='lazy')
+        student = library.find_user('STU1')
+        student.lend_books.remove('Dune')
+        library.find_book('Dune').return_book()
+        library.find_book('Rayuela').title = 'Hopscotch'
+        library.users.append(Student(3, 'Eva', 'STU3', 'Art'))
+        # A title already stored: its rows are read, not duplicated
+        library.books.append(PhysicalBook(5, '1984', 'George Orwell', 18.9))
+        persistence.save_data(library)
+
+        loaded = self.open().load_data()
+        library.materialize_all()
+        self.assertEqual(self.state(loaded), self.state(library))
+        self.assertEqual(loaded.find_book('Dune').available_copies, 2)
+        self.assertEqual([book.id for book in loaded.find_books('1984')], [1, 2, 5])
+        self.assertEqual(loaded.find_user('STU1').lend_books, ['Dune'])
+
+
+if __name__ == '__main__':
+    unittest.main()
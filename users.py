@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from typing import Protocol
 
 from exceptions import InvalidTitleError
+from observable import Observable, OwnedList
 
 
 # ============================================================
@@ -29,6 +30,9 @@ class ApplicantProtocol(Protocol):
 # that all subclasses implement certain methods.
 class BaseUser(ABC):
 
+    # Allows subclasses to be fully slotted (no __dict__)
+    __slots__ = ()
+
     @abstractmethod
     def book_request(self):
         """Subclasses must provide their own implementation."""
@@ -40,9 +44,22 @@ class BaseUser(ABC):
 # ============================================================
 # Represents a generic system user.
 # Provides shared attributes and default behavior.
-class User(BaseUser):
+# Observable so the Library can re-index a user whose
+# id_card changes.
+class User(Observable, BaseUser):
+
+    # Fixed attribute storage instead of a per-instance __dict__
+    __slots__ = ('_listeners', 'id', 'name', '_id_card', 'lend_books')
+
+    # Whether book_request records the title in lend_books.
+    # Code applying lends in bulk (Library.process_batch) or
+    # under locks (concurrency.py) follows the same rule.
+    records_loans = False
 
     def __init__(self, id: int, name: str, id_card: str):
+        # Listeners notified when the id_card changes
+        self._listeners = ()
+
         # Unique system identifier
         self.id = id
 
@@ -52,8 +69,28 @@ class User(BaseUser):
         # Identification card number
         self.id_card = id_card
 
-        # List to track borrowed books
-        self.lend_books = []
+        # List to track borrowed books (changes are announced
+        # to listeners as 'loan_added' / 'loan_removed')
+        self.lend_books = OwnedList(self)
+
+    @property
+    def id_card(self):
+        """Identification card number (used as lookup key)."""
+        return self._id_card
+
+    @id_card.setter
+    def id_card(self, value):
+        old = getattr(self, '_id_card', None)
+        self._id_card = value
+        if old is not None and old != value:
+            self._notify('id_card', old, value)
+
+    # OwnedList hooks of lend_books
+    def _list_added(self, title):
+        self._notify('loan_added', None, title)
+
+    def _list_removed(self, title):
+        self._notify('loan_removed', title, None)
 
     def book_request(self, title: str):
         """
@@ -67,6 +104,15 @@ class User(BaseUser):
         """Returns a formatted string with user ID and name."""
         return f'{self.id_card} with name {self.name}'
 
+    def to_dict(self):
+        """Returns the persisted representation of the user."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'id_card': self.id_card,
+            'lend_books': list(self.lend_books),
+        }
+
 
 # ============================================================
 # CHILD CLASS: Student
@@ -77,6 +123,11 @@ class User(BaseUser):
 # - Polymorphism (overriding methods)
 class Student(User):
 
+    __slots__ = ('subject', 'limit_books')
+
+    # book_request appends to lend_books
+    records_loans = True
+
     def __init__(self, id: int, name: str, id_card: str, subject: str):
         # Reuse parent initialization
         super().__init__(id, name, id_card)
@@ -105,6 +156,13 @@ class Student(User):
             # Deny request if limit reached
             return 'You have reached the limit of 3 borrowed books'
 
+    def to_dict(self):
+        """Extends the user representation with student fields."""
+        data = super().to_dict()
+        data['subject'] = self.subject
+        data['limit_books'] = self.limit_books
+        return data
+
 
 # ============================================================
 # CHILD CLASS: Teacher
@@ -113,6 +171,11 @@ class Student(User):
 # Demonstrates polymorphic behavior with different rules.
 class Teacher(User):
 
+    __slots__ = ('limit_books',)
+
+    # book_request does not record the loan
+    records_loans = False
+
     def __init__(self, id: int, name: str, id_card: str):
         # Initialize shared attributes
         super().__init__(id, name, id_card)
@@ -127,3 +190,9 @@ class Teacher(User):
         Teachers can request books without restriction.
         """
         return f'Request of book {title} successful'
+
+    def to_dict(self):
+        """Extends the user representation with teacher fields."""
+        data = super().to_dict()
+        data['limit_books'] = self.limit_books
+        return data